@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+bench_backends.py
+
+Compara los backends de detección (detector_backends.py) sobre una carpeta de
+frames: latencia por frame (media, p50, p95) y paridad de mAP tomando como
+referencia las detecciones del backend PyTorch.
+
+Uso:
+    cd src && python export_model.py --onnx --int8      # una sola vez
+    python benchmarks/bench_backends.py --frames-dir /ruta/frames \\
+        --backends onnx,onnx-int8 --threads 4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from detector_backends import create_backend  # noqa: E402
+
+
+def load_frames(frames_dir, limit):
+    paths = sorted(p for p in Path(frames_dir).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    if not paths:
+        raise SystemExit(f"No hay imágenes en {frames_dir}")
+    return [cv2.imread(str(p)) for p in paths[:limit]]
+
+
+def run_backend(backend, frames, warmup=3):
+    for frame in frames[:warmup]:
+        backend.predict_batch([frame])
+    latencies, outputs = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        outputs.append(backend.predict_batch([frame])[0])
+        latencies.append(time.perf_counter() - start)
+    return outputs, np.array(latencies) * 1000
+
+
+def box_iou(a, b):
+    """IoU entre cajas (N, 4) y (M, 4)."""
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def average_precision(preds, refs, iou_thr):
+    """AP (todas las clases juntas) de `preds` contra `refs` como ground truth."""
+    scored = []  # (conf, es_tp)
+    total_refs = sum(len(r) for r in refs)
+    if total_refs == 0:
+        return 1.0 if sum(len(p) for p in preds) == 0 else 0.0
+    for pred, ref in zip(preds, refs):
+        if len(pred) == 0:
+            continue
+        order = np.argsort(-pred[:, 4])
+        pred = pred[order]
+        matched = np.zeros(len(ref), dtype=bool)
+        ious = box_iou(pred[:, :4], ref[:, :4]) if len(ref) else np.zeros((len(pred), 0))
+        for i, det in enumerate(pred):
+            tp = False
+            if len(ref):
+                same_cls = ref[:, 5] == det[5]
+                cand = np.where(same_cls & ~matched & (ious[i] >= iou_thr))[0]
+                if len(cand):
+                    matched[cand[np.argmax(ious[i, cand])]] = True
+                    tp = True
+            scored.append((det[4], tp))
+    if not scored:
+        return 0.0
+    scored.sort(key=lambda x: -x[0])
+    tps = np.cumsum([tp for _, tp in scored])
+    fps = np.cumsum([not tp for _, tp in scored])
+    recall = tps / total_refs
+    precision = tps / np.maximum(tps + fps, 1)
+    # Interpolación de 101 puntos (COCO)
+    ap = 0.0
+    for r in np.linspace(0, 1, 101):
+        p = precision[recall >= r]
+        ap += p.max() if len(p) else 0.0
+    return ap / 101
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frames-dir", required=True)
+    parser.add_argument("--backends", default="onnx", help="Backends a comparar contra pytorch")
+    parser.add_argument("--threads", type=int, default=0, help="Hilos de onnxruntime (0 = auto)")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de frames a usar")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir, args.limit)
+    print(f"[INFO] {len(frames)} frames de {args.frames_dir}\n")
+
+    ref_out, ref_lat = run_backend(create_backend("pytorch"), frames)
+    print(f"{'backend':>10} {'media':>8} {'p50':>8} {'p95':>8} {'mAP50':>7} {'mAP50-95':>9}")
+    print(f"{'pytorch':>10} {ref_lat.mean():>6.1f}ms {np.percentile(ref_lat, 50):>6.1f}ms "
+          f"{np.percentile(ref_lat, 95):>6.1f}ms {'ref':>7} {'ref':>9}")
+
+    for name in args.backends.split(","):
+        kwargs = {"threads": args.threads} if name.startswith("onnx") else {}
+        out, lat = run_backend(create_backend(name, **kwargs), frames)
+        map50 = average_precision(out, ref_out, 0.5)
+        map5095 = np.mean([average_precision(out, ref_out, t) for t in np.arange(0.5, 0.96, 0.05)])
+        print(f"{name:>10} {lat.mean():>6.1f}ms {np.percentile(lat, 50):>6.1f}ms "
+              f"{np.percentile(lat, 95):>6.1f}ms {map50:>7.3f} {map5095:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+bench_batch_inference.py
+
+Compara la inferencia frame a frame (detect_vehicles_array, una llamada a
+predict por cámara) contra la inferencia por lotes entre cámaras
+(detect_vehicles_batch, un predict por ronda) para 1, 2, 4 y 8 cámaras.
+
+Reporta frames/s y latencia media/p95 por frame. Por defecto usa frames
+sintéticos; con --frames-dir se toman imágenes reales (una por cámara).
+
+Uso:
+    python benchmarks/bench_batch_inference.py [--streams 1,2,4,8] [--rounds 30]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import parking_monitor  # noqa: E402
+
+
+def load_frames(n, frames_dir=None):
+    if frames_dir:
+        paths = sorted(Path(frames_dir).glob("*.jpg")) + sorted(Path(frames_dir).glob("*.png"))
+        if not paths:
+            raise SystemExit(f"No hay imágenes en {frames_dir}")
+        return [cv2.imread(str(paths[i % len(paths)])) for i in range(n)]
+    rng = np.random.default_rng(0)
+    w, h = parking_monitor.CAMERA_RESOLUTION
+    return [rng.integers(0, 255, (h, w, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def bench_per_frame(frames, rounds):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        round_start = time.perf_counter()
+        for frame in frames:
+            parking_monitor.detect_vehicles_array(frame)
+            # La última cámara de la ronda espera a todas las anteriores
+            latencies.append(time.perf_counter() - round_start)
+    elapsed = time.perf_counter() - start
+    return len(frames) * rounds / elapsed, latencies
+
+
+def bench_batched(frames, rounds):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        round_start = time.perf_counter()
+        parking_monitor.detect_vehicles_batch(frames)
+        latencies.extend([time.perf_counter() - round_start] * len(frames))
+    elapsed = time.perf_counter() - start
+    return len(frames) * rounds / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", default="1,2,4,8", help="Cantidades de cámaras a probar")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--frames-dir", default=None, help="Carpeta con imágenes reales")
+    args = parser.parse_args()
+
+    # Calentamiento: la primera llamada incluye inicialización del modelo
+    warm = load_frames(1, args.frames_dir)
+    parking_monitor.detect_vehicles_array(warm[0])
+    parking_monitor.detect_vehicles_batch(warm)
+
+    print(f"{'cámaras':>8} | {'por frame fps':>13} {'lat. media':>10} {'p95':>8} | "
+          f"{'lote fps':>9} {'lat. media':>10} {'p95':>8} | {'aceleración':>11}")
+    for n in (int(x) for x in args.streams.split(",")):
+        frames = load_frames(n, args.frames_dir)
+        fps_single, lat_single = bench_per_frame(frames, args.rounds)
+        fps_batch, lat_batch = bench_batched(frames, args.rounds)
+        print(f"{n:>8} | {fps_single:>13.1f} {np.mean(lat_single) * 1000:>8.1f}ms "
+              f"{percentile(lat_single, 95):>6.1f}ms | {fps_batch:>9.1f} {np.mean(lat_batch) * 1000:>8.1f}ms "
+              f"{percentile(lat_batch, 95):>6.1f}ms | {fps_batch / fps_single:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+bench_gate_smoothing.py
+
+Verifica la compuerta de movimiento y la histéresis activas juntas (la
+configuración por defecto del monitor) en tres escenas sintéticas, y falla si
+alguna no se comporta como se espera:
+
+  auto que se detiene   la plaza se confirma "ocupada" en menos de --max-seconds
+  falso positivo        una detección aislada en la plaza vacía no se confirma
+  falso negativo        una detección perdida sobre un auto estacionado no la libera
+
+Con la escena quieta la compuerta descarta los frames hasta su refresco forzado
+(motion_gate.REFRESH_INTERVAL); mientras haya un cambio sin confirmar el bucle
+fuerza la inferencia, y solo las inferencias reales cuentan como votos. El
+detector es sintético y la histéresis usa un reloj simulado a --fps.
+
+Uso:
+    python benchmarks/bench_gate_smoothing.py [--fps 10] [--step 60] [--max-seconds 1.0]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from motion_gate import MotionGate  # noqa: E402
+from occupancy_smoothing import OCCUPY_N, OccupancySmoother  # noqa: E402
+import utils  # noqa: E402
+
+WIDTH, HEIGHT = 640, 480
+SPOT = {"id": 1, "coords": [(280, 300), (360, 420)]}
+CAR_W, CAR_H = 70, 110
+
+
+def car_positions(step):
+    """Posición (x, y) del auto por frame: baja de a `step` px hasta la plaza y se queda."""
+    (x1, y1), _ = SPOT["coords"]
+    y = -CAR_H
+    while y < y1:
+        yield x1 + 5, y
+        y = min(y1, y + step)
+    while True:
+        yield x1 + 5, y1
+
+
+def draw(x=None, y=None, background=60):
+    frame = np.full((HEIGHT, WIDTH, 3), background, dtype=np.uint8)
+    if x is not None and y + CAR_H > 0:
+        frame[max(0, y):y + CAR_H, x:x + CAR_W] = 220
+    return frame
+
+
+def car_box(x, y):
+    return (x, y, x + CAR_W, y + CAR_H, "car", 0.9)
+
+
+class Loop:
+    """Un ciclo del monitor serie: compuerta (forzada si hay cambios pendientes) + histéresis."""
+
+    def __init__(self, fps):
+        self.fps = fps
+        self.clock = 0.0
+        self.gate = MotionGate([SPOT])
+        self.smoother = OccupancySmoother(clock=lambda: self.clock)
+        self.occupied = None
+
+    def step(self, i, frame, detections):
+        self.clock = i / self.fps
+        if self.gate.should_infer(frame, force=self.smoother.has_pending()):
+            status = self.smoother.apply(utils.check_occupancy(None, [SPOT], detections))
+        else:
+            status = self.smoother.tick()
+        if status:
+            self.occupied = status[0]["occupied"]
+        return self.occupied
+
+
+def stopping_car(fps, step, max_frames):
+    """Frames desde que el auto se detiene hasta que se confirma la plaza (None = nunca)."""
+    loop = Loop(fps)
+    stop_frame = None
+    (_, spot_y1), _ = SPOT["coords"]
+    for i, (x, y) in enumerate(car_positions(step)):
+        if i >= max_frames:
+            return None
+        if stop_frame is None and y == spot_y1:
+            stop_frame = i
+        detections = [car_box(x, y)] if y + CAR_H > 0 else []
+        if loop.step(i, draw(x, y), detections) and stop_frame is not None:
+            return i - stop_frame
+
+
+def glitch(fps, max_frames, parked):
+    """
+    Escena quieta (plaza vacía o con un auto estacionado) en la que un cambio de
+    iluminación dispara una inferencia con una lectura errónea aislada: una
+    detección fantasma o el auto no detectado. Devuelve los frames en que el
+    estado confirmado difirió del real.
+    """
+    loop = Loop(fps)
+    (x1, y1), _ = SPOT["coords"]
+    x, y = (x1 + 5, y1) if parked else (None, None)
+    glitch_frame = int(fps * 2)
+    wrong = 0
+    for i in range(max_frames):
+        background = 60 if i < glitch_frame else 90  # se enciende una luz y queda así
+        detections = [car_box(x1 + 5, y1)] if parked else []
+        if i == glitch_frame:
+            detections = [] if parked else [car_box(x1 + 5, y1)]
+        occupied = loop.step(i, draw(x, y, background), detections)
+        if i > glitch_frame and occupied != parked:
+            wrong += 1
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--step", type=int, default=60, help="Píxeles que avanza el auto por frame")
+    parser.add_argument("--max-seconds", type=float, default=1.0,
+                        help="Demora máxima aceptable desde que el auto se detiene")
+    args = parser.parse_args()
+
+    max_frames = int(args.fps * 120)
+    failed = False
+
+    frames = stopping_car(args.fps, args.step, max_frames)
+    if frames is None:
+        print(f"❌ auto que se detiene: la plaza no se confirmó en {max_frames / args.fps:.0f}s")
+        failed = True
+    else:
+        seconds = frames / args.fps
+        ok = seconds <= args.max_seconds
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} auto que se detiene: confirmada {frames} frames ({seconds:.2f}s) "
+              f"después de detenerse (máximo {args.max_seconds:.2f}s), ocupar tras {OCCUPY_N} observaciones")
+
+    for label, parked in (("falso positivo", False), ("falso negativo", True)):
+        wrong = glitch(args.fps, max_frames, parked)
+        failed |= wrong > 0
+        print(f"{'✅' if not wrong else '❌'} {label}: {wrong} frames con el estado confirmado erróneo")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
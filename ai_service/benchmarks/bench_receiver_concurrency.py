@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+bench_receiver_concurrency.py
+
+Mide cómo escala el receptor FastAPI con muchos clientes simultáneos sobre un
+endpoint que consulta Oracle en cada request. Con acceso a la BD bloqueante
+las requests se atienden de a una (requests/s constante y latencia creciente
+con la concurrencia); con el pool async las esperas a la BD se solapan y
+requests/s crece hasta llegar a DB_POOL_MAX sesiones.
+
+Levantar el receptor sin el modelo en memoria, para que cada request vaya a
+la BD:
+
+    cd web
+    STATE_CACHE=0 uvicorn fastapi_receiver_postgres:app --port 8000
+
+Uso:
+    python benchmarks/bench_receiver_concurrency.py [--url http://localhost:8000]
+        [--endpoint /parking/summary] [--levels 1,8,32,64] [--duration 10]
+"""
+
+import argparse
+
+from bench_receiver_load import percentile, run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado del receptor con clientes concurrentes")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/parking/summary")
+    parser.add_argument("--levels", default="1,8,32,64", help="Cantidades de clientes simultáneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel")
+    args = parser.parse_args()
+
+    print(f"{args.endpoint}")
+    print(f"{'clientes':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  códigos")
+    base_rps = None
+    for level in (int(x) for x in args.levels.split(",")):
+        elapsed, latencies, codes = run(args.url, args.endpoint, level, args.duration, False)
+        rps = len(latencies) / elapsed if elapsed else 0.0
+        base_rps = base_rps or rps
+        scale = f" x{rps / base_rps:.1f}" if base_rps else ""
+        print(f"{level:>8} {rps:>9.0f} {percentile(latencies, 50):>8.2f} "
+              f"{percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}  "
+              f"{dict(sorted(codes.items(), key=str))}{scale}")
+
+
+if __name__ == "__main__":
+    main()
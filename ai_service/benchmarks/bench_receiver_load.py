@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+bench_receiver_load.py
+
+Prueba de carga de los endpoints de lectura del receptor FastAPI
+(/parking/state y /parking/summary). Varios hilos con conexiones keep-alive
+hacen requests durante un tiempo fijo y se reporta requests/s y latencia
+p50/p95/p99 por endpoint. Con --etag cada cliente reenvía el último ETag
+(If-None-Match), como haría un dashboard que refresca periódicamente.
+
+Para comparar antes/después, levantar el receptor con y sin caché:
+
+    cd web
+    STATE_CACHE=0 uvicorn fastapi_receiver_postgres:app --port 8000   # Oracle en cada request
+    STATE_CACHE=1 uvicorn fastapi_receiver_postgres:app --port 8000   # desde memoria
+
+Uso:
+    python benchmarks/bench_receiver_load.py [--url http://localhost:8000]
+        [--endpoints /parking/state,/parking/summary] [--concurrency 16] [--duration 10] [--etag]
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(host, port, path, deadline, use_etag, latencies, codes):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    etag = None
+    while time.perf_counter() < deadline:
+        headers = {"If-None-Match": etag} if use_etag and etag else {}
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            codes["error"] = codes.get("error", 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        codes[response.status] = codes.get(response.status, 0) + 1
+        etag = response.getheader("ETag") or etag
+    conn.close()
+
+
+def run(url, path, concurrency, duration, use_etag):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    deadline = time.perf_counter() + duration
+    per_thread = [([], {}) for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=worker, args=(host, port, path, deadline, use_etag, lat, codes))
+        for lat, codes in per_thread
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(x for lat, _ in per_thread for x in lat)
+    codes = {}
+    for _, c in per_thread:
+        for code, n in c.items():
+            codes[code] = codes.get(code, 0) + n
+    return elapsed, latencies, codes
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /parking/state y /parking/summary")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoints", default="/parking/state,/parking/summary")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por endpoint")
+    parser.add_argument("--etag", action="store_true", help="Reenviar el ETag recibido (If-None-Match)")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<20} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  códigos")
+    for path in args.endpoints.split(","):
+        elapsed, latencies, codes = run(args.url, path, args.concurrency, args.duration, args.etag)
+        rps = len(latencies) / elapsed if elapsed else 0.0
+        mean = statistics.mean(latencies) * 1000 if latencies else 0.0
+        print(f"{path:<20} {rps:>9.0f} {percentile(latencies, 50):>8.2f} "
+              f"{percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}  "
+              f"{dict(sorted(codes.items(), key=str))} (media {mean:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+bench_spot_index.py
+
+Compara el cálculo de ocupación completo N×M contra el índice espacial
+(SpotGridIndex) con 50, 500 y 5.000 plazas sintéticas, y verifica que ambos
+caminos den exactamente el mismo resultado.
+
+Uso:
+    python benchmarks/bench_spot_index.py [--detections 30] [--repeat 200]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from occupancy_engine import OccupancyEngine  # noqa: E402
+import utils  # noqa: E402
+
+SPOT_W, SPOT_H = 40, 80  # tamaño aproximado de una plaza en píxeles
+
+
+def synthetic_lot(n_spots, rng):
+    """Grilla de plazas que cubre un frame proporcional a la cantidad de plazas."""
+    cols = int(np.ceil(np.sqrt(n_spots * 2)))
+    spots = []
+    for i in range(n_spots):
+        col, row = i % cols, i // cols
+        x1 = col * (SPOT_W + 4) + int(rng.integers(0, 3))
+        y1 = row * (SPOT_H + 8) + int(rng.integers(0, 3))
+        spots.append({"id": i + 1, "coords": [(x1, y1), (x1 + SPOT_W, y1 + SPOT_H)]})
+    width = cols * (SPOT_W + 4)
+    height = (n_spots // cols + 1) * (SPOT_H + 8)
+    return spots, width, height
+
+
+def synthetic_detections(n, width, height, rng):
+    x1 = rng.uniform(0, width - SPOT_W, n)
+    y1 = rng.uniform(0, height - SPOT_H, n)
+    w = rng.uniform(20, 60, n)
+    h = rng.uniform(30, 90, n)
+    conf = rng.uniform(0.2, 1.0, n)
+    return np.stack([x1, y1, x1 + w, y1 + h, conf, np.zeros(n)], axis=1).astype(np.float32)
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6  # µs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--detections", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'plazas':>8} {'completo (µs)':>14} {'índice (µs)':>12} {'utils (µs)':>11} "
+          f"{'utils+índice (µs)':>18} {'aceleración':>11}")
+
+    for n_spots in (50, 500, 5000):
+        spots, width, height = synthetic_lot(n_spots, rng)
+        dets = synthetic_detections(args.detections, width, height, rng)
+        det_tuples = [(d[0], d[1], d[2], d[3], "auto", d[4]) for d in dets]
+
+        brute = OccupancyEngine(spots, use_index=False)
+        indexed = OccupancyEngine(spots, use_index=True)
+        index = utils.build_spot_index(spots)
+
+        # Los dos caminos deben coincidir exactamente
+        occ_b, ov_b = brute.evaluate(dets)
+        occ_i, ov_i = indexed.evaluate(dets)
+        assert np.array_equal(occ_b, occ_i) and np.allclose(ov_b, ov_i), "resultados distintos"
+        assert utils.check_occupancy(None, spots, det_tuples) == \
+            utils.check_occupancy(None, spots, det_tuples, index=index), "resultados distintos (utils)"
+
+        repeat_py = max(1, args.repeat // 20)
+        t_brute = timeit(lambda: brute.evaluate(dets), args.repeat)
+        t_index = timeit(lambda: indexed.evaluate(dets), args.repeat)
+        t_utils = timeit(lambda: utils.check_occupancy(None, spots, det_tuples), repeat_py)
+        t_utils_idx = timeit(lambda: utils.check_occupancy(None, spots, det_tuples, index=index), repeat_py)
+
+        print(f"{n_spots:>8} {t_brute:>14.1f} {t_index:>12.1f} {t_utils:>11.1f} "
+              f"{t_utils_idx:>18.1f} {t_brute / t_index:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
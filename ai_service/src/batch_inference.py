@@ -0,0 +1,104 @@
+# batch_inference.py — Servicio de inferencia YOLO por lotes entre cámaras
+#
+# Cada llamada a MODEL.predict tiene un costo fijo (preprocesado, despacho,
+# NMS) que domina cuando hay varias cámaras. El servicio junta el último frame
+# de cada cámara activa en un lote y hace un solo predict; el lote se cierra
+# al llegar a `max_batch` frames o al vencer `max_wait` desde el primero.
+
+import queue
+import threading
+import time
+
+from pipeline import StageStats
+
+MAX_BATCH = 8
+MAX_WAIT = 0.02  # segundos
+
+
+class BatchInferenceServer:
+    """
+    Atiende solicitudes (nombre, token, frame) de `request_q` y responde
+    (token, detecciones) en `response_qs[nombre]`.
+
+    `detect_batch_fn(frames)` recibe una lista de frames y devuelve una lista
+    de matrices (x1, y1, x2, y2, conf, cls), una por frame.
+    """
+
+    def __init__(self, detect_batch_fn, request_q, response_qs, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self._detect_batch_fn = detect_batch_fn
+        self._request_q = request_q
+        self._response_qs = response_qs
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {
+            "batch_wait": StageStats("batch_wait"),
+            "predict": StageStats("predict"),
+        }
+        self.batches = 0
+        self.frames = 0
+        self.largest_batch = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def collect_batch(self):
+        """Bloquea hasta el primer frame y junta más hasta max_batch o max_wait."""
+        try:
+            first = self._request_q.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        opened = time.perf_counter()
+        # Una entrada por cámara: si una cámara envió dos frames, gana el último
+        batch = {first[0]: first}
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._request_q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch[item[0]] = item
+        self.stats["batch_wait"].record(time.perf_counter() - opened)
+        return list(batch.values())
+
+    def _run(self):
+        import numpy as np
+
+        while self._running:
+            batch = self.collect_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = self._detect_batch_fn([frame for _, _, frame in batch])
+            except Exception as e:
+                print(f"[ERROR] Error en inferencia por lotes ({len(batch)} frames): {e}")
+                results = [np.zeros((0, 6), dtype=np.float32)] * len(batch)
+            self.stats["predict"].record(time.perf_counter() - start)
+            self.batches += 1
+            self.frames += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+            for (name, token, _), dets in zip(batch, results):
+                self._response_qs[name].put((token, dets))
+
+    def stats_snapshot(self):
+        snap = {name: s.snapshot() for name, s in self.stats.items()}
+        snap["batch_size"] = {
+            "batches": self.batches,
+            "avg": self.frames / self.batches if self.batches else 0.0,
+            "max": self.largest_batch,
+        }
+        return snap
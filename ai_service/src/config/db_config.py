@@ -10,3 +10,24 @@ BACKEND_API_URL = os.getenv('BACKEND_API_URL', 'http://localhost:3000')
 PARKING_SPACES_ENDPOINT = f"{BACKEND_API_URL}/parking/spaces"
 DELETE_ALL_SPACES_ENDPOINT = f"{BACKEND_API_URL}/parking/spaces"
 CREATE_SPACE_WITH_COORDS_ENDPOINT = f"{BACKEND_API_URL}/parking/spaces/with-coords"
+
+# Configuración Oracle Database (mismo que el backend)
+DB_CONFIG = {
+    "user": os.environ.get("DB_USER", "parkingapp"),
+    "password": os.environ.get("DB_PASSWORD", "admin123"),
+    "dsn": f"{os.environ.get('DB_HOST', 'localhost')}:{os.environ.get('DB_PORT', '1521')}/{os.environ.get('DB_SID', 'FREEPDB1')}"
+}
+
+# Pool de conexiones compartido (ver db_pool.py)
+POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', '4'))
+POOL_INCREMENT = int(os.getenv('DB_POOL_INCREMENT', '1'))
+POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', '60'))  # segundos
+POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '300'))  # cierra sesiones ociosas
+STMT_CACHE_SIZE = int(os.getenv('DB_STMT_CACHE_SIZE', '40'))
+
+# Spool local de escritura diferida (ver write_behind.py)
+SPOOL_PATH = os.getenv('OCCUPANCY_SPOOL', os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'occupancy_spool.db'))
+
+# Retención de eventos crudos (ver event_retention.py)
+EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', '90'))
@@ -0,0 +1,123 @@
+# db_pool.py — Pool de conexiones Oracle compartido por los procesos de ai_service
+#
+# El monitor, el receptor FastAPI y las herramientas de verificación toman
+# conexiones de aquí en lugar de llamar a oracledb.connect() en cada operación,
+# evitando el handshake de conexión en cada ciclo y en cada request HTTP.
+#
+# oracledb se importa recién al crear el pool, así importar este módulo es
+# barato para las herramientas que no tocan la BD.
+
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from config.db_config import (
+    DB_CONFIG,
+    POOL_INCREMENT,
+    POOL_MAX,
+    POOL_MIN,
+    POOL_PING_INTERVAL,
+    POOL_TIMEOUT,
+    STMT_CACHE_SIZE,
+)
+
+_pool = None
+_async_pool = None
+_lock = threading.Lock()
+
+
+def _pool_params(min_sessions=None, max_sessions=None):
+    import oracledb
+
+    return dict(
+        DB_CONFIG,
+        min=POOL_MIN if min_sessions is None else min_sessions,
+        max=POOL_MAX if max_sessions is None else max_sessions,
+        increment=POOL_INCREMENT,
+        stmtcachesize=STMT_CACHE_SIZE,
+        ping_interval=POOL_PING_INTERVAL,
+        timeout=POOL_TIMEOUT,
+        getmode=oracledb.POOL_GETMODE_WAIT,
+    )
+
+
+# --- Pool síncrono ---
+def get_pool(min_sessions=None, max_sessions=None):
+    """Devuelve el pool síncrono del proceso, creándolo la primera vez."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                import oracledb
+
+                _pool = oracledb.create_pool(**_pool_params(min_sessions, max_sessions))
+                print(f"[INFO] Pool Oracle creado ({_pool.min}-{_pool.max} sesiones) en {DB_CONFIG['dsn']}")
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Toma una conexión del pool y la devuelve al salir del bloque."""
+    conn = get_pool().acquire()
+    try:
+        yield conn
+    finally:
+        get_pool().release(conn)
+
+
+def health_check():
+    """Verifica que el pool pueda entregar una conexión operativa."""
+    try:
+        with connection() as conn:
+            conn.ping()
+        pool = get_pool()
+        return {"ok": True, "opened": pool.opened, "busy": pool.busy, "max": pool.max}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def close_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.close(force=True)
+            _pool = None
+
+
+# --- Pool asíncrono (para handlers async de FastAPI) ---
+def get_async_pool(min_sessions=None, max_sessions=None):
+    """Devuelve el pool asíncrono del proceso, creándolo la primera vez."""
+    global _async_pool
+    if _async_pool is None:
+        import oracledb
+
+        _async_pool = oracledb.create_pool_async(**_pool_params(min_sessions, max_sessions))
+        print(f"[INFO] Pool Oracle async creado ({_async_pool.min}-{_async_pool.max} sesiones) en {DB_CONFIG['dsn']}")
+    return _async_pool
+
+
+@asynccontextmanager
+async def async_connection():
+    """Versión async de connection()."""
+    pool = get_async_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+async def async_health_check():
+    try:
+        async with async_connection() as conn:
+            await conn.ping()
+        pool = get_async_pool()
+        return {"ok": True, "opened": pool.opened, "busy": pool.busy, "max": pool.max}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close(force=True)
+        _async_pool = None
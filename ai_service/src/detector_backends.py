@@ -0,0 +1,164 @@
+# detector_backends.py — Backends intercambiables para detect_vehicles
+#
+# Todos exponen predict_batch(frames) -> [matriz (M, 6) x1, y1, x2, y2, conf, cls]
+# por frame, en coordenadas del frame original:
+#
+#   pytorch   Ultralytics + best.pt (comportamiento original)
+#   onnx      onnxruntime sobre el modelo exportado (ver export_model.py), con
+#             cantidad de hilos configurable; también sirve para el INT8
+#   openvino  modelo OpenVINO IR exportado, cargado a través de Ultralytics
+#
+# Las dependencias de cada backend se importan solo al construirlo.
+
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+WEIGHTS_DIR = PROJECT_ROOT / "runs" / "train" / "toycar_detector_finalsafe4" / "weights"
+PT_PATH = WEIGHTS_DIR / "best.pt"
+ONNX_PATH = WEIGHTS_DIR / "best.onnx"
+ONNX_INT8_PATH = WEIGHTS_DIR / "best.int8.onnx"
+OPENVINO_PATH = WEIGHTS_DIR / "best_openvino_model"
+
+IMGSZ = 416
+CONF = 0.25
+IOU = 0.7  # mismo umbral de NMS que Ultralytics por defecto
+NMS_MAX_WH = 7680  # desplazamiento por clase en el NMS (el de Ultralytics)
+
+
+class UltralyticsBackend:
+    """Inferencia con Ultralytics (PyTorch .pt u OpenVINO IR exportado)."""
+
+    name = "pytorch"
+
+    def __init__(self, model_path=PT_PATH, device="cpu", imgsz=IMGSZ, conf=CONF):
+        from ultralytics import YOLO
+
+        self.model_path = Path(model_path)
+        self.model = YOLO(str(self.model_path))
+        self.device = device
+        self.imgsz = imgsz
+        self.conf = conf
+
+    def predict_batch(self, frames):
+        results = self.model.predict(list(frames), device=self.device, imgsz=self.imgsz,
+                                     conf=self.conf, verbose=False)
+        return [r.boxes.data.cpu().numpy() for r in results]
+
+
+def letterbox(frame, imgsz):
+    """Redimensiona manteniendo proporción y rellena a imgsz×imgsz (como Ultralytics)."""
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    bottom, right = imgsz - new_h - top, imgsz - new_w - left
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                value=(114, 114, 114))
+    return padded, gain, (left, top)
+
+
+class OnnxBackend:
+    """
+    Inferencia con onnxruntime en CPU. `threads` fija intra_op_num_threads
+    (0 = lo decide onnxruntime). Si el modelo se exportó con eje de batch
+    dinámico los frames se procesan en un solo run; si no, uno por uno.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_PATH, imgsz=IMGSZ, conf=CONF, iou=IOU, threads=0):
+        import onnxruntime as ort
+
+        self.model_path = Path(model_path)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.model_path), opts, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+
+    def _preprocess(self, frames):
+        batch, meta = [], []
+        for frame in frames:
+            img, gain, pad = letterbox(frame, self.imgsz)
+            batch.append(img[:, :, ::-1].transpose(2, 0, 1))  # BGR→RGB, HWC→CHW
+            meta.append((gain, pad, frame.shape[:2]))
+        x = np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+        return x, meta
+
+    def _postprocess(self, pred, gain, pad, shape):
+        # Salida YOLOv8/11: (4 + nc, anchors) con cajas cx, cy, w, h
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        keep = conf >= self.conf
+        if not keep.any():
+            return np.zeros((0, 6), dtype=np.float32)
+        boxes, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+
+        xywh = np.column_stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2,
+                                boxes[:, 2], boxes[:, 3]])
+        # NMS por clase, como Ultralytics: desplazar cada clase a su propia
+        # región para que cajas de clases distintas nunca se supriman entre sí
+        offset = cls[:, None].astype(np.float32) * NMS_MAX_WH
+        shifted = np.column_stack([xywh[:, :2] + offset, xywh[:, 2:]])
+        idx = cv2.dnn.NMSBoxes(shifted.tolist(), conf.tolist(), self.conf, self.iou)
+        idx = np.array(idx, dtype=np.intp).reshape(-1)
+
+        xyxy = np.column_stack([xywh[idx, 0], xywh[idx, 1],
+                                xywh[idx, 0] + xywh[idx, 2], xywh[idx, 1] + xywh[idx, 3]])
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / gain).clip(0, shape[1])
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / gain).clip(0, shape[0])
+        return np.column_stack([xyxy, conf[idx], cls[idx]]).astype(np.float32)
+
+    def predict_batch(self, frames):
+        frames = list(frames)
+        if not frames:
+            return []
+        x, meta = self._preprocess(frames)
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: x})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: x[i:i + 1]})[0]
+                                      for i in range(len(frames))])
+        return [self._postprocess(pred, *m) for pred, m in zip(outputs, meta)]
+
+
+def warm_up(backend, resolution=(640, 480)):
+    """Pasada de inferencia sobre un frame negro para inicializar el backend."""
+    width, height = resolution
+    backend.predict_batch([np.zeros((height, width, 3), dtype=np.uint8)])
+
+
+def create_backend(name=None, **kwargs):
+    """
+    Construye el backend indicado por `name` o por la variable de entorno
+    DETECTOR_BACKEND (pytorch | onnx | onnx-int8 | openvino).
+    """
+    name = (name or os.environ.get("DETECTOR_BACKEND", "pytorch")).lower()
+    if name == "pytorch":
+        return UltralyticsBackend(**kwargs)
+    if name in ("onnx", "onnx-int8"):
+        kwargs.setdefault("model_path", ONNX_INT8_PATH if name == "onnx-int8" else ONNX_PATH)
+        kwargs.setdefault("threads", int(os.environ.get("ONNX_THREADS", "0")))
+        backend = OnnxBackend(**kwargs)
+        backend.name = name
+        return backend
+    if name == "openvino":
+        kwargs.setdefault("model_path", OPENVINO_PATH)
+        backend = UltralyticsBackend(**kwargs)
+        backend.name = "openvino"
+        return backend
+    raise ValueError(f"Backend de detección desconocido: {name}")
@@ -1,4 +1,9 @@
 # draw_spots.py — Captura un frame de la cámara Logitech y guarda coordenadas en config/parking_spots.json
+#
+# Dos modos:
+#   python draw_spots.py          define todas las plazas desde cero (borra las existentes)
+#   python draw_spots.py --edit   edita las plazas existentes y aplica solo las diferencias,
+#                                 conservando UUID e historial de las plazas no tocadas
 
 import cv2
 import json
@@ -78,6 +83,13 @@ def capture_frame(video_source=0):
             return None
 
 
+def space_code_for(index):
+    """Código de plaza para el número `index` (desde 1): A-01 ... A-99, B-01 ..."""
+    letter = chr(65 + ((index - 1) // 99))  # A, B, C...
+    number = str(((index - 1) % 99) + 1).zfill(2)
+    return f"{letter}-{number}"
+
+
 def define_spots(video_source=0):
     """Captura un frame y permite definir zonas de estacionamiento, guardando el resultado en JSON."""
     # Crear carpeta config si no existe
@@ -173,9 +185,7 @@ def define_spots(video_source=0):
                     
                     # Generar UUID y código de espacio
                     space_uuid = str(uuid.uuid4())
-                    letter = chr(65 + ((spot["id"] - 1) // 99))  # A, B, C...
-                    number = str(((spot["id"] - 1) % 99) + 1).zfill(2)
-                    space_code = f"{letter}-{number}"
+                    space_code = space_code_for(spot["id"])
                     
                     # Insertar en la base de datos
                     cursor.execute(
@@ -217,6 +227,253 @@ def define_spots(video_source=0):
 
 
 
+# ========== MODO EDICIÓN INCREMENTAL ==========
+def load_existing_spots(conn):
+    """Lee las plazas con coordenadas desde Oracle: [{"uuid", "spaceCode", "coords"}]."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            'SELECT "id", "spaceCode", "x1", "y1", "x2", "y2" FROM "parking_spaces" '
+            'WHERE "x1" IS NOT NULL ORDER BY "spaceCode"'
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [
+        {"uuid": space_uuid, "spaceCode": code, "coords": [(x1, y1), (x2, y2)]}
+        for space_uuid, code, x1, y1, x2, y2 in rows
+    ]
+
+
+def _same_coords(a, b):
+    return [tuple(map(int, p)) for p in a] == [tuple(map(int, p)) for p in b]
+
+
+def compute_spot_diff(original, edited):
+    """
+    Compara las plazas originales con las editadas.
+    Devuelve (nuevas, movidas, uuids_eliminados).
+    """
+    by_uuid = {s["uuid"]: s for s in original}
+    kept = {s["uuid"] for s in edited if s.get("uuid")}
+    inserts = [s for s in edited if not s.get("uuid")]
+    updates = [
+        s for s in edited
+        if s.get("uuid") and not _same_coords(s["coords"], by_uuid[s["uuid"]]["coords"])
+    ]
+    deletes = [space_uuid for space_uuid in by_uuid if space_uuid not in kept]
+    return inserts, updates, deletes
+
+
+def assign_space_codes(spots):
+    """Asigna a las plazas nuevas el primer código libre (reutiliza los de plazas borradas)."""
+    used = {s["spaceCode"] for s in spots if s.get("spaceCode")}
+    index = 1
+    for spot in spots:
+        if spot.get("spaceCode"):
+            continue
+        while space_code_for(index) in used:
+            index += 1
+        spot["spaceCode"] = space_code_for(index)
+        used.add(spot["spaceCode"])
+
+
+def _has_sensor_link(cursor):
+    """Indica si la tabla heredada "sensors" referencia a parking_spaces."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM user_tab_columns "
+        "WHERE table_name = 'sensors' AND column_name = 'parkingSpaceId'"
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def apply_spot_diff(conn, original, edited):
+    """
+    Aplica solo las diferencias en una transacción, con un executemany por
+    tipo de sentencia. Las plazas eliminadas se llevan sus eventos (la FK de
+    occupancy_events no admite huérfanos); el resto conserva UUID, estado e
+    historial. Devuelve (insertadas, movidas, eliminadas).
+    """
+    inserts, updates, deletes = compute_spot_diff(original, edited)
+    if not (inserts or updates or deletes):
+        return 0, 0, 0
+
+    now = datetime.now()
+    cursor = conn.cursor()
+    try:
+        if deletes:
+            rows = [(space_uuid,) for space_uuid in deletes]
+            cursor.executemany('DELETE FROM "occupancy_events" WHERE "parkingSpaceId" = :1', rows)
+            if _has_sensor_link(cursor):
+                cursor.executemany('DELETE FROM "sensors" WHERE "parkingSpaceId" = :1', rows)
+            cursor.executemany('DELETE FROM "parking_spaces" WHERE "id" = :1', rows)
+        if updates:
+            cursor.executemany(
+                'UPDATE "parking_spaces" SET "x1" = :1, "y1" = :2, "x2" = :3, "y2" = :4, '
+                '"updatedAt" = :5 WHERE "id" = :6',
+                [
+                    (int(x1), int(y1), int(x2), int(y2), now, s["uuid"])
+                    for s in updates
+                    for (x1, y1), (x2, y2) in [s["coords"]]
+                ],
+            )
+        if inserts:
+            cursor.executemany(
+                'INSERT INTO "parking_spaces" '
+                '("id", "spaceCode", "status", "x1", "y1", "x2", "y2", "createdAt", "updatedAt") '
+                'VALUES (:1, :2, :3, :4, :5, :6, :7, :8, :9)',
+                [
+                    (str(uuid.uuid4()), s["spaceCode"], 'unknown',
+                     int(x1), int(y1), int(x2), int(y2), now, now)
+                    for s in inserts
+                    for (x1, y1), (x2, y2) in [s["coords"]]
+                ],
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(inserts), len(updates), len(deletes)
+
+
+def _spot_at(spots, x, y):
+    """Índice de la plaza (la última dibujada) que contiene el punto, o None."""
+    for i in range(len(spots) - 1, -1, -1):
+        (x1, y1), (x2, y2) = spots[i]["coords"]
+        if min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2):
+            return i
+    return None
+
+
+def edit_spots(video_source=0):
+    """
+    Carga las plazas existentes sobre un frame nuevo y permite agregar, mover
+    o borrar rectángulos individuales. Al guardar se actualiza el JSON y en la
+    BD se aplican solo los cambios (ver apply_spot_diff).
+    """
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+
+    conn = None
+    original = []
+    if DB_AVAILABLE:
+        try:
+            conn = oracledb.connect(**DB_CONFIG)
+            original = load_existing_spots(conn)
+            print(f"[✅ BD] {len(original)} plazas cargadas desde Oracle")
+        except Exception as e:
+            print(f"[ERROR BD] No se pudieron cargar las plazas: {e}")
+            if conn:
+                conn.close()
+            return
+    elif os.path.exists(SPOTS_FILE):
+        with open(SPOTS_FILE) as f:
+            original = [
+                {"uuid": None, "spaceCode": None, "coords": [tuple(p) for p in s["coords"]]}
+                for s in json.load(f)
+            ]
+        print(f"[INFO] {len(original)} plazas cargadas desde {SPOTS_FILE}")
+
+    try:
+        img = capture_frame(video_source)
+        if img is None:
+            print("[ERROR] No se pudo capturar el frame. Terminando.")
+            return
+
+        spots = [dict(s) for s in original]
+        current = []
+        drag = None  # (índice, x inicial, y inicial, coords originales)
+
+        def render():
+            canvas = img.copy()
+            for i, spot in enumerate(spots):
+                (x1, y1), (x2, y2) = spot["coords"]
+                if drag is not None and drag[0] == i:
+                    color = (0, 255, 255)  # moviéndose
+                elif conn is not None and not spot.get("uuid"):
+                    color = (255, 255, 0)  # nueva
+                else:
+                    color = (0, 255, 0)
+                cv2.rectangle(canvas, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+                cv2.putText(canvas, spot.get("spaceCode") or str(i + 1), (int(x1), int(y1) - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1)
+            for point in current:
+                cv2.circle(canvas, point, 5, (0, 0, 255), -1)
+            cv2.imshow("Edit Spots", canvas)
+
+        def click_event(event, x, y, flags, param):
+            nonlocal current, drag
+            if event == cv2.EVENT_LBUTTONDOWN:
+                hit = _spot_at(spots, x, y) if not current else None
+                if hit is not None:
+                    drag = (hit, x, y, spots[hit]["coords"])
+                else:
+                    current.append((x, y))
+                    if len(current) == 2:
+                        (x1, y1), (x2, y2) = current
+                        if x1 != x2 and y1 != y2:
+                            spots.append({"uuid": None, "spaceCode": None, "coords": current})
+                        else:
+                            print(f"[AVISO] Rectángulo inválido en {current}, se ignorará.")
+                        current = []
+            elif event == cv2.EVENT_MOUSEMOVE and drag is not None:
+                i, x0, y0, ((x1, y1), (x2, y2)) = drag
+                dx, dy = x - x0, y - y0
+                spots[i] = dict(spots[i], coords=[(x1 + dx, y1 + dy), (x2 + dx, y2 + dy)])
+            elif event == cv2.EVENT_LBUTTONUP:
+                drag = None
+            elif event == cv2.EVENT_RBUTTONDOWN:
+                hit = _spot_at(spots, x, y)
+                if hit is not None:
+                    removed = spots.pop(hit)
+                    print(f"[INFO] Plaza {removed.get('spaceCode') or 'nueva'} eliminada")
+            render()
+
+        cv2.namedWindow("Edit Spots")
+        cv2.setMouseCallback("Edit Spots", click_event)
+
+        print("🟩 Instrucciones (modo edición):")
+        print("  • Clic izquierdo en zona vacía = dos puntos para una plaza nueva")
+        print("  • Arrastrar con clic izquierdo = mover una plaza")
+        print("  • Clic derecho sobre una plaza = eliminarla")
+        print("  • 'q' = guardar y salir   • 'x' = salir sin guardar")
+
+        render()
+        while True:
+            key = cv2.waitKey(20)
+            if key == ord("q"):
+                break
+            if key == ord("x"):
+                cv2.destroyAllWindows()
+                print("[INFO] Edición descartada.")
+                return
+        cv2.destroyAllWindows()
+
+        if conn is not None:
+            assign_space_codes(spots)
+            spots.sort(key=lambda s: s["spaceCode"])
+
+        try:
+            with open(SPOTS_FILE, "w") as f:
+                json.dump([{"id": i, "coords": s["coords"]} for i, s in enumerate(spots, start=1)],
+                          f, indent=4)
+            print(f"[✅ OK] {len(spots)} lugares guardados en {SPOTS_FILE}")
+        except Exception as e:
+            print(f"[ERROR] No se pudo guardar el archivo {SPOTS_FILE}: {e}")
+
+        if conn is not None:
+            try:
+                added, moved, removed = apply_spot_diff(conn, original, spots)
+                print(f"[🎉 COMPLETADO] {added} nuevas, {moved} movidas, {removed} eliminadas "
+                      f"({len(spots) - added - moved} sin cambios)")
+            except Exception as e:
+                print(f"[ERROR BD] No se pudieron aplicar los cambios (se revirtió todo): {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
 def draw_spots(frame, spots_cache=None):
     """Dibuja las zonas de estacionamiento guardadas en el frame."""
     if spots_cache is not None:
@@ -249,5 +506,15 @@ def draw_spots(frame, spots_cache=None):
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Definir o editar plazas de estacionamiento")
+    parser.add_argument("--edit", action="store_true",
+                        help="Editar las plazas existentes y aplicar solo los cambios en la BD")
+    args = parser.parse_args()
+
     # Usa directamente tu cámara Logitech
-    define_spots(CAMERA_INDEX)
+    if args.edit:
+        edit_spots(CAMERA_INDEX)
+    else:
+        define_spots(CAMERA_INDEX)
@@ -0,0 +1,332 @@
+# event_retention.py — Retención, compactación y mantenimiento de occupancy_events
+#
+# "occupancy_events" crece sin límite: cada cambio de estado es una fila. Este
+# trabajo de mantenimiento conserva los eventos crudos de los últimos
+# EVENT_RETENTION_DAYS días y, para lo anterior:
+#
+# 1. Compacta: reconstruye "occupancy_rollups" para los días que se van a
+#    purgar (backfill por rango de occupancy_rollups.py). Los eventos que
+#    llegan por el receptor FastAPI no pasan por RollupTracker, así que antes
+#    de borrar la fuente se recalculan los agregados desde los eventos.
+# 2. Registra el corte en "occupancy_retention": desde ahí los agregados
+#    anteriores son la única copia y el backfill ya no los reconstruye.
+# 3. Purga en lotes acotados (DELETE ... ROWNUM <= n, commit por lote) para no
+#    generar un undo enorme ni bloquear al escritor. Se conserva el último
+#    evento anterior al corte de cada plaza (marcado una vez por ROWID): es el
+#    estado de partida del siguiente backfill y del RollupTracker.
+#
+# Además verifica el índice ("parkingSpaceId", "timestamp") que usan el
+# backfill, la purga y las consultas por plaza, y sugiere (o aplica con
+# --partition) el particionado por intervalo mensual de "timestamp".
+#
+# "occupancy_events" pertenece al backend (TypeORM con synchronize: true), que
+# borra los índices que su entidad no declara. Por eso el índice está
+# declarado en OccupancyEvent (backend/src/modules/occupancy/
+# occupancy-event.entity.ts) con el mismo nombre, y aquí solo se verifica;
+# --create-index lo crea si el backend aún no sincronizó. El particionado
+# tampoco lo conoce TypeORM: antes de aplicarlo, desactivar synchronize.
+#
+# Uso (por ejemplo una vez por día desde cron):
+#   cd src
+#   python event_retention.py --dry-run
+#   python event_retention.py [--retention-days 90] [--batch-size 10000]
+#   python event_retention.py --partition
+
+import argparse
+from datetime import datetime, timedelta
+
+from config.db_config import EVENT_RETENTION_DAYS
+
+PURGE_BATCH = 10000     # filas por DELETE / commit
+
+INDEX_NAME = "IDX_occupancy_events_space_ts"  # el de @Index en OccupancyEvent
+CREATE_INDEX_SQL = f'CREATE INDEX "{INDEX_NAME}" ON "occupancy_events" ("parkingSpaceId", "timestamp")'
+# Cualquier índice que empiece por ("parkingSpaceId", "timestamp") sirve
+FIND_INDEX_SQL = (
+    "SELECT c1.index_name FROM user_ind_columns c1 "
+    "JOIN user_ind_columns c2 ON c2.index_name = c1.index_name "
+    "AND c2.column_position = 2 AND c2.column_name = 'timestamp' "
+    "WHERE c1.table_name = 'occupancy_events' "
+    "AND c1.column_position = 1 AND c1.column_name = 'parkingSpaceId'"
+)
+
+CREATE_WATERMARK_SQL = (
+    'CREATE TABLE "occupancy_retention" ('
+    ' "purgedBefore" TIMESTAMP NOT NULL,'
+    ' "runAt" TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL)'
+)
+WATERMARK_SQL = 'SELECT MAX("purgedBefore") FROM "occupancy_retention"'
+INSERT_WATERMARK_SQL = 'INSERT INTO "occupancy_retention" ("purgedBefore") VALUES (:1)'
+
+# Último evento anterior al corte de cada plaza: no se borra. Se calcula una
+# sola vez por corrida en una tabla temporal de sesión (ROWID), así cada lote
+# de DELETE es un anti-join contra unas pocas filas en lugar de volver a
+# agregar todo lo anterior al corte. En empates de instante se conserva el
+# mismo evento que elige STATE_BEFORE_SQL (MAX("status") KEEP ... LAST).
+CREATE_ANCHORS_SQL = (
+    'CREATE GLOBAL TEMPORARY TABLE "occupancy_retention_anchors" ('
+    ' "rid" UROWID NOT NULL) ON COMMIT PRESERVE ROWS'
+)
+CLEAR_ANCHORS_SQL = 'DELETE FROM "occupancy_retention_anchors"'
+FILL_ANCHORS_SQL = (
+    'INSERT INTO "occupancy_retention_anchors" ("rid") '
+    'SELECT rid FROM (SELECT ROWID AS rid, ROW_NUMBER() OVER '
+    '(PARTITION BY "parkingSpaceId" ORDER BY "timestamp" DESC, "status" DESC) AS rn '
+    'FROM "occupancy_events" WHERE "timestamp" < :cutoff) WHERE rn = 1'
+)
+PURGE_SQL = (
+    'DELETE FROM "occupancy_events" e WHERE e."timestamp" < :cutoff AND ROWNUM <= :batch '
+    'AND NOT EXISTS (SELECT 1 FROM "occupancy_retention_anchors" a WHERE a."rid" = e.ROWID)'
+)
+# Se borra todo lo anterior al corte salvo un evento por plaza
+COUNT_PURGE_SQL = (
+    'SELECT COUNT(*) - COUNT(DISTINCT "parkingSpaceId") FROM "occupancy_events" '
+    'WHERE "timestamp" < :cutoff'
+)
+
+PARTITIONED_SQL = "SELECT partitioned FROM user_tables WHERE table_name = 'occupancy_events'"
+# Particiones mensuales creadas por Oracle a medida que llegan eventos
+PARTITION_SQL = (
+    'ALTER TABLE "occupancy_events" MODIFY PARTITION BY RANGE ("timestamp") '
+    "INTERVAL (NUMTOYMINTERVAL(1, 'MONTH')) "
+    "(PARTITION \"p_initial\" VALUES LESS THAN (TIMESTAMP '{boundary}')) "
+    'ONLINE'
+)
+PARTITION_INDEX_CLAUSE = ' UPDATE INDEXES ("{index}" LOCAL)'
+
+
+
+def retention_cutoff(now=None, days=EVENT_RETENTION_DAYS):
+    """Inicio del día de hace `days` días: se conservan los eventos desde ahí."""
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _execute_ddl(conn, sql, ignore):
+    """Ejecuta DDL ignorando los códigos ORA de `ignore` (ya existe). True si se aplicó."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        return True
+    except Exception as e:
+        if not any(code in str(e) for code in ignore):
+            raise
+        return False
+    finally:
+        cursor.close()
+
+
+def find_index(conn):
+    """Nombre de un índice que empiece por ("parkingSpaceId", "timestamp"), o None."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(FIND_INDEX_SQL)
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+
+
+def ensure_index(conn, create=False):
+    """
+    Verifica el índice ("parkingSpaceId", "timestamp"). Lo declara la entidad
+    del backend; con `create` se crea aquí con el mismo nombre (TypeORM lo
+    adopta en vez de borrarlo). Devuelve el nombre del índice o None.
+    """
+    index = find_index(conn)
+    if index is not None:
+        return index
+    if create:
+        if _execute_ddl(conn, CREATE_INDEX_SQL, ("ORA-00955", "ORA-01408")):
+            print(f'[INFO] Índice "{INDEX_NAME}" creado')
+        return INDEX_NAME
+    print(f'[WARNING] "occupancy_events" no tiene índice ("parkingSpaceId", "timestamp"): la purga y '
+          f'el backfill recorrerán la tabla completa. Lo crea el backend al sincronizar la entidad '
+          f'OccupancyEvent, o este script con --create-index.')
+    return None
+
+
+def ensure_watermark_table(conn):
+    if _execute_ddl(conn, CREATE_WATERMARK_SQL, ("ORA-00955",)):
+        print('[INFO] Tabla "occupancy_retention" creada')
+
+
+def purged_before(conn):
+    """Corte de la última purga, o None si nunca se purgó (ORA-00942 = sin tabla)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(WATERMARK_SQL)
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        if "ORA-00942" not in str(e):
+            raise
+        return None
+    finally:
+        cursor.close()
+
+
+def oldest_event(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MIN("timestamp") FROM "occupancy_events"')
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+
+
+def count_purgeable(conn, cutoff):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(COUNT_PURGE_SQL, cutoff=cutoff)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def compact(conn, cutoff, batch_size=PURGE_BATCH):
+    """Reconstruye los agregados de [último corte u evento más antiguo, cutoff)."""
+    import occupancy_rollups
+
+    start = purged_before(conn) or oldest_event(conn)
+    if start is None or start >= cutoff:
+        print("[INFO] Nada que compactar")
+        return 0, 0
+    occupancy_rollups.ensure_table(conn)
+    events, written = occupancy_rollups.backfill(conn, start, cutoff, batch_size)
+    print(f"[INFO] Compactados {events} eventos de {start:%Y-%m-%d} a {cutoff:%Y-%m-%d} → {written} filas de agregados")
+    return events, written
+
+
+def record_watermark(conn, cutoff):
+    ensure_watermark_table(conn)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(INSERT_WATERMARK_SQL, (cutoff,))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def _mark_anchors(cursor, cutoff):
+    """Llena la tabla temporal con el ROWID del último evento de cada plaza antes del corte."""
+    cursor.execute(CLEAR_ANCHORS_SQL)
+    cursor.execute(FILL_ANCHORS_SQL, cutoff=cutoff)
+    return cursor.rowcount
+
+
+def purge(conn, cutoff, batch_size=PURGE_BATCH):
+    """Borra los eventos anteriores a `cutoff` en lotes de `batch_size`, un commit por lote."""
+    _execute_ddl(conn, CREATE_ANCHORS_SQL, ("ORA-00955",))
+    cursor = conn.cursor()
+    deleted = 0
+    try:
+        anchors = _mark_anchors(cursor, cutoff)
+        conn.commit()
+        print(f"[INFO] Se conserva el último evento anterior al corte de {anchors} plazas")
+        while True:
+            cursor.execute(PURGE_SQL, cutoff=cutoff, batch=batch_size)
+            count = cursor.rowcount
+            conn.commit()
+            deleted += count
+            if count:
+                print(f"[INFO] Purga: {deleted} eventos borrados")
+            if count < batch_size:
+                break
+        cursor.execute(CLEAR_ANCHORS_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return deleted
+
+
+def check_partitioning(conn, apply=False, now=None, index=None):
+    """
+    Informa si "occupancy_events" está particionada; con `apply` la particiona
+    (`index` se convierte en índice local).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(PARTITIONED_SQL)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        print('[WARNING] No se encontró "occupancy_events" en el esquema actual')
+        return False
+    if row[0] == "YES":
+        print('[INFO] "occupancy_events" ya está particionada')
+        return True
+
+    boundary = (now or datetime.now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    sql = PARTITION_SQL.format(boundary=f"{boundary:%Y-%m-%d %H:%M:%S}")
+    if index is not None:
+        sql += PARTITION_INDEX_CLAUSE.format(index=index)
+    if not apply:
+        print('[INFO] "occupancy_events" no está particionada. Para particionar por mes '
+              '(requiere Oracle 12.2+, la opción Partitioning y synchronize desactivado en el '
+              'backend), ejecutar con --partition o:')
+        print(f"  {sql}")
+        return False
+    _execute_ddl(conn, sql, ())
+    print('[INFO] ✅ "occupancy_events" particionada por mes')
+    return True
+
+
+def run(conn, retention_days=EVENT_RETENTION_DAYS, batch_size=PURGE_BATCH, dry_run=False,
+        compaction=True, partition=False, create_index=False, now=None):
+    """Mantenimiento completo; devuelve un resumen con lo hecho (o lo que se haría)."""
+    cutoff = retention_cutoff(now, retention_days)
+    summary = {"cutoff": cutoff, "compacted": 0, "purged": 0}
+    print(f"[INFO] Retención de {retention_days} días: se conservan los eventos desde {cutoff:%Y-%m-%d}")
+
+    if dry_run:
+        summary["purged"] = count_purgeable(conn, cutoff)
+        print(f"[INFO] (dry-run) Se borrarían {summary['purged']} eventos")
+        check_partitioning(conn, apply=False, now=now, index=ensure_index(conn))
+        return summary
+
+    index = ensure_index(conn, create=create_index)
+    if compaction:
+        summary["compacted"], _ = compact(conn, cutoff, batch_size)
+    # El corte se registra antes de borrar: si la purga se corta a mitad de
+    # camino, un backfill posterior no reconstruye días ya incompletos
+    record_watermark(conn, cutoff)
+    summary["purged"] = purge(conn, cutoff, batch_size)
+    check_partitioning(conn, apply=partition, now=now, index=index)
+    return summary
+
+
+def main():
+    import db_pool
+
+    parser = argparse.ArgumentParser(description="Retención y compactación de occupancy_events")
+    parser.add_argument("--retention-days", type=int, default=EVENT_RETENTION_DAYS,
+                        help=f"Días de eventos crudos a conservar (por defecto {EVENT_RETENTION_DAYS})")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH, help="Filas por lote de borrado")
+    parser.add_argument("--dry-run", action="store_true", help="Solo informar cuántos eventos se borrarían")
+    parser.add_argument("--no-compact", action="store_true",
+                        help="No reconstruir los agregados antes de purgar")
+    parser.add_argument("--partition", action="store_true",
+                        help="Particionar occupancy_events por mes si aún no lo está "
+                             "(desactivar antes synchronize en el backend)")
+    parser.add_argument("--create-index", action="store_true",
+                        help="Crear el índice (parkingSpaceId, timestamp) si el backend aún no lo creó")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    with db_pool.connection() as conn:
+        summary = run(conn, args.retention_days, args.batch_size, args.dry_run,
+                      compaction=not args.no_compact, partition=args.partition,
+                      create_index=args.create_index)
+    if not args.dry_run:
+        print(f"[INFO] ✅ Mantenimiento completo: {summary['purged']} eventos purgados "
+              f"en {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
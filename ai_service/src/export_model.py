@@ -0,0 +1,73 @@
+# export_model.py — Exporta best.pt a formatos optimizados para CPU
+#
+# Uso:
+#   cd src
+#   python export_model.py --onnx               # best.onnx (batch dinámico)
+#   python export_model.py --onnx --int8        # + best.int8.onnx (cuantización dinámica)
+#   python export_model.py --openvino [--int8]  # best_openvino_model/ (IR, opcional INT8)
+#
+# Luego se elige el backend con DETECTOR_BACKEND=onnx|onnx-int8|openvino.
+
+import argparse
+import shutil
+from pathlib import Path
+
+from detector_backends import IMGSZ, ONNX_INT8_PATH, ONNX_PATH, OPENVINO_PATH, PT_PATH
+
+
+def export_onnx(pt_path=PT_PATH, imgsz=IMGSZ):
+    from ultralytics import YOLO
+
+    out = YOLO(str(pt_path)).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    out = Path(out)
+    if out != ONNX_PATH:
+        shutil.move(str(out), ONNX_PATH)
+    print(f"[✅ OK] Modelo ONNX exportado en {ONNX_PATH}")
+    return ONNX_PATH
+
+
+def quantize_onnx(onnx_path=ONNX_PATH, out_path=ONNX_INT8_PATH):
+    """Cuantización dinámica de pesos a INT8 (no necesita dataset de calibración)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(onnx_path), str(out_path), weight_type=QuantType.QUInt8)
+    print(f"[✅ OK] Modelo ONNX INT8 en {out_path}")
+    return out_path
+
+
+def export_openvino(pt_path=PT_PATH, imgsz=IMGSZ, int8=False, data=None):
+    from ultralytics import YOLO
+
+    kwargs = {"format": "openvino", "imgsz": imgsz, "int8": int8}
+    if int8 and data:
+        kwargs["data"] = data  # dataset de calibración para INT8
+    out = Path(YOLO(str(pt_path)).export(**kwargs))
+    if out != OPENVINO_PATH:
+        if OPENVINO_PATH.exists():
+            shutil.rmtree(OPENVINO_PATH)
+        shutil.move(str(out), OPENVINO_PATH)
+    print(f"[✅ OK] Modelo OpenVINO IR exportado en {OPENVINO_PATH}")
+    return OPENVINO_PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el detector a ONNX / OpenVINO")
+    parser.add_argument("--onnx", action="store_true", help="Exportar a ONNX")
+    parser.add_argument("--openvino", action="store_true", help="Exportar a OpenVINO IR")
+    parser.add_argument("--int8", action="store_true", help="Generar también la variante INT8")
+    parser.add_argument("--data", default=None, help="YAML del dataset para calibrar OpenVINO INT8")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ)
+    args = parser.parse_args()
+
+    if not (args.onnx or args.openvino):
+        parser.error("Indica al menos --onnx o --openvino")
+
+    if not PT_PATH.exists():
+        raise SystemExit(f"[ERROR] No se encontró el modelo {PT_PATH}")
+
+    if args.onnx:
+        export_onnx(imgsz=args.imgsz)
+        if args.int8:
+            quantize_onnx()
+    if args.openvino:
+        export_openvino(imgsz=args.imgsz, int8=args.int8, data=args.data)
@@ -0,0 +1,252 @@
+# metrics.py — Métricas del monitor en formato Prometheus
+#
+# Registro mínimo sin dependencias: contadores, gauges e histogramas con
+# etiquetas opcionales, y un servidor HTTP que los expone en /metrics con el
+# formato de texto de Prometheus (0.0.4). Registrar una observación es una
+# suma bajo un lock; el texto se arma solo cuando alguien consulta /metrics.
+#
+# Los gauges (y contadores) pueden tomar su valor de una función, evaluada en
+# cada scrape, para publicar cosas que ya se cuentan en otro lado (profundidad
+# de colas, spool de write_behind.py) sin tocar el bucle principal.
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Segundos: de 1 ms a 10 s, cubre desde la ocupación hasta una escritura lenta en Oracle
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.label_names:
+            self._children[()] = self._new_child()  # publicar 0 desde el inicio
+
+    def labels(self, *values):
+        """Devuelve la serie con esas etiquetas (se crea la primera vez)."""
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} espera etiquetas {self.label_names}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.label_names, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+        self._fn = None
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        """Toma el valor de `fn()` en cada scrape en lugar de inc()/set()."""
+        self._fn = fn
+        return self
+
+    def render(self, name, label_names, key):
+        value = self.value
+        if self._fn is not None:
+            try:
+                value = self._fn()
+            except Exception:
+                return []  # la fuente no está disponible (p. ej. spool cerrado)
+        return [f"{name}{_format_labels(label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def set_function(self, fn):
+        return self._default().set_function(fn)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, fn):
+        return self._default().set_function(fn)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def render(self, name, label_names, key):
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(label_names, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(label_names, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(label_names, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(label_names, key)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+
+class Registry:
+    """Conjunto de métricas de un proceso; render() produce el texto de /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo")
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class MonitorMetrics:
+    """Métricas del bucle del monitor (serie o pipeline)."""
+
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.stage_seconds = registry.histogram(
+            "parking_stage_seconds", "Duración de cada etapa del monitor", labels=("stage",))
+        self.frames = registry.counter("parking_frames_total", "Frames capturados")
+        self.frames_skipped = registry.counter(
+            "parking_frames_skipped_total", "Frames sin inferencia (compuerta de movimiento o FRAME_SKIP)")
+        self.inferences = registry.counter("parking_inferences_total", "Inferencias ejecutadas")
+        self.db_writes = registry.counter(
+            "parking_db_writes_total", "Cambios de estado enviados a la BD (o al spool)")
+        self.queue_depth = registry.gauge("parking_queue_depth", "Elementos pendientes por cola",
+                                          labels=("queue",))
+
+    def stage(self, name):
+        """Histograma de la etapa `name` (capture, inference, occupancy, db, ...)."""
+        return self.stage_seconds.labels(name)
+
+    def watch_queue(self, name, fn):
+        """Publica `fn()` como profundidad de la cola `name` en cada scrape."""
+        return self.queue_depth.labels(name).set_function(fn)
+
+
+def serve_metrics(port, registry=REGISTRY, host="0.0.0.0"):
+    """Expone `registry` en http://<host>:<port>/metrics para Prometheus."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[INFO] Métricas Prometheus en http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,105 @@
+# monitor_log.py — Logging estructurado con nivel para el camino caliente
+#
+# El resto del proyecto informa con print("[INFO] ..."); los mensajes que se
+# emiten por frame o por plaza pasan por aquí. Se usa el módulo logging con
+# el mismo formato "[NIVEL] mensaje" (o una línea JSON por evento con
+# LOG_FORMAT=json), y los llamadores del bucle consultan `enabled(DEBUG)`
+# antes de armar el mensaje: con el nivel desactivado no se formatea ni se
+# recorre nada.
+#
+# Variables de entorno:
+#   LOG_LEVEL   DEBUG, INFO (por defecto), WARNING o ERROR
+#   LOG_FORMAT  text (por defecto) o json
+#   DEBUG_OCCUPANCY=1 equivale a LOG_LEVEL=DEBUG (compatibilidad)
+
+import json
+import logging
+import os
+import sys
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+LOGGER_NAME = "parking"
+
+
+class TextFormatter(logging.Formatter):
+    """Formato "[NIVEL] mensaje clave=valor ...", como el resto de la salida del monitor."""
+
+    def format(self, record):
+        text = f"[{record.levelname}] {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por evento: ts, level, logger, msg y los campos adicionales."""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        event.update(getattr(record, "fields", None) or {})
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def _configure():
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.handlers:
+        return logger
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    if os.environ.get("DEBUG_OCCUPANCY") == "1":
+        level = "DEBUG"
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if os.environ.get("LOG_FORMAT") == "json" else TextFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+
+_LOGGER = _configure()
+
+
+def get_logger(name=None):
+    """Logger del monitor (o un hijo, p. ej. get_logger("occupancy"))."""
+    return _LOGGER.getChild(name) if name else _LOGGER
+
+
+def enabled(level, logger=_LOGGER):
+    """True si `level` se emite; usarlo antes de armar mensajes costosos."""
+    return logger.isEnabledFor(level)
+
+
+def log(level, msg, logger=_LOGGER, **fields):
+    """Emite `msg` con campos estructurados (ignorado si el nivel está desactivado)."""
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, extra={"fields": fields})
+
+
+def debug(msg, **fields):
+    log(DEBUG, msg, **fields)
+
+
+def info(msg, **fields):
+    log(INFO, msg, **fields)
+
+
+def warning(msg, **fields):
+    log(WARNING, msg, **fields)
+
+
+def error(msg, **fields):
+    log(ERROR, msg, **fields)
+
+
+def set_level(level):
+    """Cambia el nivel en tiempo de ejecución ("DEBUG", logging.INFO, ...)."""
+    _LOGGER.setLevel(level if isinstance(level, int) else getattr(logging, str(level).upper()))
@@ -0,0 +1,133 @@
+# motion_gate.py — Compuerta de movimiento delante de detect_vehicles
+#
+# Un estacionamiento está quieto la mayor parte del tiempo. En lugar de correr
+# YOLO cada FRAME_SKIP frames, se compara una versión reducida en grises del
+# frame actual contra la del último frame inferido, solo dentro (y cerca) de
+# las plazas. Se infiere si cambió suficiente área o si venció el refresco
+# forzado.
+
+import time
+
+import cv2
+import numpy as np
+
+SCALE = 0.25               # factor de reducción del frame para comparar
+PIXEL_THRESHOLD = 25       # diferencia de gris (0-255) para contar un píxel como cambiado
+MIN_CHANGED_RATIO = 0.01   # fracción del ROI que debe cambiar para inferir
+ROI_MARGIN = 12            # píxeles (a resolución completa) alrededor de cada plaza
+REFRESH_INTERVAL = 30.0    # segundos máximos sin inferir
+
+
+class MotionGate:
+    """Decide si vale la pena correr el detector sobre un frame."""
+
+    def __init__(self, spots, scale=SCALE, pixel_threshold=PIXEL_THRESHOLD,
+                 min_changed_ratio=MIN_CHANGED_RATIO, roi_margin=ROI_MARGIN,
+                 refresh_interval=REFRESH_INTERVAL):
+        self.spots = spots
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.roi_margin = roi_margin
+        self.refresh_interval = refresh_interval
+
+        self._mask = None
+        self._mask_pixels = 0
+        self._reference = None
+        self._last_inference = 0.0
+
+        # Estadísticas
+        self.frames = 0
+        self.inferences = 0
+        self.forced = 0
+        self.confirmations = 0
+        self.gate_seconds = 0.0
+        self.inference_seconds = 0.0
+
+    def _build_mask(self, shape):
+        h, w = shape
+        mask = np.zeros((h, w), dtype=bool)
+        m = self.roi_margin
+        for spot in self.spots:
+            (x1, y1), (x2, y2) = spot["coords"]
+            xa, xb = sorted((x1, x2))
+            ya, yb = sorted((y1, y2))
+            xa = int(max(0, (xa - m) * self.scale))
+            ya = int(max(0, (ya - m) * self.scale))
+            xb = int(min(w, np.ceil((xb + m) * self.scale)))
+            yb = int(min(h, np.ceil((yb + m) * self.scale)))
+            mask[ya:yb, xa:xb] = True
+        if not mask.any():
+            mask[:] = True  # sin plazas visibles: vigilar todo el frame
+        self._mask = mask
+        self._mask_pixels = int(mask.sum())
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_ratio(self, small):
+        diff = cv2.absdiff(small, self._reference)
+        changed = (diff > self.pixel_threshold) & self._mask
+        return int(changed.sum()) / self._mask_pixels
+
+    def should_infer(self, frame, force=False):
+        """
+        True si hay que correr el detector sobre `frame`. Con `force` se infiere
+        siempre (p. ej. la histéresis espera observaciones para confirmar un
+        cambio) y el frame pasa a ser la referencia.
+        """
+        start = time.perf_counter()
+        self.frames += 1
+        small = self._prepare(frame)
+        if self._mask is None or self._mask.shape != small.shape:
+            self._build_mask(small.shape)
+            self._reference = None
+
+        now = time.monotonic()
+        if self._reference is None:
+            trigger = True
+        elif force:
+            trigger = True
+            self.confirmations += 1
+        elif now - self._last_inference >= self.refresh_interval:
+            trigger = True
+            self.forced += 1
+        else:
+            trigger = self.changed_ratio(small) >= self.min_changed_ratio
+
+        if trigger:
+            # La referencia es el último frame inferido: así también se
+            # detectan cambios lentos que no aparecen entre frames consecutivos
+            self._reference = small
+            self._last_inference = now
+            self.inferences += 1
+        self.gate_seconds += time.perf_counter() - start
+        return trigger
+
+    def record_inference(self, seconds):
+        """Registra cuánto tardó una inferencia, para estimar el CPU ahorrado."""
+        self.inference_seconds += seconds
+
+    def stats(self):
+        skipped = self.frames - self.inferences
+        avg_inference = self.inference_seconds / self.inferences if self.inferences else 0.0
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "forced_refreshes": self.forced,
+            "confirmations": self.confirmations,
+            "skipped": skipped,
+            "skip_ratio": skipped / self.frames if self.frames else 0.0,
+            "gate_ms_avg": self.gate_seconds / self.frames * 1000 if self.frames else 0.0,
+            "cpu_saved_s": skipped * avg_inference - self.gate_seconds,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[STATS] motion gate: {s['inferences']}/{s['frames']} frames inferidos "
+                f"(omitidos {s['skip_ratio']*100:.1f}%, refrescos forzados {s['forced_refreshes']}, "
+                f"confirmaciones {s['confirmations']}, "
+                f"costo {s['gate_ms_avg']:.2f}ms/frame, CPU ahorrado ≈{s['cpu_saved_s']:.1f}s)")
@@ -0,0 +1,134 @@
+# occupancy_engine.py — Cálculo vectorizado de ocupación con NumPy
+#
+# Las cajas de las plazas se normalizan una sola vez en una matriz (N, 4) y en
+# cada ciclo se calcula la matriz N×M de solapamientos contra todas las
+# detecciones en una sola pasada, sin bucles de Python por plaza/detección.
+
+import numpy as np
+
+from spot_index import SpotGridIndex
+
+OVERLAP_THRESHOLD = 0.02  # umbral muy bajo para toy cars pequeños
+MIN_CONFIDENCE = 0.3
+INDEX_MIN_SPOTS = 1000  # debajo de esto la matriz N×M completa es más rápida (ver benchmarks)
+
+
+def spots_to_boxes(spots):
+    """Convierte la lista de plazas en una matriz (N, 4) normalizada x1<x2, y1<y2."""
+    if not spots:
+        return np.zeros((0, 4), dtype=np.float32)
+    raw = np.array(
+        [[c[0][0], c[0][1], c[1][0], c[1][1]] for c in (s["coords"] for s in spots)],
+        dtype=np.float32,
+    )
+    return np.stack(
+        [
+            np.minimum(raw[:, 0], raw[:, 2]),
+            np.minimum(raw[:, 1], raw[:, 3]),
+            np.maximum(raw[:, 0], raw[:, 2]),
+            np.maximum(raw[:, 1], raw[:, 3]),
+        ],
+        axis=1,
+    )
+
+
+def detections_to_array(detections):
+    """
+    Acepta la salida de YOLO (`boxes.data`: x1, y1, x2, y2, conf, cls) o la
+    lista de tuplas de detect_vehicles (x1, y1, x2, y2, clase, conf) y
+    devuelve una matriz (M, 5) con x1, y1, x2, y2, conf.
+    """
+    if isinstance(detections, np.ndarray):
+        if detections.size == 0:
+            return np.zeros((0, 5), dtype=np.float32)
+        return detections[:, :5].astype(np.float32, copy=False)
+    if not detections:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.array([(d[0], d[1], d[2], d[3], d[5]) for d in detections], dtype=np.float32)
+
+
+def overlap_matrix(spot_boxes, det_boxes):
+    """Fracción del área de cada plaza cubierta por cada detección, forma (N, M)."""
+    ix1 = np.maximum(spot_boxes[:, None, 0], det_boxes[None, :, 0])
+    iy1 = np.maximum(spot_boxes[:, None, 1], det_boxes[None, :, 1])
+    ix2 = np.minimum(spot_boxes[:, None, 2], det_boxes[None, :, 2])
+    iy2 = np.minimum(spot_boxes[:, None, 3], det_boxes[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+
+    areas = (spot_boxes[:, 2] - spot_boxes[:, 0]) * (spot_boxes[:, 3] - spot_boxes[:, 1])
+    return np.divide(inter, areas[:, None], out=np.zeros_like(inter), where=areas[:, None] > 0)
+
+
+def indexed_max_overlap(index, det_boxes):
+    """
+    Solapamiento máximo por plaza evaluando solo los pares (plaza, detección)
+    candidatos según el índice, todos juntos en una pasada vectorizada.
+    """
+    max_overlap = np.zeros(len(index), dtype=np.float32)
+    spot_parts, det_parts = [], []
+    for j, det in enumerate(det_boxes):
+        cand = index.candidates(det, unique=False)
+        if len(cand):
+            spot_parts.append(cand)
+            det_parts.append(np.full(len(cand), j, dtype=np.intp))
+    if not spot_parts:
+        return max_overlap
+
+    spot_idx = np.concatenate(spot_parts)
+    det_idx = np.concatenate(det_parts)
+    sb = index.boxes[spot_idx]
+    db = det_boxes[det_idx]
+    w = np.minimum(sb[:, 2], db[:, 2]) - np.maximum(sb[:, 0], db[:, 0])
+    h = np.minimum(sb[:, 3], db[:, 3]) - np.maximum(sb[:, 1], db[:, 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    areas = (sb[:, 2] - sb[:, 0]) * (sb[:, 3] - sb[:, 1])
+    ov = np.divide(inter, areas, out=np.zeros_like(inter), where=areas > 0)
+    np.maximum.at(max_overlap, spot_idx, ov)
+    return max_overlap
+
+
+class OccupancyEngine:
+    """
+    Evalúa la ocupación de un conjunto fijo de plazas.
+
+    Con `use_index=None` se activa el índice espacial automáticamente cuando
+    hay al menos INDEX_MIN_SPOTS plazas; el resultado es idéntico al de la
+    comparación completa N×M.
+    """
+
+    def __init__(self, spots, overlap_threshold=OVERLAP_THRESHOLD, min_confidence=MIN_CONFIDENCE,
+                 use_index=None):
+        self.spots = spots
+        self.ids = [s["id"] for s in spots]
+        self.boxes = spots_to_boxes(spots)
+        self.overlap_threshold = overlap_threshold
+        self.min_confidence = min_confidence
+        if use_index is None:
+            use_index = len(self.ids) >= INDEX_MIN_SPOTS
+        self.index = SpotGridIndex(self.boxes) if use_index else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def evaluate(self, detections):
+        """
+        Devuelve (occupied, max_overlap): vector booleano de ocupación y el
+        solapamiento máximo por plaza, ambos de largo N.
+        """
+        dets = detections_to_array(detections)
+        dets = dets[dets[:, 4] >= self.min_confidence]
+        if len(dets) == 0 or len(self.ids) == 0:
+            max_overlap = np.zeros(len(self.ids), dtype=np.float32)
+        elif self.index is not None:
+            max_overlap = indexed_max_overlap(self.index, dets[:, :4])
+        else:
+            max_overlap = overlap_matrix(self.boxes, dets[:, :4]).max(axis=1)
+        return max_overlap > self.overlap_threshold, max_overlap
+
+    def status(self, detections):
+        """Igual que evaluate(), pero con el formato de lista de check_occupancy()."""
+        occupied, max_overlap = self.evaluate(detections)
+        return [
+            {"id": spot_id, "occupied": bool(occ), "overlap": float(ov)}
+            for spot_id, occ, ov in zip(self.ids, occupied, max_overlap)
+        ]
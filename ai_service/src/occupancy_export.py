@@ -0,0 +1,237 @@
+# occupancy_export.py — Exportación en streaming del historial de ocupación
+#
+# Lee "occupancy_events" con un cursor del servidor en lotes de `batch_size`
+# filas (arraysize / prefetchrows ajustados al lote) y va escribiendo cada lote
+# ya codificado, así la memoria queda acotada a un lote sin importar cuántas
+# filas tenga el rango. Formatos: NDJSON, CSV y Parquet (un row group por
+# lote; requiere pyarrow).
+#
+# Los codificadores son compartidos por esta herramienta y por el endpoint
+# GET /parking/events/export del receptor (web/fastapi_receiver_postgres.py),
+# que recorre el mismo SQL con el pool async.
+#
+# Uso:
+#   cd src
+#   python occupancy_export.py --start 2025-01-01 --end 2025-04-01 --format parquet -o eventos.parquet
+#   python occupancy_export.py --start 2025-03-01 --format ndjson --space A-01 > a01.ndjson
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+EXPORT_BATCH = 5000
+FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+COLUMNS = ("id", "parkingSpaceId", "spaceCode", "status", "timestamp")
+
+
+def export_query(start=None, end=None, space_code=None):
+    """SQL y parámetros del rango pedido (fin excluido), ordenado por instante."""
+    where, params = [], []
+    if start is not None:
+        params.append(start)
+        where.append(f'e."timestamp" >= :{len(params)}')
+    if end is not None:
+        params.append(end)
+        where.append(f'e."timestamp" < :{len(params)}')
+    if space_code is not None:
+        params.append(space_code)
+        where.append(f'p."spaceCode" = :{len(params)}')
+    sql = (
+        'SELECT e."id", e."parkingSpaceId", p."spaceCode", e."status", e."timestamp" '
+        'FROM "occupancy_events" e LEFT JOIN "parking_spaces" p ON p."id" = e."parkingSpaceId"'
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + ' ORDER BY e."timestamp"', params
+
+
+def tune_cursor(cursor, batch_size=EXPORT_BATCH):
+    """Un viaje de red por lote: arraysize = lote y prefetch de un lote completo."""
+    cursor.arraysize = batch_size
+    cursor.prefetchrows = batch_size + 1
+
+
+# --- Codificadores: header() / encode(rows) / footer() devuelven bytes ---
+class NdjsonEncoder:
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        return "".join(
+            json.dumps({
+                "id": event_id, "parkingSpaceId": space_id, "spaceCode": code,
+                "status": status, "timestamp": ts.isoformat() if ts else None,
+            }) + "\n"
+            for event_id, space_id, code, status, ts in rows
+        ).encode()
+
+    def footer(self):
+        return b""
+
+
+class CsvEncoder:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _drain(self):
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self):
+        self._writer.writerow(COLUMNS)
+        return self._drain()
+
+    def encode(self, rows):
+        self._writer.writerows(
+            (event_id, space_id, code, status, ts.isoformat() if ts else "")
+            for event_id, space_id, code, status, ts in rows
+        )
+        return self._drain()
+
+    def footer(self):
+        return b""
+
+
+class _ChunkSink:
+    """Archivo de solo escritura que acumula lo escrito hasta que se retira."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ParquetEncoder:
+    """Un row group por lote; el pie del archivo se emite en footer()."""
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("El formato parquet requiere pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.string()),
+            ("parkingSpaceId", pa.string()),
+            ("spaceCode", pa.string()),
+            ("status", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def header(self):
+        return b""
+
+    def encode(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in COLUMNS]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+        return self._sink.take()
+
+    def footer(self):
+        self._writer.close()
+        return self._sink.take()
+
+
+def make_encoder(fmt):
+    if fmt == "ndjson":
+        return NdjsonEncoder()
+    if fmt == "csv":
+        return CsvEncoder()
+    if fmt == "parquet":
+        return ParquetEncoder()
+    raise ValueError(f"Formato desconocido: {fmt} (opciones: {', '.join(FORMATS)})")
+
+
+def iter_export(conn, fmt, start=None, end=None, space_code=None, batch_size=EXPORT_BATCH):
+    """Genera el archivo exportado en trozos de bytes, un lote de filas por vez."""
+    encoder = make_encoder(fmt)
+    sql, params = export_query(start, end, space_code)
+    cursor = conn.cursor()
+    try:
+        tune_cursor(cursor, batch_size)
+        cursor.execute(sql, params)
+        yield encoder.header()
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield encoder.encode(rows)
+        yield encoder.footer()
+    finally:
+        cursor.close()
+
+
+def parse_date(value):
+    """Acepta AAAA-MM-DD o fecha y hora ISO."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def main():
+    import db_pool
+
+    parser = argparse.ArgumentParser(description="Exporta occupancy_events en streaming")
+    parser.add_argument("--start", default=None, help="Desde (incluido), AAAA-MM-DD o ISO")
+    parser.add_argument("--end", default=None, help="Hasta (excluido), AAAA-MM-DD o ISO")
+    parser.add_argument("--space", default=None, help="Solo esta plaza (spaceCode)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH)
+    parser.add_argument("-o", "--output", default=None, help="Archivo de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    written = 0
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        # Los mensajes [INFO] (p. ej. del pool) no deben mezclarse con los datos en stdout
+        with contextlib.redirect_stdout(sys.stderr), db_pool.connection() as conn:
+            for chunk in iter_export(conn, args.format, parse_date(args.start), parse_date(args.end),
+                                     args.space, args.batch_size):
+                out.write(chunk)
+                written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+    print(f"[INFO] ✅ Exportados {written / 1e6:.1f} MB en {(datetime.now() - started).total_seconds():.1f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# occupancy_rollups.py — Agregados de ocupación por plaza y franja de tiempo
+#
+# "occupancy_events" es un log de solo anexado; responder "¿cuánto estuvo
+# ocupada la plaza X entre tal y tal fecha?" obliga a recorrerlo entero. Aquí
+# se mantiene "occupancy_rollups" con, por plaza y franja de 5 minutos, 1 hora
+# y 1 día, los segundos ocupados y la cantidad de transiciones.
+#
+# - Incremental: el escritor de write_behind.py llama a RollupTracker dentro
+#   de la misma transacción en que inserta los eventos. Cada transición suma
+#   una al contador de su franja y, si cierra un intervalo ocupado, reparte sus
+#   segundos entre las franjas que cruza (MERGE acumulativo).
+# - Backfill: `python occupancy_rollups.py --backfill [--since AAAA-MM-DD]
+#   [--until AAAA-MM-DD]` reconstruye los agregados leyendo los eventos en
+#   lotes (fetchmany), plaza por plaza, sin cargar el log en memoria.
+#   event_retention.py lo usa para compactar los días que va a purgar.
+#   Bloquea la tabla en modo exclusivo hasta su commit: los MERGE del
+#   escritor esperan (el spool absorbe la demora) y se suman después sobre los
+#   valores reconstruidos, que no incluyen sus eventos aún sin confirmar. Así
+#   se puede correr con el monitor en marcha sin perder incrementos ni chocar
+#   con la clave primaria.
+#
+# "occupancy_rollups" no es una entidad del backend: se crea con DDL propio y
+# el synchronize de TypeORM no la toca (solo modifica las tablas de sus
+# entidades). Cambios de esquema aquí, no en backend/src/modules.
+#
+# El intervalo ocupado en curso (la plaza sigue ocupada) se suma al llegar su
+# próxima transición; las consultas sobre "ahora" pueden agregarlo a partir
+# del último evento.
+
+import argparse
+from datetime import datetime, timedelta
+
+GRANULARITIES = ("5m", "1h", "1d")
+BACKFILL_BATCH = 5000   # eventos por fetchmany
+WRITE_BATCH = 2000      # filas de agregados por executemany
+
+CREATE_TABLE_SQL = (
+    'CREATE TABLE "occupancy_rollups" ('
+    ' "parkingSpaceId" VARCHAR2(36) NOT NULL,'
+    ' "granularity" VARCHAR2(4) NOT NULL,'
+    ' "bucketStart" TIMESTAMP NOT NULL,'
+    ' "occupiedSeconds" NUMBER(12, 3) DEFAULT 0 NOT NULL,'
+    ' "transitions" NUMBER(10) DEFAULT 0 NOT NULL,'
+    ' CONSTRAINT "PK_occupancy_rollups" PRIMARY KEY ("parkingSpaceId", "granularity", "bucketStart"))'
+)
+
+# Suma un delta a la franja; la plaza se resuelve por spaceCode (el spool no guarda UUID)
+MERGE_BY_CODE_SQL = (
+    'MERGE INTO "occupancy_rollups" r '
+    'USING (SELECT p."id" AS sid, :1 AS gran, :2 AS bucket, :3 AS secs, :4 AS trans '
+    '       FROM "parking_spaces" p WHERE p."spaceCode" = :5) s '
+    'ON (r."parkingSpaceId" = s.sid AND r."granularity" = s.gran AND r."bucketStart" = s.bucket) '
+    'WHEN MATCHED THEN UPDATE SET r."occupiedSeconds" = r."occupiedSeconds" + s.secs, '
+    '                             r."transitions" = r."transitions" + s.trans '
+    'WHEN NOT MATCHED THEN INSERT ("parkingSpaceId", "granularity", "bucketStart", "occupiedSeconds", "transitions") '
+    '                      VALUES (s.sid, s.gran, s.bucket, s.secs, s.trans)'
+)
+# Los MERGE del escritor (ROW EXCLUSIVE) esperan hasta el commit del backfill
+LOCK_SQL = 'LOCK TABLE "occupancy_rollups" IN EXCLUSIVE MODE'
+INSERT_ROLLUP_SQL = (
+    'INSERT INTO "occupancy_rollups" '
+    '("parkingSpaceId", "granularity", "bucketStart", "occupiedSeconds", "transitions") '
+    'VALUES (:1, :2, :3, :4, :5)'
+)
+
+# Último evento de cada plaza (estado vigente y desde cuándo)
+LAST_EVENT_BY_CODE_SQL = (
+    'SELECT p."spaceCode", e."status", e."timestamp" FROM "occupancy_events" e '
+    'JOIN "parking_spaces" p ON p."id" = e."parkingSpaceId" '
+    'WHERE (e."parkingSpaceId", e."timestamp") IN '
+    '(SELECT "parkingSpaceId", MAX("timestamp") FROM "occupancy_events" GROUP BY "parkingSpaceId")'
+)
+STATE_BEFORE_SQL = (
+    'SELECT "parkingSpaceId", MAX("status") KEEP (DENSE_RANK LAST ORDER BY "timestamp"), MAX("timestamp") '
+    'FROM "occupancy_events" WHERE "timestamp" < :1 GROUP BY "parkingSpaceId"'
+)
+
+
+def bucket_start(ts, granularity):
+    """Inicio de la franja `granularity` que contiene `ts`."""
+    if granularity == "5m":
+        return ts.replace(minute=ts.minute - ts.minute % 5, second=0, microsecond=0)
+    if granularity == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_bucket(start, granularity):
+    if granularity == "5m":
+        return start + timedelta(minutes=5)
+    if granularity == "1h":
+        return start + timedelta(hours=1)
+    return start + timedelta(days=1)
+
+
+def add_transition(aggregates, key, ts):
+    """Cuenta una transición de la plaza `key` en las franjas que contienen `ts`."""
+    for gran in GRANULARITIES:
+        entry = aggregates.setdefault((key, gran, bucket_start(ts, gran)), [0.0, 0])
+        entry[1] += 1
+
+
+def add_occupied(aggregates, key, start, end):
+    """Reparte los segundos ocupados de [start, end) entre las franjas que cruza."""
+    if end <= start:
+        return
+    for gran in GRANULARITIES:
+        bucket = bucket_start(start, gran)
+        while bucket < end:
+            following = _next_bucket(bucket, gran)
+            seconds = (min(end, following) - max(start, bucket)).total_seconds()
+            entry = aggregates.setdefault((key, gran, bucket), [0.0, 0])
+            entry[0] += seconds
+            bucket = following
+
+
+def ensure_table(conn):
+    """Crea "occupancy_rollups" si no existe (ORA-00955 = ya existe)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CREATE_TABLE_SQL)
+        print('[INFO] Tabla "occupancy_rollups" creada')
+    except Exception as e:
+        if "ORA-00955" not in str(e):
+            raise
+    finally:
+        cursor.close()
+
+
+class RollupTracker:
+    """
+    Mantenimiento incremental de los agregados desde el escritor de BD.
+
+    Recuerda el último evento (estado, instante) de cada plaza por spaceCode.
+    deltas() calcula los agregados de un lote de transiciones sin modificar
+    ese estado; commit() lo adopta una vez confirmada la transacción, así un
+    rollback no deja la memoria adelantada respecto de la BD. Si la tabla no
+    existe y no se puede crear, se desactiva en lugar de frenar al escritor.
+    """
+
+    def __init__(self):
+        self._last_event = {}
+        self.enabled = True
+
+    def seed(self, conn):
+        """Crea la tabla si hace falta y carga el último evento de cada plaza."""
+        if not self.enabled:
+            return
+        try:
+            ensure_table(conn)
+        except Exception as e:
+            print(f'[WARNING] No se pudo crear "occupancy_rollups", agregados desactivados: {e}')
+            self.enabled = False
+            return
+        cursor = conn.cursor()
+        try:
+            cursor.execute(LAST_EVENT_BY_CODE_SQL)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        self._last_event = {code: (status, ts) for code, status, ts in rows}
+
+    def deltas(self, transitions):
+        """
+        `transitions` es [(status, ts, space_code)] en orden. Devuelve
+        (agregados, últimos eventos actualizados) para write() y commit().
+        """
+        aggregates = {}
+        last_event = {}
+        if not self.enabled:
+            return aggregates, last_event
+        for status, ts, code in transitions:
+            previous = last_event.get(code) or self._last_event.get(code)
+            if previous is not None:
+                prev_status, prev_ts = previous
+                if ts < prev_ts:
+                    continue  # evento fuera de orden: ya está cubierto
+                if prev_status == 'occupied':
+                    add_occupied(aggregates, code, prev_ts, ts)
+            add_transition(aggregates, code, ts)
+            last_event[code] = (status, ts)
+        return aggregates, last_event
+
+    @staticmethod
+    def write(cursor, aggregates):
+        if aggregates:
+            cursor.executemany(MERGE_BY_CODE_SQL, [
+                (gran, bucket, round(secs, 3), trans, code)
+                for (code, gran, bucket), (secs, trans) in aggregates.items()
+            ])
+
+    def commit(self, last_event):
+        self._last_event.update(last_event)
+
+
+def _flush_rows(cursor, aggregates):
+    rows = [(key, gran, bucket, round(secs, 3), trans)
+            for (key, gran, bucket), (secs, trans) in aggregates.items()]
+    for i in range(0, len(rows), WRITE_BATCH):
+        cursor.executemany(INSERT_ROLLUP_SQL, rows[i:i + WRITE_BATCH])
+    return len(rows)
+
+
+def backfill(conn, since=None, until=None, batch_size=BACKFILL_BATCH):
+    """
+    Reconstruye los agregados de las franjas en [since, until) (redondeados al
+    día; None = sin límite) en una transacción. Los eventos se leen ordenados
+    por plaza en lotes de `batch_size` y los agregados de cada plaza se
+    escriben al terminar con ella. Un intervalo ocupado que cruza un borde del
+    rango se recorta al rango; uno que sigue abierto no se cuenta (lo sumará
+    el escritor al cerrarse). Devuelve (eventos leídos, filas escritas).
+
+    La tabla queda bloqueada (LOCK_SQL) antes de leer los eventos: las
+    transacciones del escritor ya confirmadas entran en la reconstrucción y
+    las demás aplican su MERGE después del commit, sobre el resultado.
+
+    Nunca reconstruye antes del corte de event_retention.py: esos eventos ya
+    se purgaron y sus agregados son la única copia.
+    """
+    from event_retention import purged_before
+
+    start = bucket_start(since, "1d") if since is not None else None
+    end = bucket_start(until, "1d") if until is not None else None
+    floor = purged_before(conn)
+    if floor is not None and (start is None or start < floor):
+        if start is not None:
+            print(f"[WARNING] Los eventos anteriores a {floor:%Y-%m-%d} se purgaron; se reconstruye desde esa fecha")
+        start = floor
+    if start is None:
+        start = datetime(1970, 1, 1)
+
+    cursor = conn.cursor()
+    write_cursor = conn.cursor()
+    try:
+        delete_sql = 'DELETE FROM "occupancy_rollups" WHERE "bucketStart" >= :1'
+        events_sql = 'SELECT "parkingSpaceId", "status", "timestamp" FROM "occupancy_events" WHERE "timestamp" >= :1'
+        params = [start]
+        if end is not None:
+            delete_sql += ' AND "bucketStart" < :2'
+            events_sql += ' AND "timestamp" < :2'
+            params.append(end)
+        write_cursor.execute(LOCK_SQL)
+        write_cursor.execute(delete_sql, params)
+
+        # Estado de cada plaza al comenzar el rango: un intervalo ocupado
+        # abierto antes de `start` cuenta desde `start`
+        cursor.execute(STATE_BEFORE_SQL, (start,))
+        initial = {sid: (status, max(ts, start)) for sid, status, ts in cursor.fetchall()}
+        # Primer evento después del rango: cierra los intervalos que lo cruzan
+        closing = {}
+        if end is not None:
+            cursor.execute(
+                'SELECT "parkingSpaceId", MIN("timestamp") FROM "occupancy_events" '
+                'WHERE "timestamp" >= :1 GROUP BY "parkingSpaceId"', (end,))
+            closing = dict(cursor.fetchall())
+
+        def finish(sid, previous, aggregates):
+            if previous is not None and previous[0] == 'occupied' and sid in closing:
+                add_occupied(aggregates, sid, previous[1], end)
+            return _flush_rows(write_cursor, aggregates)
+
+        cursor.arraysize = batch_size
+        cursor.prefetchrows = batch_size + 1
+        cursor.execute(events_sql + ' ORDER BY "parkingSpaceId", "timestamp"', params)
+        events = written = 0
+        seen = set()
+        current, previous, aggregates = None, None, {}
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for sid, status, ts in rows:
+                if sid != current:
+                    if current is not None:
+                        written += finish(current, previous, aggregates)
+                    current, aggregates = sid, {}
+                    previous = initial.get(sid)
+                    seen.add(sid)
+                if previous is not None and previous[0] == 'occupied':
+                    add_occupied(aggregates, sid, previous[1], ts)
+                add_transition(aggregates, sid, ts)
+                previous = (status, ts)
+            events += len(rows)
+            print(f"[INFO] Backfill: {events} eventos procesados")
+        if current is not None:
+            written += finish(current, previous, aggregates)
+        # Plazas sin eventos en el rango que estuvieron ocupadas todo el tiempo
+        for sid, previous in initial.items():
+            if sid not in seen:
+                written += finish(sid, previous, {})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        write_cursor.close()
+    return events, written
+
+
+def main():
+    import db_pool
+
+    parser = argparse.ArgumentParser(description="Agregados de ocupación por plaza (5 min / 1 h / 1 día)")
+    parser.add_argument("--backfill", action="store_true", help="Reconstruir desde occupancy_events")
+    parser.add_argument("--since", default=None, help="Reconstruir solo desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--until", default=None, help="Reconstruir solo hasta esta fecha, excluida (AAAA-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH)
+    args = parser.parse_args()
+
+    with db_pool.connection() as conn:
+        ensure_table(conn)
+        if args.backfill:
+            since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+            until = datetime.strptime(args.until, "%Y-%m-%d") if args.until else None
+            started = datetime.now()
+            events, written = backfill(conn, since, until, args.batch_size)
+            print(f"[INFO] ✅ Backfill completo: {events} eventos → {written} filas de agregados "
+                  f"en {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# occupancy_smoothing.py — Histéresis temporal del estado de cada plaza
+#
+# Un falso negativo aislado de YOLO hacía que una plaza pasara a "free" y
+# volviera a "occupied" en el ciclo siguiente, generando UPDATEs y filas
+# espurias en occupancy_events. OccupancySmoother mantiene una máquina de
+# estados por plaza y solo confirma un cambio cuando hay evidencia suficiente:
+#
+#   - votación N de M: al menos N de las últimas M observaciones coinciden
+#     con el nuevo estado (N = M equivale a N observaciones consecutivas)
+#   - antirrebote temporal: la observación contraria se mantiene sin
+#     interrupción durante al menos `*_seconds` segundos
+#
+# Cada dirección tiene sus propios parámetros y se exigen ambas condiciones;
+# p. ej. ocupar tras 3 detecciones seguidas y liberar tras 2 s sin detección.
+# Las desviaciones que vuelven al estado confirmado sin llegar a cumplirlas
+# se cuentan como cambios suprimidos.
+#
+# Solo las inferencias reales cuentan como observaciones: tick() reevalúa los
+# plazos temporales sin agregar votos. Para que una desviación no quede
+# esperando al refresco forzado de la compuerta de movimiento (un auto que se
+# detiene deja de generar movimiento), los llamadores fuerzan la inferencia
+# mientras has_pending() sea True; así una lectura aislada se confirma o se
+# descarta con observaciones nuevas en pocos frames.
+
+import threading
+import time
+from collections import deque
+
+OCCUPY_N = 3          # observaciones "ocupada" necesarias...
+OCCUPY_M = 3          # ...dentro de las últimas M
+OCCUPY_SECONDS = 0.0  # duración mínima de la racha "ocupada"
+FREE_N = 1
+FREE_M = 1
+FREE_SECONDS = 2.0    # segundos continuos sin detección para liberar
+
+
+class _SpotState:
+    __slots__ = ("committed", "history", "run_value", "run_start", "pending")
+
+    def __init__(self, window):
+        self.committed = None      # último estado confirmado (None = sin observar)
+        self.history = deque(maxlen=window)
+        self.run_value = None      # valor de la racha actual de observaciones
+        self.run_start = 0.0
+        self.pending = False       # hay una desviación sin confirmar en curso
+
+
+class OccupancySmoother:
+    """
+    Filtra la salida de check_occupancy antes de persistirla.
+
+    apply(status) registra una observación por plaza y devuelve la misma lista
+    con "occupied" reemplazado por el estado confirmado (el valor crudo queda
+    en "raw_occupied"). tick() reevalúa solo los plazos temporales, para los
+    ciclos en que no se infirió, y devuelve el estado nuevo si alguna plaza se
+    confirmó, o None. has_pending() indica si conviene inferir el próximo
+    frame aunque la escena no haya cambiado.
+
+    La primera observación de cada plaza se adopta directamente.
+    """
+
+    def __init__(self, occupy_n=OCCUPY_N, occupy_m=OCCUPY_M, occupy_seconds=OCCUPY_SECONDS,
+                 free_n=FREE_N, free_m=FREE_M, free_seconds=FREE_SECONDS, clock=time.monotonic):
+        occupy_m = occupy_m or occupy_n
+        free_m = free_m or free_n
+        if not (1 <= occupy_n <= occupy_m and 1 <= free_n <= free_m):
+            raise ValueError("Se requiere 1 <= N <= M en ambas direcciones")
+        self._rules = {
+            True: (occupy_n, occupy_m, occupy_seconds),
+            False: (free_n, free_m, free_seconds),
+        }
+        self._window = max(occupy_m, free_m)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._spots = {}
+        self._last = []
+        self._pending = 0       # plazas con una desviación sin confirmar
+
+        # Estadísticas
+        self.observations = 0
+        self.transitions = 0
+        self.suppressed = 0
+
+    def _ready(self, state, target, now):
+        n, m, seconds = self._rules[target]
+        if state.run_value != target or now - state.run_start < seconds:
+            return False
+        recent = list(state.history)[-m:]
+        return sum(1 for v in recent if v == target) >= n
+
+    def _decide(self, state, now):
+        target = not state.committed
+        if self._ready(state, target, now):
+            state.committed = target
+            state.pending = False
+            self._pending -= 1
+            self.transitions += 1
+            return True
+        return False
+
+    def _observe(self, spot_id, occupied, now):
+        state = self._spots.get(spot_id)
+        if state is None:
+            state = self._spots[spot_id] = _SpotState(self._window)
+        state.history.append(occupied)
+        if occupied != state.run_value:
+            state.run_value = occupied
+            state.run_start = now
+        if state.committed is None:
+            state.committed = occupied
+            return state
+
+        if occupied == state.committed:
+            if state.pending:
+                self.suppressed += 1
+                state.pending = False
+                self._pending -= 1
+        else:
+            if not state.pending:
+                state.pending = True
+                self._pending += 1
+            self._decide(state, now)
+        return state
+
+    def _current(self):
+        return [dict(s, occupied=self._spots[s["id"]].committed) for s in self._last]
+
+    def apply(self, status):
+        """Registra una observación por plaza y devuelve el estado suavizado."""
+        now = self._clock()
+        with self._lock:
+            out = []
+            for s in status:
+                raw = bool(s["occupied"])
+                state = self._observe(s["id"], raw, now)
+                out.append(dict(s, occupied=state.committed, raw_occupied=raw))
+            self.observations += len(status)
+            self._last = out
+            return out
+
+    def tick(self):
+        """Confirma los cambios cuyo plazo venció sin nuevas observaciones."""
+        now = self._clock()
+        with self._lock:
+            if not self._pending:
+                return None
+            changed = False
+            for state in self._spots.values():
+                if state.pending:
+                    changed |= self._decide(state, now)
+            return self._current() if changed else None
+
+    def has_pending(self):
+        """True si alguna plaza tiene un cambio sin confirmar (hace falta observarla)."""
+        return self._pending > 0
+
+    def reset(self):
+        """Olvida el estado de todas las plazas (p. ej. al recargar la geometría)."""
+        with self._lock:
+            self._spots.clear()
+            self._last = []
+            self._pending = 0
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for s in self._spots.values() if s.pending)
+        return {
+            "observations": self.observations,
+            "transitions": self.transitions,
+            "suppressed": self.suppressed,
+            "pending": pending,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[STATS] suavizado: {s['transitions']} cambios confirmados, "
+                f"{s['suppressed']} parpadeos suprimidos, {s['pending']} pendientes "
+                f"({s['observations']} observaciones)")
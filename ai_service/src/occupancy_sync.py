@@ -0,0 +1,125 @@
+# occupancy_sync.py — Sincronización por diferencias del estado de plazas con Oracle
+#
+# En lugar de consultar el UUID y el estado actual de cada plaza en cada ciclo,
+# se mantiene en memoria el último estado escrito (sembrado una sola vez desde
+# "parking_spaces") y solo se envían las plazas que cambiaron, en un único
+# executemany de UPDATE y otro de INSERT en "occupancy_events".
+
+import uuid
+from datetime import datetime
+
+UPDATE_STATUS_SQL = 'UPDATE "parking_spaces" SET "status" = :1, "updatedAt" = :2 WHERE "id" = :3'
+INSERT_EVENT_SQL = (
+    'INSERT INTO "occupancy_events" ("id", "parkingSpaceId", "status", "timestamp") '
+    'VALUES (:1, :2, :3, :4)'
+)
+
+
+class OccupancyStateSync:
+    """
+    Componente de sincronización de estado con escritura por lotes.
+
+    `acquire` es un context manager que entrega una conexión oracledb
+    (por ejemplo db_pool.connection); se pide una por ciclo con cambios.
+    """
+
+    def __init__(self, acquire):
+        self._acquire = acquire
+        self._uuid_by_code = {}
+        self._last_status = {}  # uuid -> último estado escrito/leído
+        self._seeded = False
+        self._warned_codes = set()
+
+    # --- Estado en memoria ---
+    def seed(self, conn):
+        """Carga UUID y estado actual de todas las plazas en una sola consulta."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT "id", "spaceCode", "status" FROM "parking_spaces"')
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        self._uuid_by_code = {code: space_id for space_id, code, _ in rows}
+        self._last_status = {space_id: status for space_id, _, status in rows}
+        self._seeded = True
+        print(f"[INFO] Estado inicial cargado para {len(rows)} plazas")
+
+    def invalidate(self):
+        """Fuerza a releer el estado desde la BD en el próximo ciclo."""
+        self._seeded = False
+
+    def pending_changes(self, status, spot_mapping):
+        """Devuelve [(uuid, space_code, old_status, new_status)] de las plazas que cambiaron."""
+        changes = []
+        missing = []
+        for spot in status:
+            space_code = spot_mapping.get(spot["id"])
+            if not space_code:
+                if spot["id"] not in self._warned_codes:
+                    print(f"[WARNING] No hay mapeo para la plaza ID {spot['id']}, se omite.")
+                    self._warned_codes.add(spot["id"])
+                continue
+
+            space_uuid = self._uuid_by_code.get(space_code)
+            if space_uuid is None:
+                missing.append(space_code)
+                continue
+
+            new_status = 'occupied' if spot["occupied"] else 'free'
+            old_status = self._last_status.get(space_uuid)
+            if old_status != new_status:
+                changes.append((space_uuid, space_code, old_status, new_status))
+
+        for space_code in missing:
+            if space_code not in self._warned_codes:
+                print(f"[WARNING] No se encontró el UUID para {space_code}, se omite.")
+                self._warned_codes.add(space_code)
+        return changes
+
+    # --- Escritura ---
+    def sync(self, status, spot_mapping):
+        """
+        Escribe en Oracle solo las plazas cuyo estado cambió.
+        Devuelve la cantidad de plazas actualizadas (0 si no hubo cambios o error).
+        """
+        try:
+            if not self._seeded:
+                with self._acquire() as conn:
+                    self.seed(conn)
+
+            changes = self.pending_changes(status, spot_mapping)
+            if not changes:
+                return 0
+
+            now = datetime.now()
+            with self._acquire() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.executemany(
+                        UPDATE_STATUS_SQL,
+                        [(new, now, space_uuid) for space_uuid, _, _, new in changes],
+                    )
+                    cursor.executemany(
+                        INSERT_EVENT_SQL,
+                        [(str(uuid.uuid4()), space_uuid, new, now) for space_uuid, _, _, new in changes],
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except Exception as e:
+            print(f"[ERROR] Error en Oracle Database: {e}")
+            # Volver a sembrar el estado en el próximo ciclo por si la BD
+            # cambió mientras no podíamos escribir.
+            self._seeded = False
+            return 0
+
+        # Confirmado en la BD: recién ahora se actualiza la memoria
+        for space_uuid, space_code, old, new in changes:
+            self._last_status[space_uuid] = new
+            print(f"[INFO] ✅ Actualizado {space_code} ({space_uuid[:8]}...): {old} → {new}")
+        print(f"[INFO] {len(changes)} cambios sincronizados con Oracle Database.\n")
+        return len(changes)
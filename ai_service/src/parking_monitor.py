@@ -1,16 +1,23 @@
 # parking_monitor.py
-import cv2
-import torch
+#
+# Las dependencias pesadas (OpenCV, NumPy, torch/ultralytics, oracledb) se
+# importan recién cuando se usan y el modelo se construye de forma perezosa
+# con get_detector(): importar un helper de este módulo (check_occupancy,
+# load_spots_from_json, ...) no carga el modelo ni los frameworks.
 import time
 import os
 import sys
 import platform
 import json
-import uuid
+import threading
+from functools import partial
 from pathlib import Path
-from ultralytics import YOLO
-import oracledb
-from datetime import datetime
+
+import db_pool
+import monitor_log
+from config.db_config import SPOOL_PATH
+from occupancy_sync import OccupancyStateSync
+from pipeline import MonitorPipeline
 
 # --- RUTAS ---
 # Obtener el directorio raíz del proyecto (un nivel arriba de src/)
@@ -20,31 +27,52 @@ SPOT_MAPPING_FILE = PROJECT_ROOT / "config" / "spot_mapping.json"
 MODEL_PATH = PROJECT_ROOT / "runs" / "train" / "toycar_detector_finalsafe4" / "weights" / "best.pt"
 
 # --- CONFIGURACIONES ---
-DEVICE = "cpu"  # usar CPU para evitar errores cuDNN
-MODEL = YOLO(str(MODEL_PATH))
-FRAME_SKIP = 2
+# Backend de inferencia (ver detector_backends.py): pytorch | onnx | onnx-int8 | openvino
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "pytorch")
+FRAME_SKIP = 2  # solo se usa si la compuerta de movimiento está desactivada
+MOTION_GATE = True  # inferir solo cuando cambia la escena cerca de las plazas
+ROI_INFERENCE = False  # inferir solo sobre los recortes que contienen plazas
+SMOOTHING = True  # histéresis por plaza antes de escribir en la BD (ver occupancy_smoothing.py)
+WRITE_BEHIND = True  # encolar cambios en un spool local y escribirlos en segundo plano
+ROLLUPS = True  # mantener occupancy_rollups (5 min / 1 h / 1 día) al escribir eventos
+SPOT_RELOAD_INTERVAL = 5.0  # segundos entre chequeos de cambios en las plazas (0 = sin recarga)
 CAMERA_RESOLUTION = (640, 480)
+OVERLAP_THRESHOLD = 0.02  # fracción mínima de la plaza cubierta por una detección
+MIN_CONFIDENCE = 0.3      # confianza mínima para considerar una detección
+STATS_INTERVAL = 10  # segundos entre reportes de latencia / compuerta de movimiento
+
+# Estado de ocupación ya escrito en la BD (se siembra una sola vez)
+STATE_SYNC = OccupancyStateSync(db_pool.connection)
+
+# Escritor diferido con spool local (ver get_writer)
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
 
-# Configuración Oracle Database (mismo que el backend)
-DB_CONFIG = {
-    "user": os.environ.get("DB_USER", "parkingapp"),
-    "password": os.environ.get("DB_PASSWORD", "admin123"),
-    "dsn": f"{os.environ.get('DB_HOST', 'localhost')}:{os.environ.get('DB_PORT', '1521')}/{os.environ.get('DB_SID', 'FREEPDB1')}"
-}
+# Motores vectorizados de ocupación por lista de plazas (id(spots) -> motor).
+# Se conservan los dos últimos para que una recarga en caliente no obligue a
+# reconstruir el del layout anterior mientras termina el frame en curso.
+_ENGINES = {}
+
+# Detector construido a demanda (ver get_detector)
+_DETECTOR = None
+_DETECTOR_LOCK = threading.Lock()
+
+# Métricas Prometheus del proceso (ver get_metrics)
+_METRICS = None
+_METRICS_LOCK = threading.Lock()
 
 
 # --- FUNCIONES PRINCIPALES ---
 def load_spots_from_db():
     """Carga las coordenadas de plazas desde la base de datos."""
-    conn = None
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT "id", "spaceCode", "x1", "y1", "x2", "y2" FROM "parking_spaces" WHERE "x1" IS NOT NULL ORDER BY "spaceCode"'
-        )
-        rows = cursor.fetchall()
-        cursor.close()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT "id", "spaceCode", "x1", "y1", "x2", "y2" FROM "parking_spaces" WHERE "x1" IS NOT NULL ORDER BY "spaceCode"'
+            )
+            rows = cursor.fetchall()
+            cursor.close()
         
         spots = []
         spot_mapping = {}
@@ -64,9 +92,6 @@ def load_spots_from_db():
         print(f"[ERROR] Error al cargar plazas desde BD: {e}")
         print(f"[INFO] Intentando cargar desde archivo JSON como respaldo...")
         return load_spots_from_json()
-    finally:
-        if conn is not None:
-            conn.close()
 
 
 def load_spots_from_json():
@@ -141,12 +166,48 @@ def get_parking_space_id(space_code, conn):
         return None
 
 
-def detect_vehicles(frame):
-    """Ejecuta YOLO sobre el frame y devuelve las detecciones."""
+def get_detector():
+    """
+    Devuelve el detector del proceso. La primera llamada importa el backend,
+    carga el modelo y hace una pasada de calentamiento sobre un frame vacío,
+    para que el primer frame real no pague la inicialización.
+    """
+    global _DETECTOR
+    if _DETECTOR is None:
+        with _DETECTOR_LOCK:
+            if _DETECTOR is None:
+                from detector_backends import create_backend, warm_up
+
+                start = time.perf_counter()
+                detector = create_backend(DETECTOR_BACKEND)
+                loaded = time.perf_counter()
+                warm_up(detector, CAMERA_RESOLUTION)
+                print(f"[INFO] Detector '{detector.name}' listo: carga {loaded - start:.2f}s, "
+                      f"calentamiento {time.perf_counter() - loaded:.2f}s")
+                _DETECTOR = detector
+    return _DETECTOR
+
+
+def detect_vehicles_array(frame):
+    """Ejecuta el detector y devuelve una matriz NumPy (x1, y1, x2, y2, conf, cls)."""
+    return get_detector().predict_batch([frame])[0]
+
+
+def detect_vehicles_batch(frames):
+    """Ejecuta YOLO sobre varios frames en una sola llamada; una matriz por frame."""
+    return get_detector().predict_batch(frames)
+
+
+def detect_vehicles(frame, roi_detector=None):
+    """
+    Ejecuta YOLO sobre el frame y devuelve las detecciones.
+    Con `roi_detector` (roi_inference.RoiDetector) solo se infiere sobre la
+    región de las plazas; las coordenadas devueltas son siempre del frame.
+    """
     try:
-        results = MODEL.predict(frame, device=DEVICE, imgsz=416, conf=0.25, verbose=False)
+        raw = roi_detector(frame) if roi_detector is not None else detect_vehicles_array(frame)
         detections = []
-        for *xyxy, conf, cls in results[0].boxes.data.cpu().numpy():
+        for *xyxy, conf, cls in raw:
             # Siempre usar "auto" como nombre de clase, sin importar lo que detecte el modelo
             class_name = "auto"
             detections.append((
@@ -160,170 +221,143 @@ def detect_vehicles(frame):
         return []
 
 
+def register_occupancy_engine(engine):
+    """Guarda un motor ya construido (p. ej. en el hilo de recarga)."""
+    _ENGINES[id(engine.spots)] = engine
+    while len(_ENGINES) > 2:
+        _ENGINES.pop(next(iter(_ENGINES)))
+    return engine
+
+
+def get_occupancy_engine(spots):
+    """Devuelve el motor de ocupación para `spots`, reconstruyéndolo solo si cambian."""
+    engine = _ENGINES.get(id(spots))
+    if engine is None or engine.spots is not spots:
+        from occupancy_engine import OccupancyEngine
+
+        engine = register_occupancy_engine(OccupancyEngine(spots, OVERLAP_THRESHOLD, MIN_CONFIDENCE))
+    return engine
+
+
 def check_occupancy(spots, detections):
-    """Determina si cada plaza está ocupada según las detecciones."""
-    status = []
-    # Solo aceptar la clase "auto"
-    vehicle_classes = ["auto"]
-    
-    print(f"\n[DEBUG] ========== NUEVO CICLO DE DETECCIÓN ==========")
-    print(f"[DEBUG] Clases de vehículos aceptadas: {vehicle_classes}")
-    print(f"[DEBUG] Total de detecciones: {len(detections)}")
-    
-    # Imprimir todas las detecciones primero
-    for i, det in enumerate(detections):
-        dx1, dy1, dx2, dy2, cls, conf = det
-        print(f"[DEBUG] Detección #{i+1}: clase='{cls}', confianza={conf:.2f}, bbox=[{dx1},{dy1},{dx2},{dy2}]")
-
-    # Ahora revisar cada spot
-    for spot in spots:
-        spot_id = spot["id"]
-        (x1, y1), (x2, y2) = spot["coords"]
-        
-        # 🔧 NORMALIZAR COORDENADAS: asegurar que x1,y1 sea esquina superior-izquierda
-        x1_norm = min(x1, x2)
-        y1_norm = min(y1, y2)
-        x2_norm = max(x1, x2)
-        y2_norm = max(y1, y2)
-        
-        occupied = False
-        
-        print(f"\n[DEBUG] --- Revisando Plaza {spot_id} ---")
-        print(f"[DEBUG]   Coords originales: [{x1},{y1},{x2},{y2}]")
-        print(f"[DEBUG]   Coords normalizadas: [{x1_norm},{y1_norm},{x2_norm},{y2_norm}]")
-
-        for i, det in enumerate(detections):
-            dx1, dy1, dx2, dy2, cls, conf = det
-            
-            if cls not in vehicle_classes:
-                print(f"[DEBUG]   Det#{i+1}: Ignorada - clase '{cls}' no válida")
-                continue
-                
-            if conf < 0.3:
-                print(f"[DEBUG]   Det#{i+1}: Ignorada - confianza {conf:.2f} muy baja")
-                continue
-
-            # Calcular intersección usando coordenadas normalizadas
-            x_left = max(x1_norm, dx1)
-            y_top = max(y1_norm, dy1)
-            x_right = min(x2_norm, dx2)
-            y_bottom = min(y2_norm, dy2)
-
-            if x_right > x_left and y_bottom > y_top:
-                intersection_area = (x_right - x_left) * (y_bottom - y_top)
-                spot_area = (x2_norm - x1_norm) * (y2_norm - y1_norm)
-                overlap = intersection_area / spot_area
-                
-                print(f"[DEBUG]   Det#{i+1}: Solapamiento = {overlap*100:.2f}% (área intersección={intersection_area}, área plaza={spot_area})")
-
-                # 🔽 Umbral de solapamiento muy bajo para toy cars pequeños
-                if overlap > 0.02:
-                    occupied = True
-                    print(f"[DEBUG]   ✅ Det#{i+1}: Plaza {spot_id} OCUPADA por esta detección!")
-                    break
-                else:
-                    print(f"[DEBUG]   Det#{i+1}: Solapamiento insuficiente ({overlap*100:.2f}% < 2%)")
-            else:
-                print(f"[DEBUG]   Det#{i+1}: Sin intersección con plaza {spot_id}")
+    """
+    Determina si cada plaza está ocupada según las detecciones.
 
-        status.append({"id": spot_id, "occupied": occupied})
-        estado_texto = "✅ OCUPADA" if occupied else "🟩 LIBRE"
-        print(f"[INFO] Plaza {spot_id}: {estado_texto}")
+    Acepta tanto la lista de tuplas de detect_vehicles() como el tensor
+    `boxes.data` de YOLO convertido a NumPy.
+    """
+    engine = get_occupancy_engine(spots)
+    status = engine.status(detections)
+
+    # Un evento por ciclo (no uno por plaza), armado solo con LOG_LEVEL=DEBUG
+    if monitor_log.enabled(monitor_log.DEBUG):
+        monitor_log.debug(
+            "Ocupación calculada",
+            detections=len(detections),
+            occupied=[s["id"] for s in status if s["occupied"]],
+            overlap={s["id"]: round(s["overlap"], 4) for s in status},
+        )
 
     return status
 
 
+def get_metrics():
+    """Devuelve las métricas del monitor (metrics.MonitorMetrics), creándolas la primera vez."""
+    global _METRICS
+    if _METRICS is None:
+        with _METRICS_LOCK:
+            if _METRICS is None:
+                from metrics import MonitorMetrics
+
+                _METRICS = MonitorMetrics()
+    return _METRICS
+
+
+def get_writer():
+    """Devuelve el escritor diferido del proceso, arrancando su hilo la primera vez."""
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                from occupancy_rollups import RollupTracker
+                from write_behind import WriteBehindSync
+
+                rollups = RollupTracker() if ROLLUPS else None
+                _WRITER = WriteBehindSync(db_pool.connection, SPOOL_PATH, rollups=rollups).start()
+                # Profundidad del spool de este escritor en /metrics
+                get_metrics().watch_queue("spool", _WRITER.spool.depth)
+                pending = _WRITER.spool.depth()
+                if pending:
+                    print(f"[INFO] {pending} cambios pendientes en el spool, se escribirán en segundo plano")
+    return _WRITER
+
+
+def close_writer():
+    """Detiene el escritor diferido tras intentar vaciar el spool."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is not None:
+            _WRITER.stop()
+            _WRITER = None
+
+
 def save_to_oracle(status, spot_mapping):
     """
     Guarda el estado de las plazas en Oracle Database (tabla parking_spaces).
     También crea eventos en occupancy_events si hubo cambios.
+
+    Solo se escriben las plazas cuyo estado cambió respecto al último estado
+    conocido. Con WRITE_BEHIND los cambios se anexan a un spool local y un
+    hilo los escribe en lotes (ver write_behind.py), así el bucle nunca espera
+    a la BD ni pierde cambios si Oracle no responde. Sin él se escriben en el
+    momento (ver occupancy_sync.OccupancyStateSync).
     """
-    conn = None
-    try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        for spot in status:
-            spot_id = spot["id"]
-            occupied = spot["occupied"]
-            
-            # Obtener el spaceCode correspondiente
-            space_code = spot_mapping.get(spot_id)
-            if not space_code:
-                print(f"[WARNING] No hay mapeo para la plaza ID {spot_id}, se omite.")
-                continue
-            
-            # Obtener el UUID del parking_space
-            parking_space_uuid = get_parking_space_id(space_code, conn)
-            if not parking_space_uuid:
-                print(f"[WARNING] No se encontró el UUID para {space_code}, se omite.")
-                continue
-            
-            # Determinar el nuevo estado
-            new_status = 'occupied' if occupied else 'free'
-            
-            # Obtener el estado actual de la BD
-            cursor.execute(
-                'SELECT "status" FROM "parking_spaces" WHERE "id" = :1',
-                (parking_space_uuid,)
-            )
-            result = cursor.fetchone()
-            current_status = result[0] if result else None
-            
-            # Solo actualizar si hay cambio
-            if current_status != new_status:
-                # Actualizar parking_spaces
-                cursor.execute(
-                    'UPDATE "parking_spaces" SET "status" = :1, "updatedAt" = :2 WHERE "id" = :3',
-                    (new_status, datetime.now(), parking_space_uuid)
-                )
-                
-                # Crear evento en occupancy_events con UUID generado
-                event_id = str(uuid.uuid4())
-                cursor.execute(
-                    'INSERT INTO "occupancy_events" ("id", "parkingSpaceId", "status", "timestamp") VALUES (:1, :2, :3, :4)',
-                    (event_id, parking_space_uuid, new_status, datetime.now())
-                )
-                
-                print(f"[INFO] ✅ Actualizado {space_code} ({parking_space_uuid[:8]}...): {current_status} → {new_status}")
-            else:
-                print(f"[INFO] ℹ️  {space_code}: Sin cambios ({current_status})")
-        
-        conn.commit()
-        cursor.close()
-        print("[INFO] Estado sincronizado con Oracle Database correctamente.\n")
-        
-    except Exception as e:
-        print(f"[ERROR] Error en Oracle Database: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn is not None:
-            conn.close()
+    if WRITE_BEHIND:
+        written = get_writer().record(status, spot_mapping)
+    else:
+        written = STATE_SYNC.sync(status, spot_mapping)
+    if written:
+        get_metrics().db_writes.inc(written)
+    return written
+
+
+def build_layout(spots, spot_mapping, motion_gate=MOTION_GATE, roi_inference=ROI_INFERENCE):
+    """Precalcula todo lo que depende de las plazas (motor, compuerta, ROI)."""
+    from motion_gate import MotionGate
+    from occupancy_engine import OccupancyEngine
+    from roi_inference import RoiDetector
+    from spot_reload import SpotLayout
+
+    engine = register_occupancy_engine(OccupancyEngine(spots, OVERLAP_THRESHOLD, MIN_CONFIDENCE))
+    gate = MotionGate(spots) if motion_gate else None
+    if roi_inference:
+        detect = partial(detect_vehicles, roi_detector=RoiDetector(spots, detect_vehicles_batch))
+    else:
+        detect = detect_vehicles
+    return SpotLayout(spots, spot_mapping, engine, gate, detect)
+
+
+def on_layout_swap(layout, viewer=None):
+    """Efectos de reemplazar las plazas: visor y estado sincronizado con la BD."""
+    if viewer is not None:
+        viewer.spots_by_id = layout.spots_by_id
+    STATE_SYNC.invalidate()
+    if _WRITER is not None:
+        _WRITER.invalidate()
+    print(f"[INFO] 🔄 Geometría de plazas recargada: {len(layout.spots)} plazas")
 
 
 def draw_visuals(frame, spots, detections, status):
-    """Dibuja zonas y detecciones en el frame."""
-    # Detecciones (azul)
-    for det in detections:
-        x1, y1, x2, y2, cls, conf = det
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 2)
-        cv2.putText(frame, f"{cls} {conf:.2f}", (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-
-    # Cuadros de plazas
-    for s in status:
-        spot = next(sp for sp in spots if sp["id"] == s["id"])
-        (x1, y1), (x2, y2) = spot["coords"]
-        color = (0, 0, 255) if s["occupied"] else (0, 255, 0)
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        cv2.putText(frame, str(s["id"]), (x1, y1 - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1)
-    return frame
+    """Dibuja zonas y detecciones en el frame (ver visualization.draw_visuals)."""
+    from visualization import draw_visuals as _draw_visuals
+
+    return _draw_visuals(frame, spots, detections, status)
 
 
 def get_camera_backend():
     """Detecta el backend de cámara apropiado según el sistema operativo."""
+    import cv2
+
     system = platform.system()
     
     if system == "Windows":
@@ -344,8 +378,90 @@ def get_camera_backend():
     return backend
 
 
-def main(video_source=0):
-    """Bucle principal del sistema."""
+def show_frame(frame, spots_by_id, detections, status):
+    """Dibuja y muestra el frame en la ventana local. Devuelve False si se pulsó 'q'."""
+    import cv2
+
+    frame = draw_visuals(frame, spots_by_id, detections, status)
+    cv2.imshow("Parking Monitor", frame)
+    return not (cv2.waitKey(1) & 0xFF == ord("q"))
+
+
+def run_pipelined(cap, spots, spot_mapping, spots_by_id, headless=False, viewer=None, gate=None,
+                  detect_fn=detect_vehicles, smoother=None, reloader=None):
+    """
+    Modo pipeline: captura, inferencia y escritura en BD corren en hilos
+    separados. El hilo principal solo publica/dibuja y atiende el teclado.
+    """
+    pipeline = MonitorPipeline(
+        cap,
+        spots,
+        detect_fn=detect_fn,
+        occupancy_fn=check_occupancy,
+        sink_fn=lambda status: save_to_oracle(status, spot_mapping),
+        gate=gate,
+        smoother=smoother,
+        metrics=get_metrics(),
+    )
+    pipeline.start()
+
+    seq = 0
+    last_report = time.monotonic()
+    try:
+        while pipeline.is_running():
+            layout = reloader.take() if reloader is not None else None
+            if layout is not None:
+                pipeline.swap(layout.spots, layout.detect_fn, layout.gate,
+                              lambda status, mapping=layout.spot_mapping: save_to_oracle(status, mapping))
+                spots_by_id = layout.spots_by_id
+                on_layout_swap(layout, viewer)
+
+            item = pipeline.grabber.wait_newer(seq, timeout=0.1)
+            if item is not None:
+                seq, frame, _ = item
+                detections, status = pipeline.latest_result()
+                if viewer is not None:
+                    viewer.publish(frame, detections, status)
+                # El hilo de inferencia lee el mismo frame del grabber: anotar una copia
+                if not headless and not show_frame(frame.copy(), spots_by_id, detections, status):
+                    break
+
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                print(pipeline.format_stats())
+                if _WRITER is not None:
+                    print(_WRITER.format_stats())
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        print(pipeline.format_stats())
+
+
+def main(video_source=0, pipelined=False, headless=False, stream_port=None, motion_gate=MOTION_GATE,
+         roi_inference=ROI_INFERENCE, smoothing=SMOOTHING, metrics_port=None):
+    """
+    Bucle principal del sistema.
+
+    Con `headless=True` no se abre ninguna ventana ni se dibuja nada (para
+    servidores sin pantalla). Con `stream_port` se sirve el video anotado por
+    HTTP, renderizado en un hilo aparte a tasa limitada. Con `motion_gate`
+    el detector solo corre cuando cambia la escena cerca de las plazas (más un
+    refresco periódico) en lugar de cada FRAME_SKIP frames. Con
+    `roi_inference` YOLO solo procesa los recortes que contienen plazas. Con
+    `smoothing` un cambio de estado se confirma solo tras varias observaciones
+    coincidentes (ocupar) o un plazo sin detecciones (liberar). Cada
+    SPOT_RELOAD_INTERVAL segundos se comprueba si cambió la geometría de las
+    plazas y, de ser así, se reemplaza sin reiniciar. Con `metrics_port` se
+    exponen histogramas por etapa, contadores y profundidad de colas en
+    /metrics para Prometheus.
+    """
+    import cv2
+
+    from occupancy_smoothing import OccupancySmoother
+    from spot_reload import SpotReloader
+    from visualization import AnnotatedFrameServer
+
     # Cargar plazas y mapeo desde la base de datos
     spots, spot_mapping = load_spots_from_db()
     
@@ -358,6 +474,10 @@ def main(video_source=0):
         return
     
     print(f"[INFO] Mapeo de plazas cargado: {spot_mapping}")
+    spots_by_id = {s["id"]: s for s in spots}
+
+    # Cargar y calentar el modelo antes de abrir la cámara
+    get_detector()
 
     # Detectar backend apropiado según el sistema operativo
     camera_backend = get_camera_backend()
@@ -371,32 +491,157 @@ def main(video_source=0):
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_RESOLUTION[0])
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_RESOLUTION[1])
 
-    print(f"[INFO] Cámara iniciada ({CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}). Presiona 'q' para salir.\n")
+    if headless:
+        print(f"[INFO] Cámara iniciada ({CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}) en modo headless. Ctrl+C para salir.\n")
+    else:
+        print(f"[INFO] Cámara iniciada ({CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}). Presiona 'q' para salir.\n")
 
-    frame_count = 0
-    last_detections, last_status = [], []
+    build = partial(build_layout, motion_gate=motion_gate, roi_inference=roi_inference)
+    layout = build(spots, spot_mapping)
+    gate, detect = layout.gate, layout.detect_fn
+    smoother = OccupancySmoother() if smoothing else None
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("[ERROR] No se pudo leer el frame de la cámara.")
-            break
+    reloader = None
+    if SPOT_RELOAD_INTERVAL:
+        reloader = SpotReloader(db_pool.connection, SPOTS_FILE, load_spots_from_db, build,
+                                interval=SPOT_RELOAD_INTERVAL).start()
 
-        if frame_count % FRAME_SKIP == 0:
-            last_detections = detect_vehicles(frame)
-            last_status = check_occupancy(spots, last_detections)
-            save_to_oracle(last_status, spot_mapping)
-        frame_count += 1
+    viewer = None
+    if stream_port:
+        viewer = AnnotatedFrameServer(spots_by_id, stream_port)
+        viewer.start()
 
-        frame = draw_visuals(frame, spots, last_detections, last_status)
-        cv2.imshow("Parking Monitor", frame)
+    metrics = get_metrics()
+    metrics_server = None
+    if metrics_port:
+        from metrics import serve_metrics
 
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+        metrics_server = serve_metrics(metrics_port, metrics.registry)
 
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        if pipelined:
+            # El hilo de captura ya descarta frames viejos; evitar que V4L2 los acumule
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            print("[INFO] Modo pipeline: captura, inferencia y BD en hilos separados.")
+            run_pipelined(cap, spots, spot_mapping, spots_by_id, headless, viewer, gate, detect, smoother,
+                          reloader)
+            return
+
+        frame_count = 0
+        last_detections, last_status = [], []
+        last_report = time.monotonic()
+        capture_hist, inference_hist = metrics.stage("capture"), metrics.stage("inference")
+        occupancy_hist, db_hist = metrics.stage("occupancy"), metrics.stage("db")
+
+        while True:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                print("[ERROR] No se pudo leer el frame de la cámara.")
+                break
+            capture_hist.observe(time.perf_counter() - start)
+            metrics.frames.inc()
+
+            layout = reloader.take() if reloader is not None else None
+            if layout is not None:
+                spots, spot_mapping, spots_by_id = layout.spots, layout.spot_mapping, layout.spots_by_id
+                gate, detect = layout.gate, layout.detect_fn
+                if smoother is not None:
+                    smoother.reset()  # los IDs de plaza pueden haber cambiado
+                last_detections, last_status = [], []
+                on_layout_swap(layout, viewer)
+
+            if gate is not None:
+                run_inference = gate.should_infer(
+                    frame, force=smoother is not None and smoother.has_pending())
+            else:
+                run_inference = frame_count % FRAME_SKIP == 0
+
+            if run_inference:
+                start = time.perf_counter()
+                last_detections = detect(frame)
+                mid = time.perf_counter()
+                if gate is not None:
+                    gate.record_inference(mid - start)
+                last_status = check_occupancy(spots, last_detections)
+                if smoother is not None:
+                    last_status = smoother.apply(last_status)
+                end = time.perf_counter()
+                save_to_oracle(last_status, spot_mapping)
+                inference_hist.observe(mid - start)
+                occupancy_hist.observe(end - mid)
+                db_hist.observe(time.perf_counter() - end)
+                metrics.inferences.inc()
+            else:
+                metrics.frames_skipped.inc()
+                if smoother is not None:
+                    # Sin inferencia: solo pueden vencer plazos de la histéresis
+                    ticked = smoother.tick()
+                    if ticked is not None:
+                        last_status = ticked
+                        start = time.perf_counter()
+                        save_to_oracle(last_status, spot_mapping)
+                        db_hist.observe(time.perf_counter() - start)
+            frame_count += 1
+
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                for component in (gate, smoother, _WRITER):
+                    if component is not None:
+                        print(component.format_stats())
+                last_report = time.monotonic()
+
+            if viewer is not None:
+                viewer.publish(frame, last_detections, last_status)
+            # El visor dibuja en su hilo sobre el frame publicado: solo entonces anotar una copia
+            if not headless:
+                shown = frame.copy() if viewer is not None else frame
+                if not show_frame(shown, spots_by_id, last_detections, last_status):
+                    break
+    except KeyboardInterrupt:
+        print("\n[INFO] Monitor detenido.")
+    finally:
+        if not pipelined:
+            for component in (gate, smoother):
+                if component is not None:
+                    print(component.format_stats())
+        if reloader is not None:
+            reloader.stop()
+        if viewer is not None:
+            viewer.stop()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        close_writer()
+        cap.release()
+        if not headless:
+            cv2.destroyAllWindows()
+
+
+def parse_source(value):
+    """Convierte el argumento de fuente: índice de cámara, URL RTSP o archivo."""
+    return int(value) if value.isdigit() else value
 
 
 if __name__ == "__main__":
-    main(0)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monitor de ocupación de estacionamiento")
+    parser.add_argument("--source", default="0", help="Índice de cámara, URL RTSP o archivo de video")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Captura, inferencia y BD en hilos separados con colas acotadas")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin ventana ni dibujo (servidores sin pantalla)")
+    parser.add_argument("--stream-port", type=int, default=None,
+                        help="Servir el video anotado por HTTP (MJPEG y /snapshot.jpg) en este puerto")
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="Inferir cada FRAME_SKIP frames aunque la escena no cambie")
+    parser.add_argument("--roi", action="store_true",
+                        help="Inferir solo sobre los recortes del frame que contienen plazas")
+    parser.add_argument("--no-smoothing", action="store_true",
+                        help="Escribir cada cambio detectado sin histéresis por plaza")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Exponer métricas Prometheus en http://0.0.0.0:<puerto>/metrics")
+    args = parser.parse_args()
+
+    main(parse_source(args.source), pipelined=args.pipeline, headless=args.headless,
+         stream_port=args.stream_port, motion_gate=not args.no_motion_gate,
+         roi_inference=args.roi, smoothing=not args.no_smoothing, metrics_port=args.metrics_port)
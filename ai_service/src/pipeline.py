@@ -0,0 +1,316 @@
+# pipeline.py — Pipeline con hilos para el monitor: captura → inferencia → BD
+#
+# Cada etapa corre en su propio hilo y se comunica con la siguiente mediante
+# colas acotadas que descartan el elemento más antiguo cuando están llenas.
+# Así una consulta lenta a Oracle nunca frena la cámara ni la inferencia:
+# siempre se trabaja con el frame más reciente.
+
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    """Cola acotada que descarta el elemento más antiguo al llenarse."""
+
+    def __init__(self, maxsize=1):
+        if maxsize < 1:
+            raise ValueError("maxsize debe ser >= 1")
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Encola `item`. Devuelve True si se descartó un elemento viejo."""
+        with self._cond:
+            dropped = False
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        """Devuelve el elemento más antiguo o None si vence el timeout."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """
+    Contadores de latencia de una etapa del pipeline (thread-safe). Con
+    `histogram` (metrics.Histogram) cada medición también se publica en /metrics.
+    """
+
+    def __init__(self, name, histogram=None):
+        self.name = name
+        self.histogram = histogram
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            avg = self.total / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "avg_ms": avg * 1000,
+                "last_ms": self.last * 1000,
+                "max_ms": self.max * 1000,
+            }
+
+
+class LatestFrameGrabber:
+    """Hilo de captura que conserva únicamente el último frame leído."""
+
+    def __init__(self, cap, stats=None):
+        self._cap = cap
+        self._stats = stats or StageStats("capture")
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._seq = 0
+        self._running = False
+        self._thread = None
+        self.failed = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    @property
+    def running(self):
+        return self._running
+
+    def _run(self):
+        while self._running:
+            start = time.perf_counter()
+            ret, frame = self._cap.read()
+            if not ret:
+                print("[ERROR] No se pudo leer el frame de la cámara.")
+                self.failed = True
+                self._running = False
+                with self._cond:
+                    self._cond.notify_all()
+                break
+            self._stats.record(time.perf_counter() - start)
+            with self._cond:
+                self._frame = frame
+                self._timestamp = time.monotonic()
+                self._seq += 1
+                self._cond.notify_all()
+
+    def wait_newer(self, seq, timeout=None):
+        """
+        Espera un frame con número de secuencia mayor a `seq`.
+        Devuelve (seq, frame, timestamp) o None si vence el timeout.
+        """
+        with self._cond:
+            if self._seq <= seq and self._running:
+                self._cond.wait(timeout)
+            if self._seq <= seq:
+                return None
+            return self._seq, self._frame, self._timestamp
+
+
+class MonitorPipeline:
+    """
+    Orquesta las tres etapas del monitor en hilos separados.
+
+    - captura: LatestFrameGrabber (solo retiene el último frame)
+    - inferencia: detect_fn(frame) + occupancy_fn(spots, detections), opcionalmente
+      precedida por una compuerta de movimiento (motion_gate.MotionGate) y
+      seguida de la histéresis por plaza (occupancy_smoothing.OccupancySmoother)
+    - BD: sink_fn(status), alimentado por una cola con descarte del más viejo
+
+    `stats` expone latencias por etapa y `freshness` mide el tiempo desde la
+    captura de un frame hasta que su estado quedó escrito en la BD. Con
+    `metrics` (metrics.MonitorMetrics) lo mismo se publica para Prometheus.
+    """
+
+    def __init__(self, cap, spots, detect_fn, occupancy_fn, sink_fn, db_queue_size=2, gate=None,
+                 smoother=None, metrics=None):
+        self.spots = spots
+        self.gate = gate
+        self.smoother = smoother
+        self._detect_fn = detect_fn
+        self._occupancy_fn = occupancy_fn
+        self._sink_fn = sink_fn
+
+        self.stats = {
+            "capture": StageStats("capture"),
+            "inference": StageStats("inference"),
+            "occupancy": StageStats("occupancy"),
+            "db": StageStats("db"),
+            "freshness": StageStats("freshness"),
+        }
+        self.grabber = LatestFrameGrabber(cap, self.stats["capture"])
+        self.db_queue = DropOldestQueue(db_queue_size)
+
+        self.metrics = metrics
+        if metrics is not None:
+            for name, stage in self.stats.items():
+                stage.histogram = metrics.stage(name)
+            metrics.frames.set_function(lambda: self.stats["capture"].count)
+            metrics.watch_queue("db", self.db_queue.qsize)
+
+        self._result_lock = threading.Lock()
+        self._pending_swap = None
+        self._last_detections = []
+        self._last_status = []
+        self._running = False
+        self._threads = []
+
+    # --- Ciclo de vida ---
+    def start(self):
+        self._running = True
+        self.grabber.start()
+        self._threads = [
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+            threading.Thread(target=self._db_loop, name="db-writer", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._running = False
+        self.grabber.stop()
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def is_running(self):
+        return self._running and self.grabber.running
+
+    def swap(self, spots, detect_fn, gate, sink_fn):
+        """
+        Reemplaza las plazas y lo que depende de ellas. El hilo de inferencia
+        aplica el cambio entre dos frames; lo ya encolado para la BD se
+        escribe con el sink_fn con que se calculó.
+        """
+        with self._result_lock:
+            self._pending_swap = (spots, detect_fn, gate, sink_fn)
+
+    def _apply_swap(self):
+        with self._result_lock:
+            pending, self._pending_swap = self._pending_swap, None
+        if pending is not None:
+            self.spots, self._detect_fn, self.gate, self._sink_fn = pending
+            if self.smoother is not None:
+                self.smoother.reset()  # los IDs de plaza pueden haber cambiado
+
+    # --- Etapas ---
+    def _inference_loop(self):
+        seq = 0
+        while self._running:
+            item = self.grabber.wait_newer(seq, timeout=0.5)
+            if item is None:
+                if not self.grabber.running:
+                    break
+                continue
+            seq, frame, captured_at = item
+            self._apply_swap()
+
+            # Escena sin cambios: el último estado sigue vigente, pero los
+            # plazos de la histéresis siguen corriendo. Con un cambio sin
+            # confirmar se infiere igual, para juntar las observaciones
+            force = self.smoother is not None and self.smoother.has_pending()
+            if self.gate is not None and not self.gate.should_infer(frame, force=force):
+                if self.metrics is not None:
+                    self.metrics.frames_skipped.inc()
+                status = self.smoother.tick() if self.smoother is not None else None
+                if status is not None:
+                    with self._result_lock:
+                        self._last_status = status
+                    self.db_queue.put((captured_at, status, self._sink_fn))
+                continue
+
+            start = time.perf_counter()
+            detections = self._detect_fn(frame)
+            mid = time.perf_counter()
+            if self.gate is not None:
+                self.gate.record_inference(mid - start)
+            status = self._occupancy_fn(self.spots, detections)
+            if self.smoother is not None:
+                status = self.smoother.apply(status)
+            end = time.perf_counter()
+            self.stats["inference"].record(mid - start)
+            self.stats["occupancy"].record(end - mid)
+            if self.metrics is not None:
+                self.metrics.inferences.inc()
+
+            with self._result_lock:
+                self._last_detections = detections
+                self._last_status = status
+            self.db_queue.put((captured_at, status, self._sink_fn))
+
+    def _db_loop(self):
+        while self._running or self.db_queue.qsize():
+            item = self.db_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, status, sink_fn = item
+            start = time.perf_counter()
+            try:
+                sink_fn(status)
+            except Exception as e:
+                print(f"[ERROR] Error en el escritor de BD: {e}")
+            self.stats["db"].record(time.perf_counter() - start)
+            self.stats["freshness"].record(time.monotonic() - captured_at)
+
+    # --- Consulta desde el hilo principal ---
+    def latest_result(self):
+        with self._result_lock:
+            return self._last_detections, self._last_status
+
+    def stats_snapshot(self):
+        snapshot = {name: s.snapshot() for name, s in self.stats.items()}
+        snapshot["db_queue"] = {"depth": self.db_queue.qsize(), "dropped": self.db_queue.dropped}
+        if self.gate is not None:
+            snapshot["motion_gate"] = self.gate.stats()
+        if self.smoother is not None:
+            snapshot["smoothing"] = self.smoother.stats()
+        return snapshot
+
+    def format_stats(self):
+        parts = []
+        for name, s in self.stats.items():
+            snap = s.snapshot()
+            parts.append(f"{name}={snap['avg_ms']:.1f}ms (max {snap['max_ms']:.1f}, n={snap['count']})")
+        parts.append(f"db_queue={self.db_queue.qsize()} (descartados {self.db_queue.dropped})")
+        text = "[STATS] " + " | ".join(parts)
+        if self.gate is not None:
+            text += "\n" + self.gate.format_stats()
+        if self.smoother is not None:
+            text += "\n" + self.smoother.format_stats()
+        return text
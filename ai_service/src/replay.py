@@ -0,0 +1,293 @@
+# replay.py — Reproducción offline del pipeline de detección
+#
+# Pasa un video o una carpeta de frames por el mismo camino que el monitor
+# (detect_vehicles → check_occupancy → histéresis → escritura) sin cámara ni
+# Oracle, y reporta frames/s, latencia p50/p95/p99 por etapa y RSS máximo como
+# JSON. Sirve para detectar regresiones de rendimiento en cualquier máquina
+# Linux y comparar configuraciones (--roi, --motion-gate, backends).
+#
+# Sumideros de escritura:
+#   memory  cuenta los cambios de estado en memoria (sin I/O)
+#   sqlite  anexa los cambios al spool SQLite de write_behind.py, como el
+#           monitor con WRITE_BEHIND, pero sin el hilo que los envía a Oracle
+#
+# Uso:
+#   cd src
+#   python replay.py --source ../videos/plaza4.mp4 [--realtime] [--sink sqlite]
+#   python replay.py --source ../frames/ --fps 10 --realtime --output replay.json
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import parking_monitor
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ("decode", "gate", "detect", "occupancy", "smoothing", "sink", "total")
+
+
+class MemorySink:
+    """Sumidero sin I/O: detecta cambios de estado igual que el escritor y los cuenta."""
+
+    def __init__(self):
+        self._last_status = {}
+        self.recorded = 0
+
+    def record(self, status, spot_mapping):
+        changes = 0
+        for spot in status:
+            new_status = 'occupied' if spot["occupied"] else 'free'
+            if self._last_status.get(spot["id"]) != new_status:
+                self._last_status[spot["id"]] = new_status
+                changes += 1
+        self.recorded += changes
+        return changes
+
+    def close(self):
+        pass
+
+
+class SpoolSink:
+    """Sumidero SQLite: el lado del monitor de WriteBehindSync, sin hilo escritor."""
+
+    def __init__(self, path):
+        from write_behind import WriteBehindSync
+
+        self._writer = WriteBehindSync(None, path)
+
+    def record(self, status, spot_mapping):
+        return self._writer.record(status, spot_mapping)
+
+    @property
+    def recorded(self):
+        return self._writer.recorded
+
+    def close(self):
+        self._writer.spool.close()
+
+
+def iter_frames(source, fps=None):
+    """
+    Genera los frames de un video o de una carpeta de imágenes (en orden de
+    nombre). Devuelve (generador, fps de la fuente o None).
+    """
+    import cv2
+
+    path = Path(source)
+    if path.is_dir():
+        paths = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not paths:
+            raise SystemExit(f"[ERROR] No hay imágenes en {source}")
+
+        def frames():
+            for p in paths:
+                frame = cv2.imread(str(p))
+                if frame is not None:
+                    yield frame
+
+        return frames(), fps
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise SystemExit(f"[ERROR] No se pudo abrir el video: {source}")
+
+    def frames():
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        finally:
+            cap.release()
+
+    return frames(), fps or cap.get(cv2.CAP_PROP_FPS) or None
+
+
+def peak_rss_mb():
+    """RSS máximo del proceso en MB (None si la plataforma no lo informa)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(samples):
+    """Cantidad, media y percentiles (ms) de una lista de duraciones en segundos."""
+    import numpy as np
+
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def replay(frames, spots, spot_mapping, sink, fps=None, realtime=False, limit=None,
+           motion_gate=False, roi_inference=False, smoothing=True):
+    """
+    Procesa `frames` y devuelve el reporte (dict). Con `realtime` se respeta
+    `fps` (los frames se entregan a su hora aunque el pipeline vaya más
+    rápido); si no, se procesan tan rápido como sea posible.
+    """
+    from occupancy_smoothing import OccupancySmoother
+
+    layout = parking_monitor.build_layout(spots, spot_mapping, motion_gate=motion_gate,
+                                          roi_inference=roi_inference)
+    gate, detect = layout.gate, layout.detect_fn
+    smoother = OccupancySmoother() if smoothing else None
+    timings = {stage: [] for stage in STAGES}
+    pace = 1.0 / fps if realtime and fps else None
+
+    processed = inferred = 0
+    frames = iter(frames)
+    start = time.perf_counter()
+    while limit is None or processed < limit:
+        if pace is not None:
+            delay = start + processed * pace - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        frame = next(frames, None)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        timings["decode"].append(t1 - t0)
+
+        run_inference = True
+        if gate is not None:
+            run_inference = gate.should_infer(
+                frame, force=smoother is not None and smoother.has_pending())
+            timings["gate"].append(time.perf_counter() - t1)
+
+        status = None
+        if run_inference:
+            t2 = time.perf_counter()
+            detections = detect(frame)
+            t3 = time.perf_counter()
+            if gate is not None:
+                gate.record_inference(t3 - t2)
+            status = parking_monitor.check_occupancy(spots, detections)
+            t4 = time.perf_counter()
+            timings["detect"].append(t3 - t2)
+            timings["occupancy"].append(t4 - t3)
+            if smoother is not None:
+                status = smoother.apply(status)
+                timings["smoothing"].append(time.perf_counter() - t4)
+            inferred += 1
+        elif smoother is not None:
+            t2 = time.perf_counter()
+            status = smoother.tick()
+            timings["smoothing"].append(time.perf_counter() - t2)
+
+        if status is not None:
+            t5 = time.perf_counter()
+            sink.record(status, spot_mapping)
+            timings["sink"].append(time.perf_counter() - t5)
+
+        timings["total"].append(time.perf_counter() - t0)
+        processed += 1
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "frames": processed,
+        "inferred_frames": inferred,
+        "elapsed_s": round(elapsed, 3),
+        "fps": round(processed / elapsed, 2) if elapsed else 0.0,
+        "realtime": bool(pace),
+        "source_fps": fps,
+        "spots": len(spots),
+        "state_changes": sink.recorded,
+        "stages": {stage: summarize(samples) for stage, samples in timings.items() if samples},
+        "peak_rss_mb": peak_rss_mb(),
+        "config": {
+            "detector_backend": parking_monitor.DETECTOR_BACKEND,
+            "motion_gate": gate is not None,
+            "roi_inference": roi_inference,
+            "smoothing": smoother is not None,
+        },
+    }
+    if smoother is not None:
+        report["smoothing"] = smoother.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducción offline del pipeline de detección")
+    parser.add_argument("--source", required=True, help="Archivo de video o carpeta de frames")
+    parser.add_argument("--spots", default=str(parking_monitor.SPOTS_FILE),
+                        help="JSON de plazas (formato de draw_spots.py)")
+    parser.add_argument("--spots-from-db", action="store_true", help="Leer las plazas de Oracle")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="FPS de la fuente (obligatorio con --realtime para carpetas de frames)")
+    parser.add_argument("--realtime", action="store_true", help="Entregar los frames a su FPS grabado")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de frames a procesar")
+    parser.add_argument("--sink", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--spool", default=None, help="Spool SQLite (por defecto uno temporal)")
+    parser.add_argument("--motion-gate", action="store_true", help="Activar la compuerta de movimiento")
+    parser.add_argument("--roi", action="store_true", help="Inferir solo sobre los recortes de las plazas")
+    parser.add_argument("--no-smoothing", action="store_true")
+    parser.add_argument("--output", default=None, help="Escribir el JSON en este archivo además de stdout")
+    args = parser.parse_args()
+
+    # Los mensajes [INFO] van a stderr: stdout queda solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+
+
+def run(args):
+    if args.spots_from_db:
+        spots, spot_mapping = parking_monitor.load_spots_from_db()
+    else:
+        parking_monitor.SPOTS_FILE = Path(args.spots)
+        spots, spot_mapping = parking_monitor.load_spots_from_json()
+    if not spots:
+        raise SystemExit("[ERROR] No hay plazas para reproducir.")
+    # Sin spot_mapping.json, numerar como lo haría la BD (el spool necesita un código)
+    spot_mapping = spot_mapping or {s["id"]: s.get("spaceCode", str(s["id"])) for s in spots}
+
+    frames, fps = iter_frames(args.source, args.fps)
+    if args.realtime and not fps:
+        raise SystemExit("[ERROR] La fuente no informa FPS; indicar --fps.")
+
+    # Carga y calentamiento del modelo fuera de la medición
+    parking_monitor.get_detector()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.sink == "sqlite":
+            sink = SpoolSink(args.spool or os.path.join(tmp, "replay_spool.db"))
+        else:
+            sink = MemorySink()
+        try:
+            report = replay(frames, spots, spot_mapping, sink, fps=fps, realtime=args.realtime,
+                            limit=args.limit, motion_gate=args.motion_gate, roi_inference=args.roi,
+                            smoothing=not args.no_smoothing)
+        finally:
+            sink.close()
+
+    report["source"] = str(args.source)
+    report["sink"] = args.sink
+    return report
+
+
+if __name__ == "__main__":
+    main()
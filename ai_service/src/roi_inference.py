@@ -0,0 +1,126 @@
+# roi_inference.py — Inferencia recortada a la región de las plazas
+#
+# En lugar de pasar el frame completo por YOLO, se calculan una o pocas
+# regiones (tiles) que cubren las plazas cargadas y se infiere solo sobre
+# esos recortes, en un único predict por lotes. Las detecciones se trasladan
+# de vuelta a coordenadas del frame, así check_occupancy no cambia. Como cada
+# recorte se reescala a imgsz, los autos pequeños ganan resolución efectiva.
+
+import cv2
+import numpy as np
+
+ROI_MARGIN = 24          # píxeles alrededor de cada plaza (autos que sobresalen)
+MERGE_GAP = 32           # plazas más cercanas que esto comparten tile
+MAX_TILES = 4
+FULL_FRAME_RATIO = 0.8   # si los tiles cubren más que esto, usar el frame completo
+
+
+def _spot_rects(spots, width, height, margin):
+    rects = []
+    for spot in spots:
+        (x1, y1), (x2, y2) = spot["coords"]
+        xa, xb = sorted((x1, x2))
+        ya, yb = sorted((y1, y2))
+        rects.append((
+            max(0, int(xa) - margin), max(0, int(ya) - margin),
+            min(width, int(xb) + margin), min(height, int(yb) + margin),
+        ))
+    return [r for r in rects if r[2] > r[0] and r[3] > r[1]]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(r):
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def compute_roi_tiles(spots, frame_shape, margin=ROI_MARGIN, merge_gap=MERGE_GAP,
+                      max_tiles=MAX_TILES, full_frame_ratio=FULL_FRAME_RATIO):
+    """
+    Devuelve la lista de tiles (x1, y1, x2, y2) que cubren todas las plazas,
+    o None si conviene inferir sobre el frame completo.
+
+    Los grupos de plazas cercanas se obtienen como componentes conexas de una
+    máscara de las plazas dilatada `merge_gap` píxeles; si quedan más de
+    `max_tiles` grupos se fusionan los pares que menos área agregan.
+    """
+    height, width = frame_shape[:2]
+    rects = _spot_rects(spots, width, height, margin)
+    if not rects:
+        return None
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for x1, y1, x2, y2 in rects:
+        mask[y1:y2, x1:x2] = 255
+    if merge_gap > 0:
+        kernel = np.ones((merge_gap, merge_gap), dtype=np.uint8)
+        mask = cv2.dilate(mask, kernel)
+
+    n, labels = cv2.connectedComponents(mask)
+    # Cada tile es la unión de los rectángulos originales de su componente
+    groups = {}
+    for r in rects:
+        label = int(labels[(r[1] + r[3]) // 2, (r[0] + r[2]) // 2])
+        groups[label] = _union(groups[label], r) if label in groups else r
+    tiles = list(groups.values())
+
+    while len(tiles) > max_tiles:
+        best = None
+        for i in range(len(tiles)):
+            for j in range(i + 1, len(tiles)):
+                merged = _union(tiles[i], tiles[j])
+                cost = _area(merged) - _area(tiles[i]) - _area(tiles[j])
+                if best is None or cost < best[0]:
+                    best = (cost, i, j, merged)
+        _, i, j, merged = best
+        tiles = [t for k, t in enumerate(tiles) if k not in (i, j)] + [merged]
+
+    if sum(_area(t) for t in tiles) >= full_frame_ratio * width * height:
+        return None
+    return tiles
+
+
+class RoiDetector:
+    """
+    Envuelve una función de inferencia por lotes para que solo procese los
+    tiles de las plazas. Los tiles se recalculan si cambia el tamaño del frame.
+    """
+
+    def __init__(self, spots, detect_batch_fn, **tile_options):
+        self.spots = spots
+        self._detect_batch_fn = detect_batch_fn
+        self._tile_options = tile_options
+        self._shape = None
+        self.tiles = None
+
+    def _ensure_tiles(self, shape):
+        if shape != self._shape:
+            self._shape = shape
+            self.tiles = compute_roi_tiles(self.spots, shape, **self._tile_options)
+            if self.tiles is None:
+                print("[INFO] Inferencia ROI: las plazas cubren casi todo el frame, se usa el frame completo")
+            else:
+                covered = sum(_area(t) for t in self.tiles) / (shape[0] * shape[1])
+                print(f"[INFO] Inferencia ROI: {len(self.tiles)} tiles, {covered*100:.0f}% del frame")
+
+    def __call__(self, frame):
+        """Detecciones (x1, y1, x2, y2, conf, cls) en coordenadas del frame completo."""
+        self._ensure_tiles(frame.shape[:2])
+        if self.tiles is None:
+            return self._detect_batch_fn([frame])[0]
+
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.tiles]
+        results = self._detect_batch_fn(crops)
+        out = []
+        for (x1, y1, _, _), dets in zip(self.tiles, results):
+            if len(dets) == 0:
+                continue
+            dets = np.array(dets, dtype=np.float32, copy=True)
+            dets[:, [0, 2]] += x1
+            dets[:, [1, 3]] += y1
+            out.append(dets)
+        if not out:
+            return np.zeros((0, 6), dtype=np.float32)
+        return np.concatenate(out)
@@ -0,0 +1,63 @@
+# spot_index.py — Índice espacial (grilla uniforme) sobre los rectángulos de plazas
+#
+# Con cámaras gran angular que cubren cientos de plazas, comparar cada
+# detección contra todas las plazas desperdicia trabajo. La grilla se construye
+# una sola vez al cargar las plazas y para cada detección devuelve solo las
+# plazas cuyas celdas toca (un superconjunto de las que realmente intersecta).
+
+import numpy as np
+
+
+class SpotGridIndex:
+    """
+    Grilla uniforme sobre cajas normalizadas (N, 4) = x1, y1, x2, y2.
+
+    Si `cell_size` no se indica se usa el doble de la mediana del lado de las
+    plazas, de modo que cada plaza cae en pocas celdas.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32)
+        if cell_size is None:
+            if len(self.boxes):
+                sides = np.concatenate([
+                    self.boxes[:, 2] - self.boxes[:, 0],
+                    self.boxes[:, 3] - self.boxes[:, 1],
+                ])
+                cell_size = max(float(np.median(sides)) * 2, 1.0)
+            else:
+                cell_size = 64.0
+        self.cell_size = float(cell_size)
+
+        cells = {}
+        for idx, (x1, y1, x2, y2) in enumerate(self.boxes):
+            for cx in range(self._cell(x1), self._cell(x2) + 1):
+                for cy in range(self._cell(y1), self._cell(y2) + 1):
+                    cells.setdefault((cx, cy), []).append(idx)
+        self._cells = {key: np.array(v, dtype=np.intp) for key, v in cells.items()}
+        self._empty = np.zeros(0, dtype=np.intp)
+
+    def _cell(self, value):
+        return int(value // self.cell_size)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def candidates(self, box, unique=True):
+        """
+        Índices de las plazas que pueden intersectar `box` (x1, y1, x2, y2).
+        Con `unique=False` una plaza puede repetirse si ocupa varias celdas.
+        """
+        x1, y1, x2, y2 = box
+        found = [
+            self._cells[key]
+            for cx in range(self._cell(x1), self._cell(x2) + 1)
+            for cy in range(self._cell(y1), self._cell(y2) + 1)
+            if (key := (cx, cy)) in self._cells
+        ]
+        if not found:
+            return self._empty
+        if len(found) == 1:
+            return found[0]
+        merged = np.concatenate(found)
+        return np.unique(merged) if unique else merged
@@ -0,0 +1,132 @@
+# spot_reload.py — Recarga en caliente de la geometría de plazas
+#
+# draw_spots.define_spots reescribe "parking_spaces" mientras el monitor corre.
+# Un hilo consulta cada pocos segundos una huella barata de la geometría (una
+# sola fila agregada en Oracle, más mtime/tamaño de parking_spots.json) y, si
+# cambió, carga las plazas nuevas y precalcula sus estructuras fuera del bucle
+# principal. El bucle las toma con take() entre dos frames y reemplaza todas
+# sus referencias de una vez, sin detener la captura.
+#
+# No se usa MAX("updatedAt"): cada cambio de ocupación lo actualiza. La huella
+# combina la cantidad de plazas, el último "createdAt" (define_spots borra y
+# reinserta) y una suma de ORA_HASH de código y coordenadas (ediciones en el
+# lugar).
+
+import os
+import threading
+
+RELOAD_INTERVAL = 5.0  # segundos entre chequeos
+
+GEOMETRY_FINGERPRINT_SQL = (
+    'SELECT COUNT(*), MAX("createdAt"), '
+    'SUM(ORA_HASH("spaceCode" || \':\' || "x1" || \',\' || "y1" || \',\' || "x2" || \',\' || "y2")) '
+    'FROM "parking_spaces" WHERE "x1" IS NOT NULL'
+)
+
+
+def db_fingerprint(conn):
+    """Huella de la geometría guardada en la BD."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(GEOMETRY_FINGERPRINT_SQL)
+        return tuple(cursor.fetchone())
+    finally:
+        cursor.close()
+
+
+def file_fingerprint(path):
+    """Huella (mtime, tamaño) del archivo JSON de respaldo, o None si no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class SpotLayout:
+    """Plazas y estructuras precalculadas a partir de ellas; se reemplaza entera."""
+
+    def __init__(self, spots, spot_mapping, engine=None, gate=None, detect_fn=None):
+        self.spots = spots
+        self.spot_mapping = spot_mapping
+        self.spots_by_id = {s["id"]: s for s in spots}
+        self.engine = engine
+        self.gate = gate
+        self.detect_fn = detect_fn
+
+
+class SpotReloader:
+    """
+    Vigila la geometría de plazas en segundo plano.
+
+    `load_fn()` devuelve (spots, spot_mapping) y `build_fn(spots, mapping)`
+    construye el SpotLayout; ambos corren en el hilo del recargador. Si la BD
+    no responde se conserva su última huella, así una caída no dispara una
+    recarga.
+    """
+
+    def __init__(self, acquire, json_path, load_fn, build_fn, interval=RELOAD_INTERVAL):
+        self._acquire = acquire
+        self.json_path = json_path
+        self._load_fn = load_fn
+        self._build_fn = build_fn
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._current = None
+        self._db_fp = None
+        self._file_fp = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+
+    def _fingerprint(self):
+        try:
+            with self._acquire() as conn:
+                self._db_fp = db_fingerprint(conn)
+        except Exception:
+            pass  # mantener la última huella conocida
+        self._file_fp = file_fingerprint(self.json_path)
+        return (self._db_fp, self._file_fp)
+
+    def start(self):
+        self._current = self._fingerprint()
+        self._thread = threading.Thread(target=self._run, name="spot-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def check(self):
+        """Compara la huella y prepara un layout nuevo si cambió. Devuelve True si lo hizo."""
+        fingerprint = self._fingerprint()
+        if fingerprint == self._current:
+            return False
+
+        spots, spot_mapping = self._load_fn()
+        if not spots:
+            print("[WARNING] La geometría de plazas cambió pero no se pudo cargar; se mantiene la actual.")
+            return False
+        layout = self._build_fn(spots, spot_mapping)
+        with self._lock:
+            self._pending = layout
+        self._current = fingerprint
+        self.reloads += 1
+        return True
+
+    def take(self):
+        """Devuelve el layout nuevo pendiente (una sola vez) o None."""
+        with self._lock:
+            layout, self._pending = self._pending, None
+        return layout
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[ERROR] Error al recargar la geometría de plazas: {e}")
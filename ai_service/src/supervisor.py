@@ -0,0 +1,364 @@
+# supervisor.py — Supervisor multi-cámara del monitor de estacionamiento
+#
+# Ejecuta un proceso por cámara (índice de dispositivo, URL RTSP o archivo),
+# cada uno con su propio subconjunto de plazas. El modelo YOLO se carga una
+# sola vez en el proceso supervisor, que atiende las inferencias de todas las
+# cámaras en lotes (ver batch_inference.py), y un único escritor de BD
+# sincroniza el estado con Oracle.
+# Los workers caídos se reinician con espera exponencial.
+#
+# Uso:
+#   cd src
+#   python supervisor.py --config ../config/cameras.json --metrics-port 9100
+
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from metrics import REGISTRY, serve_metrics
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CAMERAS_FILE = PROJECT_ROOT / "config" / "cameras.json"
+
+INFERENCE_TIMEOUT = 5.0     # segundos que un worker espera la respuesta del modelo
+METRICS_INTERVAL = 1.0      # cada cuánto un worker publica sus métricas
+RESTART_DELAY_MIN = 1.0
+RESTART_DELAY_MAX = 30.0
+REPORT_INTERVAL = 10
+MAX_BATCH = 8        # frames por lote de inferencia
+MAX_WAIT = 0.02      # segundos máximos para completar un lote
+
+
+# --- Configuración ---
+def load_cameras(path=CAMERAS_FILE):
+    """Lee la lista de cámaras: [{"name", "source", "spaces"? , "spacePrefix"?}]."""
+    with open(path, "r") as f:
+        cameras = json.load(f)
+    names = [c["name"] for c in cameras]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Nombres de cámara repetidos en {path}")
+    return cameras
+
+
+def select_spots(spots, camera):
+    """Filtra las plazas de una cámara por lista de spaceCode o por prefijo."""
+    if "spaces" in camera:
+        wanted = set(camera["spaces"])
+        return [s for s in spots if s.get("spaceCode") in wanted]
+    if "spacePrefix" in camera:
+        return [s for s in spots if str(s.get("spaceCode", "")).startswith(camera["spacePrefix"])]
+    return list(spots)
+
+
+# --- Worker de cámara (proceso hijo) ---
+def camera_worker(camera, spots, request_q, response_q, db_q, metrics_q, stop_event):
+    """Captura, pide inferencia al supervisor y calcula la ocupación de sus plazas."""
+    import cv2
+
+    from occupancy_engine import OccupancyEngine
+    from occupancy_smoothing import OccupancySmoother
+    from pipeline import LatestFrameGrabber, StageStats
+
+    name = camera["name"]
+    source = camera["source"]
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"[ERROR] [{name}] No se pudo abrir la fuente {source}")
+        return
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    engine = OccupancyEngine(spots)
+    smoother = OccupancySmoother()
+    inference = StageStats("inference")
+    grabber = LatestFrameGrabber(cap)
+    grabber.start()
+    print(f"[INFO] [{name}] Worker iniciado (pid {os.getpid()}, {len(spots)} plazas)")
+
+    seq = 0
+    processed = 0
+    window_start = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            item = grabber.wait_newer(seq, timeout=0.5)
+            if item is None:
+                if not grabber.running:
+                    break
+                continue
+            seq, frame, _ = item
+
+            token = (os.getpid(), seq)
+            start = time.perf_counter()
+            request_q.put((name, token, frame))
+            detections = None
+            deadline = time.monotonic() + INFERENCE_TIMEOUT
+            while time.monotonic() < deadline:
+                try:
+                    reply_token, dets = response_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if reply_token == token:  # descartar respuestas viejas
+                    detections = dets
+                    break
+            if detections is None:
+                print(f"[WARNING] [{name}] Timeout esperando inferencia")
+                continue
+            inference.record(time.perf_counter() - start)
+
+            db_q.put((name, smoother.apply(engine.status(detections))))
+            processed += 1
+
+            elapsed = time.monotonic() - window_start
+            if elapsed >= METRICS_INTERVAL:
+                snap = inference.snapshot()
+                smoothing = smoother.stats()
+                metrics_q.put((name, {
+                    "fps": processed / elapsed,
+                    "inference_ms": snap["avg_ms"],
+                    "inference_max_ms": snap["max_ms"],
+                    "frames": snap["count"],
+                    "spots": len(spots),
+                    "transitions": smoothing["transitions"],
+                    "suppressed_flips": smoothing["suppressed"],
+                }))
+                processed = 0
+                window_start = time.monotonic()
+    finally:
+        grabber.stop()
+        cap.release()
+
+
+# --- Servicios del supervisor ---
+class DBWriter:
+    """Único escritor de BD: conserva el último estado por cámara y lo sincroniza."""
+
+    def __init__(self, sync_fn, db_q):
+        self._sync_fn = sync_fn
+        self._db_q = db_q
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while self._running:
+            try:
+                name, status = self._db_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            latest = {name: status}
+            # Vaciar lo acumulado: solo importa el estado más reciente de cada cámara
+            while True:
+                try:
+                    name, status = self._db_q.get_nowait()
+                except queue.Empty:
+                    break
+                latest[name] = status
+            for name, status in latest.items():
+                try:
+                    self._sync_fn(status)
+                except Exception as e:
+                    print(f"[ERROR] [{name}] Error en el escritor de BD: {e}")
+
+
+class CameraMetrics:
+    """
+    Métricas que publica cada worker, como series Prometheus con la etiqueta
+    `camera` en el registro del proceso (el mismo que sirve metrics.serve_metrics).
+
+    Los totales del worker (CUMULATIVE) vuelven a 0 cuando se reinicia; el
+    supervisor llama a restarted() antes de lanzar el nuevo y los contadores
+    publican lo acumulado por los workers anteriores más el total del actual.
+    """
+
+    CUMULATIVE = ("frames", "transitions", "suppressed_flips")
+
+    def __init__(self, registry=REGISTRY):
+        self._lock = threading.Lock()
+        self._cameras = {}  # nombre -> últimos valores, para el reporte [STATS]
+        self._carried = {}  # nombre -> totales de los workers anteriores
+        labels = ("camera",)
+        self._series = {
+            "fps": (registry.gauge("parking_camera_fps", "Frames procesados por segundo", labels), 1),
+            "inference_ms": (registry.gauge(
+                "parking_camera_inference_seconds",
+                "Latencia media de inferencia vista por el worker (ida y vuelta al supervisor)", labels), 1e-3),
+            "inference_max_ms": (registry.gauge(
+                "parking_camera_inference_max_seconds", "Latencia máxima de inferencia", labels), 1e-3),
+            "frames": (registry.counter("parking_camera_frames_total", "Frames inferidos", labels), 1),
+            "spots": (registry.gauge("parking_camera_spots", "Plazas asignadas a la cámara", labels), 1),
+            "transitions": (registry.counter(
+                "parking_camera_transitions_total", "Cambios de estado confirmados", labels), 1),
+            "suppressed_flips": (registry.counter(
+                "parking_camera_suppressed_flips_total", "Parpadeos suprimidos por la histéresis", labels), 1),
+            "restarts": (registry.counter(
+                "parking_camera_restarts_total", "Reinicios del worker", labels), 1),
+        }
+
+    def update(self, name, values):
+        with self._lock:
+            carried = self._carried.get(name, {})
+            values = {key: value + carried.get(key, 0) if key in self.CUMULATIVE else value
+                      for key, value in values.items()}
+            self._cameras.setdefault(name, {}).update(values)
+        for key, value in values.items():
+            series = self._series.get(key)
+            if series is not None:
+                metric, scale = series
+                metric.labels(name).set(value * scale)
+
+    def restarted(self, name):
+        """El worker de `name` se reinicia: sus totales actuales pasan a ser la base."""
+        with self._lock:
+            last = self._cameras.get(name, {})
+            self._carried[name] = {key: last[key] for key in self.CUMULATIVE if key in last}
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(v) for name, v in self._cameras.items()}
+
+
+def watch_batches(model_server, registry=REGISTRY):
+    """Publica el tamaño de los lotes de inferencia, leído en cada scrape."""
+    registry.counter("parking_inference_batches_total", "Lotes de inferencia ejecutados").set_function(
+        lambda: model_server.batches)
+    registry.gauge("parking_inference_batch_size_avg", "Frames promedio por lote").set_function(
+        lambda: model_server.stats_snapshot()["batch_size"]["avg"])
+    registry.gauge("parking_inference_batch_size_max", "Lote más grande").set_function(
+        lambda: model_server.largest_batch)
+
+
+# --- Supervisor ---
+def run_supervisor(cameras, metrics_port=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+    # El modelo y la BD solo se cargan en este proceso, nunca en los workers
+    import parking_monitor
+    from batch_inference import BatchInferenceServer
+
+    spots, spot_mapping = parking_monitor.load_spots_from_db()
+    if not spots:
+        print("[ERROR] No se pudieron cargar las plazas desde la BD ni desde JSON.")
+        return
+    parking_monitor.get_detector()  # cargar y calentar el modelo antes de los workers
+
+    ctx = mp.get_context("spawn")
+    stop_event = ctx.Event()
+    request_q = ctx.Queue(maxsize=len(cameras) * 2)
+    db_q = ctx.Queue()
+    metrics_q = ctx.Queue()
+    response_qs = {c["name"]: ctx.Queue() for c in cameras}
+
+    registry = CameraMetrics()
+    model_server = BatchInferenceServer(
+        parking_monitor.detect_vehicles_batch, request_q, response_qs,
+        max_batch=max_batch, max_wait=max_wait,
+    )
+    db_writer = DBWriter(lambda status: parking_monitor.save_to_oracle(status, spot_mapping), db_q)
+    model_server.start()
+    db_writer.start()
+    watch_batches(model_server)
+    http_server = serve_metrics(metrics_port) if metrics_port else None
+
+    workers = {}
+
+    def spawn(camera):
+        cam_spots = select_spots(spots, camera)
+        proc = ctx.Process(
+            target=camera_worker,
+            name=f"camera-{camera['name']}",
+            args=(camera, cam_spots, request_q, response_qs[camera["name"]], db_q, metrics_q, stop_event),
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    for camera in cameras:
+        workers[camera["name"]] = {
+            "camera": camera,
+            "proc": spawn(camera),
+            "restarts": 0,
+            "delay": RESTART_DELAY_MIN,
+            "restart_at": None,
+        }
+
+    last_report = time.monotonic()
+    try:
+        while True:
+            # Recoger métricas publicadas por los workers
+            try:
+                while True:
+                    name, values = metrics_q.get_nowait()
+                    registry.update(name, values)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for name, w in workers.items():
+                if w["proc"].is_alive():
+                    continue
+                if w["restart_at"] is None:
+                    print(f"[WARNING] [{name}] Worker terminado (exit {w['proc'].exitcode}), "
+                          f"reinicio en {w['delay']:.0f}s")
+                    w["restart_at"] = now + w["delay"]
+                    w["delay"] = min(w["delay"] * 2, RESTART_DELAY_MAX)
+                elif now >= w["restart_at"]:
+                    registry.restarted(name)
+                    w["proc"] = spawn(w["camera"])
+                    w["restarts"] += 1
+                    w["restart_at"] = None
+                    registry.update(name, {"restarts": w["restarts"]})
+
+            if now - last_report >= REPORT_INTERVAL:
+                for name, m in registry.snapshot().items():
+                    print(f"[STATS] [{name}] fps={m.get('fps', 0):.1f} "
+                          f"inferencia={m.get('inference_ms', 0):.1f}ms reinicios={m.get('restarts', 0)}")
+                batch = model_server.stats_snapshot()["batch_size"]
+                print(f"[STATS] lotes={batch['batches']} tamaño medio={batch['avg']:.2f} máx={batch['max']}")
+                if parking_monitor.WRITE_BEHIND:
+                    print(parking_monitor.get_writer().format_stats())
+                last_report = now
+
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("\n[INFO] Deteniendo supervisor...")
+    finally:
+        stop_event.set()
+        for w in workers.values():
+            w["proc"].join(timeout=5)
+            if w["proc"].is_alive():
+                w["proc"].terminate()
+        model_server.stop()
+        db_writer.stop()
+        parking_monitor.close_writer()
+        if http_server is not None:
+            http_server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Supervisor multi-cámara del monitor")
+    parser.add_argument("--config", default=str(CAMERAS_FILE), help="Archivo JSON con las cámaras")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Puerto HTTP para exponer métricas Prometheus en /metrics")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Frames máximos por lote de inferencia")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000,
+                        help="Espera máxima para completar un lote (ms)")
+    args = parser.parse_args()
+
+    run_supervisor(
+        load_cameras(args.config),
+        metrics_port=args.metrics_port,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+    )
@@ -14,10 +14,22 @@ def load_spots():
     with open(SPOTS_FILE) as f:
         return json.load(f)
 
-def check_occupancy(frame, spots, detections):
+def build_spot_index(spots):
+    """Construye una sola vez el índice espacial de las plazas (ver spot_index.py)."""
+    from occupancy_engine import spots_to_boxes
+    from spot_index import SpotGridIndex
+    return SpotGridIndex(spots_to_boxes(spots))
+
+def check_occupancy(frame, spots, detections, index=None):
     """
     Verifica si los lugares están ocupados según las detecciones del modelo.
+
+    Si se pasa `index` (build_spot_index), cada detección se compara solo
+    contra las plazas candidatas; el resultado es el mismo.
     """
+    if index is not None:
+        return _check_occupancy_indexed(spots, detections, index)
+
     status = []
     for spot in spots:
         (x1, y1), (x2, y2) = spot["coords"]
@@ -42,6 +54,27 @@ def check_occupancy(frame, spots, detections):
         })
     return status
 
+def _check_occupancy_indexed(spots, detections, index):
+    vehicle_classes = [None] * len(spots)
+    occupied = [False] * len(spots)
+    # Recorrer detecciones en orden: la primera que toca una plaza define su clase
+    for det in detections:
+        (vx1, vy1, vx2, vy2, cls, conf) = det
+        if conf < 0.4:
+            continue
+        for idx in index.candidates((vx1, vy1, vx2, vy2)):
+            if occupied[idx]:
+                continue
+            (x1, y1), (x2, y2) = spots[idx]["coords"]
+            if overlap((x1, y1, x2, y2), (vx1, vy1, vx2, vy2)):
+                occupied[idx] = True
+                vehicle_classes[idx] = cls
+
+    return [
+        {"id": spot["id"], "occupied": occupied[i], "vehicle_class": vehicle_classes[i]}
+        for i, spot in enumerate(spots)
+    ]
+
 def overlap(boxA, boxB):
     """Calcula si hay solapamiento entre dos cajas (x1,y1,x2,y2)."""
     xA = max(boxA[0], boxB[0])
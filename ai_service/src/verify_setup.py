@@ -5,22 +5,18 @@ verify_setup.py
 Script de utilidad para verificar y configurar la integración con Oracle Database.
 """
 
-import os
 import sys
 import json
+import subprocess
+import time
 from pathlib import Path
-import oracledb
+
+import db_pool
+from config.db_config import DB_CONFIG
 
 PROJECT_ROOT = Path(__file__).parent.parent
 SPOT_MAPPING_FILE = PROJECT_ROOT / "config" / "spot_mapping.json"
 
-# Configuración Oracle Database
-DB_CONFIG = {
-    "user": os.environ.get("DB_USER", "parkingapp"),
-    "password": os.environ.get("DB_PASSWORD", "admin123"),
-    "dsn": f"{os.environ.get('DB_HOST', 'localhost')}:{os.environ.get('DB_PORT', '1521')}/{os.environ.get('DB_SID', 'FREEPDB1')}"
-}
-
 
 def test_connection():
     """Prueba la conexión a Oracle Database."""
@@ -29,15 +25,20 @@ def test_connection():
     print(f"   Usuario: {DB_CONFIG['user']}")
     
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("SELECT BANNER FROM V$VERSION WHERE ROWNUM = 1")
-        version = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT BANNER FROM V$VERSION WHERE ROWNUM = 1")
+            version = cursor.fetchone()
+            cursor.close()
         
         print("✅ Conexión exitosa!")
         print(f"   Oracle version: {version[0][:50]}...")
+
+        health = db_pool.health_check()
+        if not health["ok"]:
+            print(f"❌ Health check del pool falló: {health['error']}")
+            return False
+        print(f"   Pool: {health['opened']} sesiones abiertas (máx. {health['max']})")
         return True
     except Exception as e:
         print(f"❌ Error de conexión: {e}")
@@ -49,12 +50,11 @@ def list_parking_spaces():
     print("\n📊 Listando parking_spaces...")
     
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id", "spaceCode", "status", "floor" FROM "parking_spaces" ORDER BY "spaceCode"')
-        spaces = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT "id", "spaceCode", "status", "floor" FROM "parking_spaces" ORDER BY "spaceCode"')
+            spaces = cursor.fetchall()
+            cursor.close()
         
         if not spaces:
             print("⚠️  No hay plazas de estacionamiento en la BD.")
@@ -109,28 +109,54 @@ def test_space_query():
     print("\n🧪 Probando consulta de ejemplo...")
     
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # Buscar una plaza por código
-        test_codes = ["A-01", "A-02", "A-03", "A-04"]
-        for space_code in test_codes:
-            cursor.execute('SELECT "id" FROM "parking_spaces" WHERE "spaceCode" = :1', (space_code,))
-            result = cursor.fetchone()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
             
-            if result:
-                print(f"✅ Encontrado {space_code}: {result[0][:8]}...")
-                break
-        else:
-            print("⚠️  No se encontraron plazas de prueba (A-01, A-02, etc.)")
-        
-        cursor.close()
-        conn.close()
+            # Buscar una plaza por código
+            test_codes = ["A-01", "A-02", "A-03", "A-04"]
+            for space_code in test_codes:
+                cursor.execute('SELECT "id" FROM "parking_spaces" WHERE "spaceCode" = :1', (space_code,))
+                result = cursor.fetchone()
+                
+                if result:
+                    print(f"✅ Encontrado {space_code}: {result[0][:8]}...")
+                    break
+            else:
+                print("⚠️  No se encontraron plazas de prueba (A-01, A-02, etc.)")
+            
+            cursor.close()
         
     except Exception as e:
         print(f"❌ Error en consulta: {e}")
 
 
+def measure_startup():
+    """Mide el tiempo de importar parking_monitor y de cargar y calentar el detector."""
+    print("\n⏱️  Midiendo tiempo de arranque...")
+
+    # Importación en un intérprete limpio (sin módulos ya cargados por este script)
+    code = (
+        "import time; t = time.perf_counter(); import parking_monitor; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    try:
+        out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, timeout=120, check=True)
+        print(f"   import parking_monitor: {float(out.stdout.strip().splitlines()[-1]):.0f} ms")
+    except Exception as e:
+        print(f"⚠️  No se pudo medir la importación: {e}")
+        return
+
+    try:
+        import parking_monitor
+
+        start = time.perf_counter()
+        parking_monitor.get_detector()
+        print(f"   Carga + calentamiento del detector: {(time.perf_counter() - start) * 1000:.0f} ms")
+    except Exception as e:
+        print(f"⚠️  No se pudo cargar el detector: {e}")
+
+
 def main():
     print("=" * 60)
     print("   🚗 Verificación de Setup - Oracle Database")
@@ -148,6 +174,10 @@ def main():
         verify_spot_mapping(spaces)
         test_space_query()
     
+    db_pool.close_pool()
+
+    measure_startup()
+
     print("\n" + "=" * 60)
     print("✅ Verificación completada")
     print("=" * 60)
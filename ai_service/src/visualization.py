@@ -0,0 +1,169 @@
+# visualization.py — Dibujo de plazas/detecciones y salida HTTP opcional
+#
+# El monitor puede correr sin pantalla (modo headless). Si se quiere ver el
+# video anotado, AnnotatedFrameServer lo sirve por HTTP como stream MJPEG
+# (/stream.mjpg) o como captura puntual (/snapshot.jpg). El dibujo se hace en
+# un hilo propio, a una tasa limitada y solo cuando hay clientes mirando.
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+STREAM_FPS = 5
+JPEG_QUALITY = 80
+
+
+def draw_visuals(frame, spots, detections, status):
+    """
+    Dibuja zonas y detecciones en el frame.
+
+    `spots` puede ser la lista de plazas o, mejor, un dict id → plaza
+    precalculado para no buscar linealmente en cada frame.
+    """
+    spots_by_id = spots if isinstance(spots, dict) else {sp["id"]: sp for sp in spots}
+
+    # Detecciones (azul)
+    for det in detections:
+        x1, y1, x2, y2, cls, conf = det
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 2)
+        cv2.putText(frame, f"{cls} {conf:.2f}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+
+    # Cuadros de plazas
+    for s in status:
+        spot = spots_by_id.get(s["id"])
+        if spot is None:
+            continue
+        (x1, y1), (x2, y2) = spot["coords"]
+        color = (0, 0, 255) if s["occupied"] else (0, 255, 0)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, str(s["id"]), (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 1)
+    return frame
+
+
+class AnnotatedFrameServer:
+    """
+    Publica el último frame anotado por HTTP.
+
+    El bucle del monitor solo llama a publish() (asignación de referencias);
+    la copia, el dibujo y la codificación JPEG ocurren en el hilo de render.
+    """
+
+    def __init__(self, spots_by_id, port, host="0.0.0.0", fps=STREAM_FPS):
+        self.spots_by_id = spots_by_id
+        self.port = port
+        self.host = host
+        self.interval = 1.0 / fps
+        self._latest = None          # (frame, detections, status)
+        self._latest_version = 0
+        self._jpeg = None
+        self._jpeg_version = -1
+        self._clients = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._server = None
+
+    # --- Lado del monitor ---
+    def publish(self, frame, detections, status):
+        with self._cond:
+            self._latest = (frame, detections, status)
+            self._latest_version += 1
+
+    # --- Render ---
+    def _render_latest(self):
+        """Dibuja y codifica el último frame publicado si cambió."""
+        with self._cond:
+            latest, version = self._latest, self._latest_version
+        if latest is None or version == self._jpeg_version:
+            return
+        frame, detections, status = latest
+        annotated = draw_visuals(frame.copy(), self.spots_by_id, detections, status)
+        ok, buf = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if ok:
+            with self._cond:
+                self._jpeg = buf.tobytes()
+                self._jpeg_version = version
+                self._cond.notify_all()
+
+    def _render_loop(self):
+        while self._running:
+            start = time.monotonic()
+            if self._clients:
+                self._render_latest()
+            time.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def snapshot(self):
+        """JPEG del estado actual, renderizado a demanda."""
+        self._render_latest()
+        with self._cond:
+            return self._jpeg
+
+    def wait_jpeg(self, last_version, timeout=1.0):
+        with self._cond:
+            if self._jpeg_version == last_version:
+                self._cond.wait(timeout)
+            return self._jpeg_version, self._jpeg
+
+    # --- Ciclo de vida ---
+    def start(self):
+        server_ref = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/snapshot.jpg"):
+                    jpeg = server_ref.snapshot()
+                    if jpeg is None:
+                        self.send_error(503, "Sin frames todavía")
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                elif self.path.startswith("/stream.mjpg"):
+                    self._stream()
+                else:
+                    self.send_error(404)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                with server_ref._cond:
+                    server_ref._clients += 1
+                version = -1
+                try:
+                    while server_ref._running:
+                        version, jpeg = server_ref.wait_jpeg(version)
+                        if jpeg is None:
+                            continue
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server_ref._cond:
+                        server_ref._clients -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self._running = True
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="viewer-http", daemon=True).start()
+        threading.Thread(target=self._render_loop, name="viewer-render", daemon=True).start()
+        print(f"[INFO] Video anotado en http://{self.host}:{self.port}/stream.mjpg "
+              f"(captura: /snapshot.jpg)")
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
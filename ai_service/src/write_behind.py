@@ -0,0 +1,351 @@
+# write_behind.py — Escritura diferida de cambios de ocupación con spool local
+#
+# save_to_oracle ya no espera a la BD: cada cambio de estado se agrega a un
+# spool SQLite local (solo anexado, sobrevive a reinicios) y un hilo de fondo
+# lo vacía hacia "parking_spaces" / "occupancy_events" en lotes, con
+# reintentos y backoff exponencial. Si Oracle está lento o caído el monitor
+# sigue funcionando y los cambios se escriben al volver la conexión.
+#
+# El spool guarda el código de plaza (no el UUID), así que registrar un cambio
+# no necesita la BD. Al vaciarlo, el UPDATE es condicional ("status" distinto)
+# y solo se inserta un evento por cada fila que realmente cambió.
+#
+# Eso no alcanza para reenviar un lote ya confirmado (caída entre el commit en
+# Oracle y el ack en el spool): una plaza con varias transiciones en el lote
+# terminaría con sus eventos y agregados duplicados. Por eso cada spool tiene
+# un identificador y el último `seq` aplicado se guarda en
+# "occupancy_spool_progress" en la misma transacción que los eventos; al
+# (re)conectar se descartan del spool las entradas ya aplicadas. Si esa tabla
+# no se puede crear, la entrega pasa a ser "al menos una vez".
+#
+# "occupancy_spool_progress" se crea con DDL propio y no es una entidad del
+# backend: el synchronize de TypeORM solo modifica las tablas de sus entidades.
+#
+# Con `rollups` (occupancy_rollups.RollupTracker) los agregados por franja de
+# tiempo se actualizan en la misma transacción que los eventos.
+
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+BATCH_SIZE = 500
+MIN_BACKOFF = 1.0    # segundos
+MAX_BACKOFF = 60.0
+IDLE_WAIT = 0.5      # segundos entre revisiones del spool vacío
+
+UPDATE_IF_CHANGED_SQL = (
+    'UPDATE "parking_spaces" SET "status" = :1, "updatedAt" = :2 '
+    'WHERE "spaceCode" = :3 AND "status" <> :4'
+)
+INSERT_EVENT_SQL = (
+    'INSERT INTO "occupancy_events" ("id", "parkingSpaceId", "status", "timestamp") '
+    'SELECT :1, "id", :2, :3 FROM "parking_spaces" WHERE "spaceCode" = :4'
+)
+
+CREATE_PROGRESS_SQL = (
+    'CREATE TABLE "occupancy_spool_progress" ('
+    ' "spoolId" VARCHAR2(36) NOT NULL,'
+    ' "lastSeq" NUMBER(19) NOT NULL,'
+    ' "updatedAt" TIMESTAMP NOT NULL,'
+    ' CONSTRAINT "PK_occupancy_spool_progress" PRIMARY KEY ("spoolId"))'
+)
+SELECT_PROGRESS_SQL = 'SELECT "lastSeq" FROM "occupancy_spool_progress" WHERE "spoolId" = :1'
+SAVE_PROGRESS_SQL = (
+    'MERGE INTO "occupancy_spool_progress" p '
+    'USING (SELECT :1 AS sid, :2 AS seq, :3 AS ts FROM dual) s ON (p."spoolId" = s.sid) '
+    'WHEN MATCHED THEN UPDATE SET p."lastSeq" = s.seq, p."updatedAt" = s.ts '
+    'WHEN NOT MATCHED THEN INSERT ("spoolId", "lastSeq", "updatedAt") VALUES (s.sid, s.seq, s.ts)'
+)
+
+
+class EventSpool:
+    """Cola persistente de cambios (space_code, status, ts) sobre SQLite."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " space_code TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'spool_id'").fetchone()
+        if row is None:
+            row = (str(uuid.uuid4()),)
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('spool_id', ?)", row)
+        self.spool_id = row[0]  # identifica este spool en "occupancy_spool_progress"
+        self._conn.commit()
+
+    def append(self, rows):
+        """Agrega [(space_code, status, ts)] en una transacción."""
+        with self._lock:
+            self._conn.executemany("INSERT INTO spool (space_code, status, ts) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def peek(self, limit):
+        """Devuelve hasta `limit` entradas [(seq, space_code, status, ts)] en orden."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, space_code, status, ts FROM spool ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+
+    def ack(self, last_seq):
+        """Elimina las entradas ya escritas en Oracle (hasta `last_seq` inclusive). Devuelve cuántas."""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM spool WHERE seq <= ?", (last_seq,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def latest_status(self):
+        """Último estado encolado por plaza ({space_code: status})."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT space_code, status FROM spool WHERE seq IN "
+                "(SELECT MAX(seq) FROM spool GROUP BY space_code)"
+            ).fetchall()
+        return dict(rows)
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WriteBehindSync:
+    """
+    Reemplazo no bloqueante de OccupancyStateSync.sync.
+
+    record(status, spot_mapping) detecta los cambios contra el último estado
+    conocido y los anexa al spool; el hilo de fondo los escribe en Oracle.
+    `acquire` es un context manager que entrega una conexión (db_pool.connection).
+    """
+
+    def __init__(self, acquire, spool_path, batch_size=BATCH_SIZE,
+                 min_backoff=MIN_BACKOFF, max_backoff=MAX_BACKOFF, rollups=None):
+        self._acquire = acquire
+        self.rollups = rollups
+        self.spool = EventSpool(spool_path)
+        self.batch_size = batch_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        # Lo pendiente en el spool es más nuevo que lo que diga la BD
+        self._last_status = self.spool.latest_status()
+        self._seeded = False
+        self._track_progress = True
+        self._warned_ids = set()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+        # Estadísticas
+        self.recorded = 0
+        self.flushed = 0
+        self.failures = 0
+        self.last_error = None
+
+    # --- Lado del monitor (nunca toca la BD) ---
+    def record(self, status, spot_mapping):
+        """Encola los cambios de estado. Devuelve la cantidad encolada."""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for spot in status:
+                space_code = spot_mapping.get(spot["id"])
+                if not space_code:
+                    if spot["id"] not in self._warned_ids:
+                        print(f"[WARNING] No hay mapeo para la plaza ID {spot['id']}, se omite.")
+                        self._warned_ids.add(spot["id"])
+                    continue
+                new_status = 'occupied' if spot["occupied"] else 'free'
+                if self._last_status.get(space_code) != new_status:
+                    rows.append((space_code, new_status, now))
+                    self._last_status[space_code] = new_status
+            if rows:
+                self.spool.append(rows)
+                self.recorded += len(rows)
+        if rows:
+            self._wake.set()
+        return len(rows)
+
+    def invalidate(self):
+        """Vuelve a leer el estado de la BD en el próximo ciclo del escritor."""
+        with self._lock:
+            self._seeded = False
+
+    # --- Hilo escritor ---
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Detiene el escritor tras un último intento de vaciar el spool."""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Cerrar el spool ahora cortaría el lote en curso; lo confirmado
+                # en Oracle y no marcado en el spool se reescribe al reiniciar
+                print(f"[WARNING] El escritor sigue volcando tras {timeout:g}s; "
+                      f"el spool {self.spool.path} queda abierto.")
+                return
+        pending = self.spool.depth()
+        if pending:
+            print(f"[WARNING] {pending} cambios quedan en el spool {self.spool.path}; se escribirán al reiniciar.")
+        self.spool.close()
+
+    def _skip_applied(self, conn):
+        """Descarta del spool lo que Oracle ya tiene (lote confirmado y no marcado)."""
+        if not self._track_progress:
+            return
+        cursor = conn.cursor()
+        try:
+            try:
+                cursor.execute(CREATE_PROGRESS_SQL)
+            except Exception as e:
+                if "ORA-00955" not in str(e):
+                    print(f'[WARNING] No se pudo crear "occupancy_spool_progress"; '
+                          f'un lote reenviado tras una caída puede duplicar eventos: {e}')
+                    self._track_progress = False
+                    return
+            cursor.execute(SELECT_PROGRESS_SQL, (self.spool.spool_id,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if row is not None:
+            skipped = self.spool.ack(row[0])
+            if skipped:
+                print(f"[INFO] {skipped} cambios del spool ya estaban en Oracle, se descartan")
+
+    def _seed(self, conn):
+        self._skip_applied(conn)
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT "spaceCode", "status" FROM "parking_spaces"')
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if self.rollups is not None:
+            self.rollups.seed(conn)
+        with self._lock:
+            self._last_status = dict(rows)
+            self._last_status.update(self.spool.latest_status())
+            self._seeded = True
+        print(f"[INFO] Estado inicial cargado para {len(rows)} plazas")
+
+    def flush_once(self):
+        """Escribe un lote del spool en una transacción. Devuelve las filas aplicadas."""
+        batch = self.spool.peek(self.batch_size)
+        if not batch and self._seeded:
+            return 0
+
+        with self._acquire() as conn:
+            if not self._seeded:
+                self._seed(conn)
+                batch = self.spool.peek(self.batch_size)
+            if not batch:
+                return 0
+            cursor = conn.cursor()
+            try:
+                rows = [(status, datetime.fromtimestamp(ts), code) for _, code, status, ts in batch]
+                # "updatedAt" marca cuándo llega el cambio a la BD (lo que sondea
+                # occupancy_stream.py); la hora de la observación queda en el
+                # "timestamp" del evento, aunque el lote se vuelque tras una caída
+                flushed_at = datetime.now()
+                cursor.executemany(UPDATE_IF_CHANGED_SQL,
+                                   [(status, flushed_at, code, status) for status, _, code in rows],
+                                   arraydmlrowcounts=True)
+                changed = [r for r, count in zip(rows, cursor.getarraydmlrowcounts()) if count]
+                last_event = None
+                if changed:
+                    cursor.executemany(
+                        INSERT_EVENT_SQL,
+                        [(str(uuid.uuid4()), status, ts, code) for status, ts, code in changed],
+                    )
+                    if self.rollups is not None:
+                        aggregates, last_event = self.rollups.deltas(changed)
+                        self.rollups.write(cursor, aggregates)
+                if self._track_progress:
+                    cursor.execute(SAVE_PROGRESS_SQL, (self.spool.spool_id, batch[-1][0], flushed_at))
+                conn.commit()
+                if last_event:
+                    self.rollups.commit(last_event)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self.spool.ack(batch[-1][0])
+        self.flushed += len(changed)
+        for status, _, code in changed:
+            print(f"[INFO] ✅ Actualizado {code}: → {status}")
+        print(f"[INFO] {len(changed)} cambios sincronizados con Oracle Database "
+              f"({len(batch) - len(changed)} sin efecto).\n")
+        return len(changed)
+
+    def _run(self):
+        backoff = self.min_backoff
+        while True:
+            try:
+                applied = self.flush_once()
+            except Exception as e:
+                self.failures += 1
+                if self.last_error is None:
+                    print(f"[ERROR] Error en Oracle Database, los cambios quedan en el spool: {e}")
+                self.last_error = str(e)
+                with self._lock:
+                    self._seeded = False  # la BD pudo cambiar mientras no escribíamos
+                if not self._running:
+                    return
+                self._wake.wait(backoff)
+                self._wake.clear()
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            if self.last_error is not None:
+                print(f"[INFO] Conexión con Oracle restablecida tras {self.failures} reintentos.")
+                self.last_error = None
+                self.failures = 0
+            backoff = self.min_backoff
+
+            if applied or self.spool.depth():
+                continue  # seguir vaciando sin esperar
+            if not self._running:
+                return
+            self._wake.wait(IDLE_WAIT)
+            self._wake.clear()
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "spool_depth": self.spool.depth(),
+            "retries": self.failures,
+            "last_error": self.last_error,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        text = (f"[STATS] write-behind: {s['recorded']} cambios encolados, {s['flushed']} escritos, "
+                f"{s['spool_depth']} en el spool")
+        if s["last_error"]:
+            text += f" (Oracle no disponible, {s['retries']} reintentos)"
+        return text
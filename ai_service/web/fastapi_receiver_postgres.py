@@ -2,13 +2,33 @@
 # Este servidor ya no es necesario si usas la integración directa con Oracle Database
 # Se mantiene como referencia o para propósitos de debugging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from pathlib import Path
+import asyncio
+import json
 import os
+import sys
 import uuid
-import oracledb
+
+# Compartir la configuración del pool con el monitor (ai_service/src). Los
+# handlers usan el pool asíncrono de python-oracledb: una consulta lenta solo
+# suspende su propia request y las esperas a la BD de requests concurrentes se
+# solapan (hasta DB_POOL_MAX sesiones).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import db_pool
+from occupancy_export import EXPORT_BATCH, FORMATS, MEDIA_TYPES, export_query, make_encoder, tune_cursor
+from occupancy_stream import OccupancyBroadcaster
+
+SSE_KEEPALIVE = 15  # segundos entre comentarios keep-alive en /parking/stream
+
+# Caché de lectura para /parking/state y /parking/summary
+STATE_CACHE = os.getenv("STATE_CACHE", "1") != "0"  # 0 = consultar Oracle en cada request
+STATE_POLL_INTERVAL = float(os.getenv("STATE_POLL_INTERVAL", "1"))  # 0 = sin refresco periódico
+CACHE_MAX_STALENESS = float(os.getenv("STATE_CACHE_MAX_STALENESS", "5"))  # segundos
 
 class Spot(BaseModel):
     id: int
@@ -26,112 +46,190 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# Configuración Oracle Database
-DB_CONFIG = {
-    "user": os.environ.get("DB_USER", "parkingapp"),
-    "password": os.environ.get("DB_PASSWORD", "admin123"),
-    "dsn": f"{os.environ.get('DB_HOST', 'localhost')}:{os.environ.get('DB_PORT', '1521')}/{os.environ.get('DB_SID', 'FREEPDB1')}"
-}
+# Publicador único de cambios para WebSocket / SSE
+broadcaster = OccupancyBroadcaster(db_pool.async_connection, poll_interval=STATE_POLL_INTERVAL)
+
+# Mapeo de IDs del monitor a plazas: el monitor numera desde 1 las plazas con
+# coordenadas ordenadas por spaceCode (load_spots_from_db), así que el
+# receptor arma el mismo mapeo desde "parking_spaces" y lo guarda en memoria.
+SPOT_MAPPING_TTL = float(os.getenv("SPOT_MAPPING_TTL", "30"))  # segundos
+SPOT_MAPPING_MIN_RELOAD = 1.0  # segundos mínimos entre recargas por IDs desconocidos
+
+SPOT_MAPPING_SQL = (
+    'SELECT "id", "spaceCode" FROM "parking_spaces" WHERE "x1" IS NOT NULL ORDER BY "spaceCode"'
+)
+UPDATE_IF_CHANGED_SQL = (
+    'UPDATE "parking_spaces" SET "status" = :1, "updatedAt" = :2 '
+    'WHERE "id" = :3 AND "status" <> :4'
+)
+INSERT_EVENT_SQL = (
+    'INSERT INTO "occupancy_events" ("id", "parkingSpaceId", "status", "timestamp") '
+    'VALUES (:1, :2, :3, :4)'
+)
+
+
+class SpotMappingCache:
+    """ID del monitor -> (UUID, spaceCode), releído cada SPOT_MAPPING_TTL segundos."""
+
+    def __init__(self, ttl=SPOT_MAPPING_TTL):
+        self.ttl = ttl
+        self.mapping = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    def _age(self):
+        if self._loaded_at is None:
+            return float("inf")
+        return asyncio.get_running_loop().time() - self._loaded_at
 
-# Mapeo de IDs a spaceCodes (debe coincidir con spot_mapping.json)
-SPOT_MAPPING = {
-    1: "A-01",
-    2: "A-02",
-    3: "A-03",
-    4: "A-04"
-}
+    async def get(self, conn, missing=()):
+        """
+        Devuelve el mapeo, recargándolo si venció o si faltan IDs de `missing`
+        (plazas recién dibujadas), como mucho una vez por SPOT_MAPPING_MIN_RELOAD.
+        """
+        stale = self._age() > self.ttl
+        unknown = any(spot_id not in self.mapping for spot_id in missing)
+        if not stale and not (unknown and self._age() > SPOT_MAPPING_MIN_RELOAD):
+            return self.mapping
+        async with self._lock:
+            if self._age() > SPOT_MAPPING_MIN_RELOAD:  # otra request pudo recargar mientras esperábamos
+                cursor = conn.cursor()
+                try:
+                    await cursor.execute(SPOT_MAPPING_SQL)
+                    rows = await cursor.fetchall()
+                finally:
+                    cursor.close()
+                self.mapping = {idx: (space_id, code) for idx, (space_id, code) in enumerate(rows, start=1)}
+                self._loaded_at = asyncio.get_running_loop().time()
+        return self.mapping
 
 
-def get_parking_space_id(space_code: str, conn):
-    """Obtiene el UUID del parking_space a partir del spaceCode."""
-    cursor = conn.cursor()
-    cursor.execute('SELECT "id" FROM "parking_spaces" WHERE "spaceCode" = :1', (space_code,))
-    result = cursor.fetchone()
-    cursor.close()
-    return result[0] if result else None
+spot_mapping = SpotMappingCache()
 
 
 @app.post("/parking/update")
 async def update_state(payload: Payload):
     """
     Recibe datos del monitor del estacionamiento y actualiza Oracle Database.
-    
+
+    Todo el payload se aplica con dos sentencias con array bind: un UPDATE
+    condicional que solo toca las plazas cuyo estado cambia (y devuelve cuáles
+    fueron) y un INSERT de sus eventos, en una única transacción.
+
     NOTA: Esta ruta es opcional. parking_monitor.py ahora actualiza
     Oracle Database directamente sin necesidad de este servidor.
     """
-    conn = None
-    updated = 0
     errors = []
-    
+    changed = []
+
+    # Último estado por plaza (un ID repetido no genera dos eventos)
+    requested = {}
+    for spot in payload.spots:
+        requested[spot.id] = 'occupied' if spot.occupied else 'free'
+
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        for spot in payload.spots:
-            space_code = SPOT_MAPPING.get(spot.id)
-            if not space_code:
-                errors.append(f"No mapping for spot ID {spot.id}")
-                continue
-            
-            parking_space_uuid = get_parking_space_id(space_code, conn)
-            if not parking_space_uuid:
-                errors.append(f"Parking space {space_code} not found")
-                continue
-            
-            new_status = 'occupied' if spot.occupied else 'free'
-            
-            # Obtener estado actual
-            cursor.execute(
-                'SELECT "status" FROM "parking_spaces" WHERE "id" = :1',
-                (parking_space_uuid,)
-            )
-            result = cursor.fetchone()
-            current_status = result[0] if result else None
-            
-            # Solo actualizar si hay cambio
-            if current_status != new_status:
-                cursor.execute(
-                    'UPDATE "parking_spaces" SET "status" = :1, "updatedAt" = :2 WHERE "id" = :3',
-                    (new_status, datetime.now(), parking_space_uuid)
-                )
-                
-                event_id = str(uuid.uuid4())
-                cursor.execute(
-                    'INSERT INTO "occupancy_events" ("id", "parkingSpaceId", "status", "timestamp") VALUES (:1, :2, :3, :4)',
-                    (event_id, parking_space_uuid, new_status, datetime.now())
-                )
-                
-                updated += 1
-        
-        conn.commit()
-        cursor.close()
-        
+        async with db_pool.async_connection() as conn:
+            mapping = await spot_mapping.get(conn, missing=requested)
+            unmapped = [spot_id for spot_id in requested if spot_id not in mapping]
+            if unmapped:
+                errors.append(f"No mapping for spot IDs {unmapped[:20]}"
+                              + (f" (+{len(unmapped) - 20} more)" if len(unmapped) > 20 else ""))
+
+            now = datetime.now()
+            rows = [(status, now, mapping[spot_id][0], status)
+                    for spot_id, status in requested.items() if spot_id in mapping]
+            codes = [mapping[spot_id][1] for spot_id in requested if spot_id in mapping]
+            if rows:
+                cursor = conn.cursor()
+                try:
+                    await cursor.executemany(UPDATE_IF_CHANGED_SQL, rows, arraydmlrowcounts=True)
+                    changed = [
+                        {"id": space_id, "spaceCode": code, "status": status, "updatedAt": now.isoformat()}
+                        for (status, _, space_id, _), code, count
+                        in zip(rows, codes, cursor.getarraydmlrowcounts()) if count
+                    ]
+                    if changed:
+                        await cursor.executemany(
+                            INSERT_EVENT_SQL,
+                            [(str(uuid.uuid4()), c["id"], c["status"], now) for c in changed],
+                        )
+                    await conn.commit()
+                except Exception:
+                    changed = []
+                    await conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        # Avisar a los suscriptores sin esperar al próximo sondeo
+        broadcaster.publish(changed)
+
     except Exception as e:
         errors.append(str(e))
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-    
+
     return {
         "ok": True,
         "received": len(payload.spots),
-        "updated": updated,
+        "updated": len(changed),
         "errors": errors if errors else None
     }
 
 
+async def cached_response(request: Request, name: str, build):
+    """
+    Responde una vista desde el estado en memoria con ETag. Si el estado es
+    más viejo que CACHE_MAX_STALENESS se consulta antes la BD; con
+    If-None-Match igual a la versión actual se responde 304 sin cuerpo.
+    """
+    try:
+        await broadcaster.ensure_fresh(CACHE_MAX_STALENESS)
+    except Exception as e:
+        if broadcaster.age() == float("inf"):
+            return {"error": str(e)}
+        print(f"[WARNING] No se pudo refrescar el estado, se sirve el último conocido: {e}")
+
+    etag, body = broadcaster.view(name, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def state_view():
+    spaces = sorted(broadcaster.spaces.values(), key=lambda s: s["spaceCode"])
+    return {
+        "timestamp": (broadcaster.changed_at or datetime.now()).isoformat(),
+        "total": len(spaces),
+        "spaces": spaces,
+    }
+
+
+def summary_view():
+    counts = {}
+    for space in broadcaster.spaces.values():
+        counts[space["status"]] = counts.get(space["status"], 0) + 1
+    return {
+        "total": sum(counts.values()),
+        "occupied": counts.get('occupied', 0),
+        "free": counts.get('free', 0),
+        "unknown": counts.get('unknown', 0),
+        "last_update": (broadcaster.changed_at or datetime.now()).isoformat(),
+    }
+
+
 @app.get("/parking/state")
-async def get_state():
-    """Devuelve el estado completo actual del estacionamiento desde Oracle Database."""
+async def get_state(request: Request):
+    """
+    Devuelve el estado completo actual del estacionamiento. Se sirve desde
+    memoria (ver cached_response); con STATE_CACHE=0 se lee de Oracle.
+    """
+    if STATE_CACHE:
+        return await cached_response(request, "state", state_view)
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute('SELECT "id", "spaceCode", "status", "updatedAt" FROM "parking_spaces" ORDER BY "spaceCode"')
-        spaces = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        async with db_pool.async_connection() as conn:
+            cursor = conn.cursor()
+            await cursor.execute('SELECT "id", "spaceCode", "status", "updatedAt" FROM "parking_spaces" ORDER BY "spaceCode"')
+            spaces = await cursor.fetchall()
+            cursor.close()
         
         return {
             "timestamp": datetime.now().isoformat(),
@@ -151,15 +249,16 @@ async def get_state():
 
 
 @app.get("/parking/summary")
-async def get_summary():
-    """Devuelve resumen de plazas libres y ocupadas."""
+async def get_summary(request: Request):
+    """Devuelve resumen de plazas libres y ocupadas (desde memoria, como /parking/state)."""
+    if STATE_CACHE:
+        return await cached_response(request, "summary", summary_view)
     try:
-        conn = oracledb.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute('SELECT "status", COUNT(*) as count FROM "parking_spaces" GROUP BY "status"')
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        async with db_pool.async_connection() as conn:
+            cursor = conn.cursor()
+            await cursor.execute('SELECT "status", COUNT(*) as count FROM "parking_spaces" GROUP BY "status"')
+            results = await cursor.fetchall()
+            cursor.close()
         
         summary = {status[0]: status[1] for status in results}
         total = sum(summary.values())
@@ -175,6 +274,101 @@ async def get_summary():
         return {"error": str(e)}
 
 
+@app.get("/parking/events/export")
+async def export_events(format: str = "ndjson", start: Optional[datetime] = None,
+                        end: Optional[datetime] = None, spaceCode: Optional[str] = None):
+    """
+    Exporta "occupancy_events" en [start, end) como NDJSON, CSV o Parquet.
+    Las filas se leen en lotes de EXPORT_BATCH con el cursor del servidor y
+    cada lote se envía apenas se codifica (ver src/occupancy_export.py), así
+    la memoria no crece con el tamaño del rango.
+    """
+    if format not in FORMATS:
+        raise HTTPException(400, f"format debe ser uno de {', '.join(FORMATS)}")
+    try:
+        encoder = make_encoder(format)
+    except RuntimeError as e:  # parquet sin pyarrow
+        raise HTTPException(501, str(e))
+    sql, params = export_query(start, end, spaceCode)
+
+    async def body():
+        async with db_pool.async_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                tune_cursor(cursor, EXPORT_BATCH)
+                await cursor.execute(sql, params)
+                yield encoder.header()
+                while True:
+                    rows = await cursor.fetchmany(EXPORT_BATCH)
+                    if not rows:
+                        break
+                    yield encoder.encode(rows)
+                yield encoder.footer()
+            finally:
+                cursor.close()
+
+    filename = f"occupancy_events.{format}"
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.websocket("/parking/ws")
+async def parking_ws(websocket: WebSocket):
+    """
+    Stream de ocupación por WebSocket: primero un snapshot completo y luego
+    solo los cambios ({"type": "delta", "changes": [...], "removed": [...]}).
+    """
+    await websocket.accept()
+    queue = broadcaster.subscribe()
+    try:
+        while True:
+            await websocket.send_json(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+@app.get("/parking/stream")
+async def parking_stream(request: Request):
+    """Mismo stream que /parking/ws como Server-Sent Events (eventos snapshot/delta)."""
+    queue = broadcaster.subscribe()
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/health")
+async def health():
+    """Verifica que el pool de conexiones Oracle esté operativo."""
+    status = await db_pool.async_health_check()
+    status["subscribers"] = broadcaster.subscribers
+    return status
+
+
+@app.on_event("startup")
+async def startup():
+    await broadcaster.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await broadcaster.stop()
+    await db_pool.close_async_pool()
+
+
 @app.get("/")
 async def root():
     return {
@@ -183,7 +377,11 @@ async def root():
         "endpoints": [
             "POST /parking/update - Actualizar estado (legacy)",
             "GET /parking/state - Ver estado actual",
-            "GET /parking/summary - Ver resumen"
+            "GET /parking/summary - Ver resumen",
+            "WS /parking/ws - Cambios en tiempo real (WebSocket)",
+            "GET /parking/stream - Cambios en tiempo real (SSE)",
+            "GET /parking/events/export - Historial de eventos (NDJSON, CSV o Parquet)",
+            "GET /health - Estado del pool de conexiones"
         ]
     }
 
@@ -0,0 +1,225 @@
+# occupancy_stream.py — Difusión en tiempo real de cambios de ocupación
+#
+# Un único publicador (OccupancyBroadcaster) mantiene en memoria el estado de
+# todas las plazas y consulta Oracle cada POLL_INTERVAL segundos pidiendo solo
+# las filas con "updatedAt" posterior a la última vista. Los cambios se
+# reparten como deltas a todos los suscriptores (WebSocket o SSE) a través de
+# una cola por cliente. La carga sobre la BD es una consulta por intervalo, sin
+# importar cuántos dashboards estén conectados. Los escritores sellan
+# "updatedAt" con la hora de escritura en la BD (no la de la observación), así
+# un cambio volcado tarde desde el spool de write_behind.py igual aparece.
+#
+# Cada cierto tiempo se relee la tabla completa para detectar plazas borradas
+# o recreadas (draw_spots.py). Un suscriptor que no consume a tiempo no frena
+# a los demás: su cola se vacía y recibe un snapshot nuevo.
+#
+# El mismo estado sirve como modelo de lectura para /parking/state y
+# /parking/summary: cada vista se serializa una vez por versión y se entrega
+# desde memoria con un ETag derivado de la versión.
+
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+POLL_INTERVAL = 1.0      # segundos entre consultas de cambios
+FULL_REFRESH = 60.0      # segundos entre relecturas completas
+QUEUE_SIZE = 256         # mensajes pendientes por suscriptor
+OVERLAP = timedelta(seconds=2)  # margen entre el sello de "updatedAt" y el commit, y entre relojes
+
+SELECT_ALL_SQL = 'SELECT "id", "spaceCode", "status", "updatedAt" FROM "parking_spaces" ORDER BY "spaceCode"'
+SELECT_CHANGED_SQL = (
+    'SELECT "id", "spaceCode", "status", "updatedAt" FROM "parking_spaces" '
+    'WHERE "updatedAt" > :1 ORDER BY "spaceCode"'
+)
+
+
+def space_row(row):
+    """Convierte una fila (id, spaceCode, status, updatedAt) al formato de la API."""
+    space_id, code, status, updated_at = row
+    return {
+        "id": space_id,
+        "spaceCode": code,
+        "status": status,
+        "updatedAt": updated_at.isoformat() if updated_at else None,
+    }
+
+
+class OccupancyBroadcaster:
+    """
+    Publicador único con fan-out a muchos suscriptores.
+
+    `acquire` es un context manager asíncrono que entrega una conexión del
+    pool async de python-oracledb (db_pool.async_connection), así las
+    consultas nunca bloquean el loop.
+    """
+
+    def __init__(self, acquire, poll_interval=POLL_INTERVAL, full_refresh=FULL_REFRESH,
+                 queue_size=QUEUE_SIZE):
+        self._acquire = acquire
+        self.poll_interval = poll_interval
+        self.full_refresh = full_refresh
+        self.queue_size = queue_size
+
+        self.spaces = {}        # spaceCode -> dict de space_row
+        self.version = 0
+        self.changed_at = None  # datetime del último cambio publicado
+        self._refreshed_at = None  # loop.time() de la última consulta exitosa
+        self._verified_at = None   # loop.time() de la última relectura completa
+        self._since = None      # mayor "updatedAt" visto
+        self._subscribers = set()
+        self._views = {}        # nombre -> (versión, etag, cuerpo JSON)
+        self._epoch = os.urandom(4).hex()  # distingue ETags entre reinicios
+        self._refresh_lock = None
+        self._task = None
+
+    # --- Consultas ---
+    async def _fetch(self, sql, params=()):
+        async with self._acquire() as conn:
+            cursor = conn.cursor()
+            try:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+            finally:
+                cursor.close()
+
+    # --- Estado y difusión ---
+    def _advance(self, rows):
+        for row in rows:
+            if row[3] is not None and (self._since is None or row[3] > self._since):
+                self._since = row[3]
+
+    def snapshot(self):
+        return {"type": "snapshot", "version": self.version, "spaces": list(self.spaces.values())}
+
+    def publish(self, spaces, removed=()):
+        """
+        Aplica filas nuevas (en formato space_row) al estado y envía a los
+        suscriptores solo las que cambiaron. Devuelve el delta o None.
+        """
+        changes = []
+        for space in spaces:
+            previous = self.spaces.get(space["spaceCode"])
+            if previous is None or previous["status"] != space["status"] or previous["id"] != space["id"]:
+                changes.append(space)
+            self.spaces[space["spaceCode"]] = space
+        removed = [code for code in removed if self.spaces.pop(code, None) is not None]
+        if not changes and not removed:
+            return None
+
+        self.version += 1
+        self.changed_at = datetime.now()
+        delta = {"type": "delta", "version": self.version, "changes": changes, "removed": removed}
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Cliente lento: descartar lo pendiente y reenviar el estado completo
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot())
+        return delta
+
+    def subscribe(self):
+        """Registra un suscriptor. Devuelve su cola, con el snapshot inicial ya encolado."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(self.snapshot())
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    # --- Modelo de lectura ---
+    def view(self, name, build):
+        """
+        Devuelve (etag, cuerpo) de la vista `name` para la versión actual.
+        `build()` arma el dict de respuesta; se llama una vez por versión.
+        """
+        cached = self._views.get(name)
+        if cached is None or cached[0] != self.version:
+            body = json.dumps(build()).encode()
+            cached = (self.version, f'W/"{name}-{self._epoch}-{self.version}"', body)
+            self._views[name] = cached
+        return cached[1], cached[2]
+
+    def age(self):
+        """Segundos desde la última consulta exitosa a la BD (inf si nunca hubo)."""
+        if self._refreshed_at is None:
+            return float("inf")
+        return asyncio.get_running_loop().time() - self._refreshed_at
+
+    def verified_age(self):
+        """Segundos desde la última relectura completa de la tabla (inf si nunca hubo)."""
+        if self._verified_at is None:
+            return float("inf")
+        return asyncio.get_running_loop().time() - self._verified_at
+
+    async def ensure_fresh(self, max_staleness):
+        """
+        Relee la tabla completa si la última relectura es más vieja que
+        `max_staleness`. El sondeo incremental depende de "updatedAt" y puede
+        perder una fila sellada antes de la marca de agua (p. ej. un commit
+        lento); la relectura no, así la cota vale para cualquier escritura.
+        """
+        if self.verified_age() <= max_staleness:
+            return
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if self.verified_age() > max_staleness:  # otra request pudo refrescar mientras esperábamos
+                await self.refresh()
+
+    # --- Ciclo de vida ---
+    async def refresh(self):
+        """Relee la tabla completa y publica altas, cambios y bajas."""
+        rows = await self._fetch(SELECT_ALL_SQL)
+        self._advance(rows)
+        spaces = [space_row(r) for r in rows]
+        current = {s["spaceCode"] for s in spaces}
+        self.publish(spaces, removed=[code for code in self.spaces if code not in current])
+        self._refreshed_at = self._verified_at = asyncio.get_running_loop().time()
+
+    async def poll(self):
+        """Consulta solo las plazas modificadas desde la última vista."""
+        if self._since is None:
+            return await self.refresh()
+        rows = await self._fetch(SELECT_CHANGED_SQL, (self._since - OVERLAP,))
+        self._advance(rows)
+        self.publish([space_row(r) for r in rows])
+        self._refreshed_at = asyncio.get_running_loop().time()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_refresh = loop.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if loop.time() - last_refresh >= self.full_refresh:
+                    await self.refresh()
+                    last_refresh = loop.time()
+                else:
+                    await self.poll()
+            except Exception as e:
+                print(f"[ERROR] Error consultando cambios de ocupación: {e}")
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"[ERROR] No se pudo cargar el estado inicial: {e}")
+        if self.poll_interval > 0:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -4,6 +4,7 @@ import {
   Column,
   ManyToOne,
   CreateDateColumn,
+  Index,
 } from 'typeorm';
 import { ParkingSpace } from '../parking/parking.entity';
 
@@ -14,6 +15,8 @@ export enum OccupancyStatus {
 }
 
 @Entity('occupancy_events')
+// Lo usan las consultas por plaza y el mantenimiento de ai_service/src/event_retention.py
+@Index('IDX_occupancy_events_space_ts', ['parkingSpace', 'timestamp'])
 export class OccupancyEvent {
   @PrimaryGeneratedColumn('uuid')
   id: string;